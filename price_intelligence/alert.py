@@ -1,20 +1,109 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import threading
-import sqlite3
-from datetime import datetime
-from pathlib import Path
-import os
-
-import os
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-DB_PATH = os.path.join(DATA_DIR, 'pricesmart.db')
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from database import pool, add_column_if_missing, utc_timestamp
+from history import price_history
+from rollups import price_rollups
+from cache import normalize_query
+from mailer import AlertMailer
+from logs import get_logger
+from metrics import ALERT_CHECK_SECONDS, ALERT_EVENTS
+
+log = get_logger('alert')
+
+def fetch_lowest_price(product_name):
+    """Re-price a product across all platforms: (lowest_price, products)
+
+    Only scraped offers count. When every store fails, search_product falls
+    back to generated products (real_data=False); pricing, recording or
+    alerting on those would be wrong, so that is (None, []) and the item is
+    rescheduled like any failed fetch.
+    """
+    from scraper import scraper
+    products = [p for p in scraper.search_product(product_name) if p.get('real_data')]
+    if not products:
+        ALERT_EVENTS.inc(event='no_real_prices')
+        return None, []
+    prices = [p['price'] for p in products if p.get('price')]
+    return (min(prices) if prices else None), products
+
+# Re-check intervals by distance to the target price: (max gap as a fraction of price, minutes)
+RECHECK_TIERS = [
+    (0.02, 15),
+    (0.05, 30),
+    (0.15, 120),
+]
+RECHECK_DEFAULT_MINUTES = 360
+RECHECK_MIN_MINUTES = 10
+RECHECK_MAX_MINUTES = 24 * 60
+
+def recheck_delay_minutes(price, target_price, volatility=None):
+    """How long to wait before re-pricing an item, before jitter
+
+    Items close to their target are checked often, items far away rarely.
+    Products whose price moved a lot over the last week are checked twice
+    as often; products that haven't moved at all half as often.
+    """
+    minutes = RECHECK_DEFAULT_MINUTES
+    if price and target_price:
+        gap = (price - target_price) / price
+        for max_gap, tier_minutes in RECHECK_TIERS:
+            if gap <= max_gap:
+                minutes = tier_minutes
+                break
+
+    if volatility is not None:
+        if volatility >= 0.05:
+            minutes /= 2
+        elif volatility < 0.01:
+            minutes *= 2
+
+    return min(max(minutes, RECHECK_MIN_MINUTES), RECHECK_MAX_MINUTES)
+
+def next_check_time(minutes, jitter=0.2):
+    """UTC timestamp `minutes` from now, spread by +/- jitter so items don't all come due together"""
+    minutes *= 1 + random.uniform(-jitter, jitter)
+    return (datetime.utcnow() + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
+
+def product_volatility(product_names, days=7):
+    """(max - min) / avg of each product's price over the last few days"""
+    ranges = price_rollups.price_ranges(product_names, days)
+    return {name: (high - low) / avg for name, (low, high, avg) in ranges.items() if avg}
 
 class PriceAlertSystem:
-    def __init__(self):
+    def __init__(self, price_fetcher=None, chunk_size=1000, fetch_workers=8, mailer=None):
         self.alerts = {}
+        self.mailer = mailer or AlertMailer()
+        # price_fetcher(product_name) -> (lowest_price or None, [product dicts])
+        self.price_fetcher = price_fetcher or fetch_lowest_price
+        self.chunk_size = chunk_size
+        self.fetch_workers = fetch_workers
+        self.last_run = {}
+        self._schema_ready = False
+    
+    def ensure_schema(self):
+        """Add the scheduling and product key columns and the indexes the checker relies on"""
+        if self._schema_ready:
+            return
+        with pool.transaction() as c:
+            add_column_if_missing(c, 'watchlist', 'next_check_at', 'DATETIME')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_watchlist_active_next_check ON watchlist(is_active, next_check_at)')
+            # The scan pages on the normalized product name, the same key rows are grouped by
+            add_column_if_missing(c, 'watchlist', 'product_key', 'TEXT')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_watchlist_active_product_key ON watchlist(is_active, product_key, id)')
+            c.execute('DROP INDEX IF EXISTS idx_watchlist_active_product')
+        self._schema_ready = True
+    
+    def fill_product_keys(self):
+        """Set product_key on rows added since the last run (the app inserts them without one)"""
+        self.ensure_schema()
+        rows = pool.fetchall('SELECT id, product_name FROM watchlist WHERE is_active = 1 AND product_key IS NULL')
+        if rows:
+            with pool.transaction() as c:
+                c.executemany('UPDATE watchlist SET product_key = ? WHERE id = ?',
+                              [(normalize_query(name), item_id) for item_id, name in rows])
         
     def check_price_drop(self, product_name, current_price, stored_price):
         """Check if price dropped by threshold"""
@@ -23,135 +112,133 @@ class PriceAlertSystem:
         return False, 0
     
     def send_email_alert(self, email, product_name, old_price, new_price, savings):
-        """Send email notification"""
-        print(f"📧 Price alert for {product_name}: ₹{old_price} → ₹{new_price} (Save ₹{savings})")
-        
-        # Email configuration (replace with your actual email settings)
-        sender_email = "alerts@pricesmart.ai"
-        sender_password = "your_password_here"  # In production, use environment variables
-        
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = email
-        msg['Subject'] = f"🔥 Price Drop Alert: {product_name}"
-        
-        body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #c026d3, #3b82f6); color: white; padding: 30px; text-align: center; border-radius: 10px; }}
-                .content {{ padding: 20px; background: #f9f9f9; border-radius: 10px; margin-top: 20px; }}
-                .price {{ font-size: 32px; font-weight: bold; color: #22c55e; }}
-                .old-price {{ text-decoration: line-through; color: #666; }}
-                .savings {{ background: #22c55e; color: white; padding: 10px 20px; border-radius: 20px; font-weight: bold; }}
-                .button {{ display: inline-block; background: #c026d3; color: white; padding: 12px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; margin-top: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🎯 PriceSmart AI Alert</h1>
-                    <p>Your price drop is here!</p>
-                </div>
-                
-                <div class="content">
-                    <h2>{product_name}</h2>
-                    
-                    <div style="margin: 30px 0;">
-                        <span class="old-price">₹{old_price:,}</span>
-                        <span class="price">→ ₹{new_price:,}</span>
-                    </div>
-                    
-                    <div class="savings">
-                        You save: ₹{savings:,}
-                    </div>
-                    
-                    <p style="margin-top: 30px;">
-                        <a href="http://localhost:5000" class="button">View on PriceSmart AI →</a>
-                    </p>
-                    
-                    <p style="margin-top: 30px; color: #666; font-size: 14px;">
-                        This alert was triggered because the price dropped by more than 10%.<br>
-                        You can manage your alerts in your PriceSmart AI account.
-                    </p>
-                </div>
-            </div>
-        </body>
-        </html>
+        """Queue an email notification; the mailer thread batches and delivers it"""
+        log.info("📧 Price alert for %s: ₹%s → ₹%s (Save ₹%s)", product_name, old_price, new_price, savings)
+        return self.mailer.enqueue(email, product_name, old_price, new_price, savings)
+    
+    def iter_watchlist_chunks(self, due_only=False):
+        """Active watchlist rows in chunks, ordered by product key so each product's rows are adjacent
+
+        Rows are (id, user_id, product_name, current_price, target_price,
+        email, product_key); spellings of one product ("iPhone 15",
+        "iphone  15") share a key and so land next to each other. Uses keyset
+        pagination so no read transaction stays open while prices are
+        fetched. With due_only, rows whose next_check_at is still in the
+        future are skipped.
         """
-        
-        msg.attach(MIMEText(body, 'html'))
-        
+        self.fill_product_keys()
+        due_before = utc_timestamp() if due_only else '9999-12-31'
+        last_key, last_id = '', 0
+        while True:
+            rows = pool.fetchall('''SELECT w.id, w.user_id, w.product_name, w.current_price, w.target_price, u.email,
+                               w.product_key
+                        FROM watchlist w
+                        JOIN users u ON w.user_id = u.id
+                        WHERE w.is_active = 1 AND (w.product_key, w.id) > (?, ?)
+                          AND (w.next_check_at IS NULL OR w.next_check_at <= ?)
+                        ORDER BY w.product_key, w.id
+                        LIMIT ?''', (last_key, last_id, due_before, self.chunk_size))
+            if not rows:
+                return
+            yield rows
+            last_key, last_id = rows[-1][6], rows[-1][0]
+    
+    def _fetch_price(self, product_name):
         try:
-            # In production, uncomment and configure SMTP
-            """
-            with smtplib.SMTP('smtp.gmail.com', 587) as server:
-                server.starttls()
-                server.login(sender_email, sender_password)
-                server.send_message(msg)
-            """
-            print(f"✅ Email alert sent to {email}")
-            return True
-            
+            price, products = self.price_fetcher(product_name)
+            if products:
+                price_history.record_products(product_name, products)
+            return price
         except Exception as e:
-            print(f"❌ Failed to send email: {e}")
-            # For demo purposes, we'll still return True
-            return True
+            ALERT_EVENTS.inc(event='fetch_failed')
+            log.warning("❌ Price fetch failed for %s: %s", product_name, e)
+            return None
     
-    def check_all_watchlists(self):
-        """Check all watchlists for price drops"""
+    def check_due_watchlists(self):
+        """Re-price only the items whose next_check_at has come"""
+        return self.check_all_watchlists(due_only=True)
+    
+    def check_all_watchlists(self, due_only=False):
+        """Re-price every watched product once and alert users whose target was reached"""
+        started = time.time()
+        checked = alerts_sent = products_priced = 0
+        prices = {}
+        
         try:
-            conn = sqlite3.connect(str(DB_PATH))
-            c = conn.cursor()
-            
-            # Get all active watchlist items
-            c.execute('''SELECT w.id, w.user_id, w.product_name, w.current_price, w.target_price, u.email 
-                        FROM watchlist w 
-                        JOIN users u ON w.user_id = u.id 
-                        WHERE w.is_active = 1''')
-            
-            items = c.fetchall()
-            
-            alerts_sent = 0
-            for item in items:
-                item_id, user_id, product_name, current_price, target_price, email = item
-                
-                # Check if price reached target
-                if current_price <= target_price:
-                    print(f"🎯 Target price reached for {product_name}: ₹{current_price} (target: ₹{target_price})")
+            self.ensure_schema()
+            with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix='watchlist-fetch') as executor:
+                for rows in self.iter_watchlist_chunks(due_only=due_only):
+                    # Rows are ordered by product, so only the previous chunk's last product can repeat
+                    keys = {row[6]: row[2] for row in rows}
+                    prices = {key: prices[key] for key in keys if key in prices}
+                    to_fetch = {key: name for key, name in keys.items() if key not in prices}
+                    
+                    # Each distinct product is fetched once, however many users watch it
+                    for key, price in zip(to_fetch, executor.map(self._fetch_price, to_fetch.values())):
+                        prices[key] = price
+                    products_priced += len(to_fetch)
+                    volatility = product_volatility(keys.values())
+                    
+                    updates = []
+                    for item_id, user_id, product_name, current_price, target_price, email, key in rows:
+                        new_price = prices.get(key)
+                        if new_price is None:
+                            # Try again at the shortest interval rather than on every run
+                            updates.append((current_price, next_check_time(RECHECK_MIN_MINUTES), item_id))
+                            continue
+                        delay = recheck_delay_minutes(new_price, target_price, volatility.get(key))
+                        updates.append((new_price, next_check_time(delay), item_id))
+                        
+                        # Alert when the price reaches the target, once per drop
+                        was_above = current_price is None or current_price > target_price or new_price < current_price
+                        if target_price is not None and new_price <= target_price and was_above:
+                            log.info("🎯 Target price reached for %s: ₹%s (target: ₹%s)", product_name, new_price, target_price)
+                            if self.send_email_alert(email, product_name, current_price or target_price, new_price,
+                                                     (current_price or target_price) - new_price):
+                                alerts_sent += 1
                     
-                    # Send alert
-                    if self.send_email_alert(email, product_name, target_price, current_price, target_price - current_price):
-                        # Update last checked
-                        c.execute('UPDATE watchlist SET last_checked = CURRENT_TIMESTAMP WHERE id = ?', (item_id,))
-                        alerts_sent += 1
+                    with pool.transaction() as c:
+                        c.executemany('''UPDATE watchlist SET current_price = ?, last_checked = CURRENT_TIMESTAMP, next_check_at = ?
+                                         WHERE id = ?''', updates)
+                    checked += len(rows)
             
-            conn.commit()
-            conn.close()
+            # Send this run's digests now rather than at the end of the digest window
+            self.mailer.flush(wait=False)
             
-            print(f"✅ Checked {len(items)} watchlist items, sent {alerts_sent} alerts")
+            self.last_run = {
+                'items_checked': checked,
+                'products_priced': products_priced,
+                'alerts_sent': alerts_sent,
+                'duration_seconds': round(time.time() - started, 3)
+            }
+            log.info("✅ Checked %d watchlist items (%d products), sent %d alerts", checked, products_priced, alerts_sent)
             return alerts_sent
             
         except Exception as e:
-            print(f"❌ Watchlist check error: {e}")
-            return 0
+            ALERT_EVENTS.inc(event='run_failed')
+            log.error("❌ Watchlist check error: %s", e)
+            return alerts_sent
+        
+        finally:
+            ALERT_CHECK_SECONDS.observe(time.time() - started)
+            ALERT_EVENTS.inc(checked, event='items_checked')
+            ALERT_EVENTS.inc(products_priced, event='products_priced')
+            ALERT_EVENTS.inc(alerts_sent, event='alerts_sent')
     
     def start_background_checking(self, interval_minutes=30):
-        """Start background thread to check prices periodically"""
-        def check_loop():
-            while True:
-                import time
-                time.sleep(interval_minutes * 60)  # Convert minutes to seconds
-                self.check_all_watchlists()
+        """Poll for due watchlist items in a background thread
+
+        Runs under the scheduler's SQLite lease, so starting it in several
+        gunicorn workers still checks each item once. For production prefer
+        the standalone process: python scheduler.py
+        """
+        from scheduler import Scheduler
         
-        # Start background thread
-        thread = threading.Thread(target=check_loop, daemon=True)
-        thread.start()
-        print(f"✅ Background price checking started (every {interval_minutes} minutes)")
+        scheduler = Scheduler()
+        scheduler.add_job('watchlist-check', self.check_due_watchlists, interval=interval_minutes * 60,
+                          jitter=0.2, lease_ttl=600)
+        thread = scheduler.start_in_thread()
+        log.info("✅ Background price checking started (every %d minutes)", interval_minutes)
         return thread
 
 # Global alert system instance
@@ -166,6 +253,7 @@ def send_test_alert():
         79999,
         10000
     )
+    alert_system.mailer.flush()
 
 if __name__ == "__main__":
     # Test the alert system
@@ -1,17 +1,22 @@
+import queue
 import random
-from flask import Flask, request, jsonify, send_from_directory
+import threading
+import time
+import numpy as np
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
-import sqlite3
-import hashlib
 import secrets
 import re
+import zlib
 import jwt
+from serialization import FastJSONProvider, dumps
 
-app = Flask(__name__, static_folder='frontend', static_url_path='')
+# The frontend is served by the routes below from the built assets (assets.py), not Flask's static view
+app = Flask(__name__, static_folder=None)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = secrets.token_hex(32)
-app.config['JWT_SECRET_KEY'] = secrets.token_hex(32)
 
 # Configure CORS properly
 CORS(app, resources={
@@ -24,21 +29,63 @@ CORS(app, resources={
 })
 
 # ==================== CONFIGURATION ====================
-import os
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-DB_PATH = os.path.join(DATA_DIR, 'pricesmart.db')
+from database import DATA_DIR, DB_PATH, pool, BatchWriter, utc_timestamp
+from cache import SearchCache, SQLiteCache, normalize_query
+from singleflight import SingleFlight, FileLockSingleFlight
+from history import price_history
+from stats import calculate_stats, history_stats
+from products import PLATFORMS, Product, intern, platform_meta
+from passwords import DUMMY_HASH, PasswordBusy, PasswordHasher, unusable_password
+from auth import TokenAuth, UserCache, bearer_token, load_jwt_secret
+from assets import AssetStore
+from compression import JSONResponseOptimizer
+from logs import get_logger
+from metrics import HTTP_REQUEST_SECONDS, SCRAPE_RESULTS, SCRAPE_SECONDS, SEARCH_STAGE_SECONDS, registry as metrics_registry
+from trending import TrendingTracker
+from ml_model import PricePredictor, load_daily_series_many, WINDOW, HORIZON
+log = get_logger('app')
 MODEL_PATH = os.path.join(DATA_DIR, 'price_model.pkl')
+MAX_BATCH_PREDICTIONS = 1000
+MAX_PRODUCT_NAME_LENGTH = 200
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Search result cache (seconds); the shared tier lets all gunicorn workers reuse hits
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 300))
+SEARCH_CACHE_STALE_TTL = int(os.environ.get('SEARCH_CACHE_STALE_TTL', 600))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 1024))
+SEARCH_CACHE_SHARED = os.environ.get('SEARCH_CACHE_SHARED', '1') == '1'
+
+# Coalesce concurrent misses for one query: 'file' (across workers, needs the shared tier), 'local' or 'off'
+SEARCH_SINGLE_FLIGHT = os.environ.get('SEARCH_SINGLE_FLIGHT', 'file' if SEARCH_CACHE_SHARED else 'local')
+SEARCH_FLIGHT_LOCK_DIR = os.environ.get('SEARCH_FLIGHT_LOCK_DIR', os.path.join(DATA_DIR, 'flight-locks'))
+
+# Search logging happens off the request path; rows are written every N ms or M rows
+SEARCH_LOG_FLUSH_MS = int(os.environ.get('SEARCH_LOG_FLUSH_MS', 250))
+SEARCH_LOG_BATCH = int(os.environ.get('SEARCH_LOG_BATCH', 200))
+SEARCH_LOG_MAX_PENDING = int(os.environ.get('SEARCH_LOG_MAX_PENDING', 10000))
+
 
 # ==================== DATABASE ====================
 class Database:
     def __init__(self):
         self.init_database()
+        self.passwords = PasswordHasher()
+        self.users = UserCache(self.load_user)
+        self.trending = TrendingTracker()
+        # Under overload, drop log rows rather than slow down searches
+        self.search_log = BatchWriter(
+            'INSERT INTO searches (user_id, query, result_count, timestamp) VALUES (?, ?, ?, ?)',
+            max_batch=SEARCH_LOG_BATCH,
+            flush_interval=SEARCH_LOG_FLUSH_MS / 1000,
+            max_pending=SEARCH_LOG_MAX_PENDING,
+            overflow='drop',
+            name='search-log-writer',
+            on_flush=self.trending.apply_search_rows,
+            after_commit=self.trending.search_rows_committed
+        )
     
     def init_database(self):
-        conn = sqlite3.connect(str(DB_PATH))
+        conn = pool.connection()
         c = conn.cursor()
         
         # Users table
@@ -76,73 +123,64 @@ class Database:
             FOREIGN KEY(user_id) REFERENCES users(id)
         )''')
         
-        # Price history table
-        c.execute('''CREATE TABLE IF NOT EXISTS price_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_name TEXT NOT NULL,
-            platform TEXT NOT NULL,
-            price REAL NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )''')
+        # Per-user watchlist reads (alert.py adds the checker's own columns and indexes)
+        c.execute('CREATE INDEX IF NOT EXISTS idx_watchlist_active_user ON watchlist(is_active, user_id)')
         
         conn.commit()
-        conn.close()
-        print(f"✅ Database initialized at: {DB_PATH}")
+        # price_history and its rollup tables (and the one-off backfill of small existing histories)
+        price_history.ensure_schema()
+        log.info("✅ Database initialized at: %s", DB_PATH)
     
     def create_user(self, email, password, name):
+        # Duplicate signups shouldn't take a slot in the bounded KDF pool
+        if pool.fetchone('SELECT id FROM users WHERE email = ?', (email,)):
+            return None
+        # Hash before the transaction so the KDF doesn't hold the write lock (raises PasswordBusy)
+        hashed = self.passwords.hash(password)
         try:
-            conn = sqlite3.connect(str(DB_PATH))
-            c = conn.cursor()
-            
-            # Check if user exists
-            c.execute('SELECT id FROM users WHERE email = ?', (email,))
-            if c.fetchone():
-                conn.close()
-                return None
-            
-            # Hash password with salt
-            salt = secrets.token_hex(16)
-            hashed = hashlib.sha256((password + salt).encode()).hexdigest()
-            
-            c.execute('INSERT INTO users (email, password, name, salt) VALUES (?, ?, ?, ?)',
-                     (email, hashed, name, salt))
-            user_id = c.lastrowid
-            
-            conn.commit()
-            conn.close()
-            return user_id
+            with pool.transaction() as c:
+                # Again under the write lock: a concurrent signup may have taken the email
+                c.execute('SELECT id FROM users WHERE email = ?', (email,))
+                if c.fetchone():
+                    return None
+                
+                # The salt lives inside the KDF hash; the column is only for legacy SHA-256 rows
+                c.execute('INSERT INTO users (email, password, name, salt) VALUES (?, ?, ?, ?)',
+                         (email, hashed, name, ''))
+                return c.lastrowid
         except Exception as e:
-            print(f"Database error: {e}")
+            log.error("Database error: %s", e)
             return None
     
     def verify_user(self, email, password):
-        conn = sqlite3.connect(str(DB_PATH))
-        c = conn.cursor()
-        
-        c.execute('SELECT id, password, salt, name FROM users WHERE email = ? AND is_active = 1', (email,))
-        user = c.fetchone()
+        user = pool.fetchone('SELECT id, password, salt, name FROM users WHERE email = ? AND is_active = 1', (email,))
         
         if user:
             user_id, stored_hash, salt, name = user
             
-            # Verify password
-            if hashlib.sha256((password + salt).encode()).hexdigest() == stored_hash:
-                # Update last login
-                c.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user_id,))
-                conn.commit()
-                conn.close()
+            # Verify password (raises PasswordBusy when the KDF queue is full)
+            matches, needs_rehash = self.passwords.verify(password, stored_hash, salt)
+            if matches:
+                # Legacy SHA-256 rows and outdated KDF costs are upgraded while we have the password
+                new_hash = self.passwords.hash(password) if needs_rehash else None
+                with pool.transaction() as c:
+                    if new_hash:
+                        c.execute('UPDATE users SET password = ?, salt = ? WHERE id = ?', (new_hash, '', user_id))
+                    c.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user_id,))
+                self.users.invalidate(user_id)
                 return {'id': user_id, 'name': name, 'email': email}
+        else:
+            # Same KDF cost as a known email, so timing doesn't tell which accounts exist
+            self.passwords.verify(password, DUMMY_HASH, '')
         
-        conn.close()
         return None
     
     def get_user(self, user_id):
-        conn = sqlite3.connect(str(DB_PATH))
-        c = conn.cursor()
-        
-        c.execute('SELECT id, email, name, created_at, last_login FROM users WHERE id = ? AND is_active = 1', (user_id,))
-        user = c.fetchone()
-        conn.close()
+        """Profile for an active user, cached briefly (see UserCache)"""
+        return self.users.get(user_id)
+    
+    def load_user(self, user_id):
+        user = pool.fetchone('SELECT id, email, name, created_at, last_login FROM users WHERE id = ? AND is_active = 1', (user_id,))
         
         if user:
             return {
@@ -155,27 +193,13 @@ class Database:
         return None
     
     def log_search(self, query, count, user_id=None):
-        try:
-            conn = sqlite3.connect(str(DB_PATH))
-            c = conn.cursor()
-            c.execute('INSERT INTO searches (user_id, query, result_count) VALUES (?, ?, ?)', 
-                     (user_id, query, count))
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"Log search error: {e}")
+        """Queue a search for the background writer; never blocks the request"""
+        # Dropped rows are counted in search_log.rows_dropped
+        if self.search_log.add((user_id, query, count, utc_timestamp())):
+            self.trending.record(query)
     
     def get_trending(self):
-        conn = sqlite3.connect(str(DB_PATH))
-        c = conn.cursor()
-        c.execute('''SELECT query, COUNT(*) as count 
-                     FROM searches 
-                     WHERE timestamp > datetime('now', '-7 days')
-                     GROUP BY query 
-                     ORDER BY count DESC 
-                     LIMIT 6''')
-        results = c.fetchall()
-        conn.close()
+        results = self.trending.top(6)
         
         icons = ['📱', '👟', '💻', '🎧', '⌚', '📚']
         trending = []
@@ -184,7 +208,8 @@ class Database:
             for i, (name, count) in enumerate(results[:6]):
                 trending.append({
                     'name': name.title(),
-                    'searches': count * 10 + random.randint(20, 50),
+                    # Fixed per name (not random per request) so the response, and its ETag, stay stable
+                    'searches': count * 10 + 20 + zlib.crc32(name.encode()) % 31,
                     'icon': icons[i] if i < len(icons) else '🛍️'
                 })
         
@@ -204,18 +229,9 @@ class Database:
 # ==================== PRICE SCRAPER ====================
 class PriceScraper:
     def __init__(self):
-        self.platforms = [
-            {'name': 'Amazon', 'icon': '📦', 'color': '#FF9900'},
-            {'name': 'Flipkart', 'icon': '🛒', 'color': '#047BD5'},
-            {'name': 'Myntra', 'icon': '👕', 'color': '#FF3F6C'},
-            {'name': 'Reliance Digital', 'icon': '🔷', 'color': '#0078FF'},
-            {'name': 'Croma', 'icon': '🔴', 'color': '#E42529'},
-            {'name': 'Tata CLiQ', 'icon': '⚡', 'color': '#000000'}
-        ]
+        self.platforms = list(PLATFORMS)
     
-    def generate_realistic_data(self, query):
-        products = []
-        
+    def base_price(self, query):
         # Base price based on product type
         base_prices = {
             'iphone': 75000,
@@ -233,69 +249,160 @@ class PriceScraper:
         }
         
         query_lower = query.lower()
-        base_price = 25000  # Default
-        
         for keyword, price in base_prices.items():
             if keyword in query_lower:
-                base_price = price
-                break
-        
-        for i, platform in enumerate(self.platforms):
-            # Generate realistic price variations
-            variation = random.uniform(0.85, 1.15)
-            price = int(base_price * variation)
-            price = round(price / 100) * 100  # Round to nearest 100
-            
-            original_price = int(price * random.uniform(1.1, 1.3))
-            discount = int(((original_price - price) / original_price) * 100)
-            
-            product = {
-                'platform': platform['name'],
-                'platform_icon': platform['icon'],
-                'platform_color': platform['color'],
-                'title': f"{query.title()} - {platform['name']} Exclusive",
-                'price': price,
-                'original_price': original_price,
-                'discount_percent': discount,
-                'rating': round(random.uniform(3.5, 4.8), 1),
-                'reviews_count': random.randint(100, 50000),
-                'url': f"https://www.{platform['name'].lower().replace(' ', '')}.com/search?q={query.replace(' ', '+')}",
-                'stock_status': random.choices(['In Stock', 'Limited Stock', 'Out of Stock'], 
-                                              weights=[0.7, 0.2, 0.1])[0],
-                'shipping': random.choice(['FREE Delivery', 'FREE Shipping', '₹49 Shipping']),
-                'delivery': f"{random.randint(1, 3)}-{random.randint(3, 7)} days",
-                'seller': f"{platform['name']} {random.choice(['Authorized', 'Certified', 'Official'])} Seller",
-                'category': 'electronics' if any(word in query_lower for word in ['phone', 'laptop', 'tablet', 'camera']) else 'fashion',
-                'is_best_price': False
-            }
-            products.append(product)
+                return price
+        return 25000  # Default
+    
+    def generate_platform_product(self, query, platform, base_price):
+        query_lower = query.lower()
         
-        # Mark best price
+        # Generate realistic price variations
+        variation = random.uniform(0.85, 1.15)
+        price = int(base_price * variation)
+        price = round(price / 100) * 100  # Round to nearest 100
+        
+        original_price = int(price * random.uniform(1.1, 1.3))
+        discount = int(((original_price - price) / original_price) * 100)
+        
+        return Product(
+            platform=platform,
+            title=f"{query.title()} - {platform} Exclusive",
+            price=price,
+            original_price=original_price,
+            discount_percent=discount,
+            rating=round(random.uniform(3.5, 4.8), 1),
+            reviews_count=random.randint(100, 50000),
+            url=f"https://www.{platform.lower().replace(' ', '')}.com/search?q={query.replace(' ', '+')}",
+            stock_status=random.choices(['In Stock', 'Limited Stock', 'Out of Stock'], 
+                                        weights=[0.7, 0.2, 0.1])[0],
+            shipping=random.choice(['FREE Delivery', 'FREE Shipping', '₹49 Shipping']),
+            delivery=intern(f"{random.randint(1, 3)}-{random.randint(3, 7)} days"),
+            seller=intern(f"{platform} {random.choice(['Authorized', 'Certified', 'Official'])} Seller"),
+            category='electronics' if any(word in query_lower for word in ['phone', 'laptop', 'tablet', 'camera']) else 'fashion'
+        )
+    
+    def iter_platform_results(self, query):
+        """Yield (platform name, products) one platform at a time, as they become available"""
+        base_price = self.base_price(query)
+        for platform in self.platforms:
+            with SCRAPE_SECONDS.time(platform=platform):
+                products = [self.generate_platform_product(query, platform, base_price)]
+            SCRAPE_RESULTS.inc(platform=platform, outcome='ok')
+            yield platform, products
+    
+    def rank_products(self, products):
+        """Sort by price and mark the cheapest offer"""
+        products.sort(key=lambda x: x.price)
+        for product in products:
+            product.is_best_price = False
         if products:
-            products.sort(key=lambda x: x['price'])
-            products[0]['is_best_price'] = True
-        
+            products[0].is_best_price = True
         return products
+    
+    def generate_realistic_data(self, query):
+        products = []
+        for _, platform_products in self.iter_platform_results(query):
+            products.extend(platform_products)
+        return self.rank_products(products)
 
 # ==================== AI PREDICTOR ====================
 class AIPredictor:
+    """Forecasts the next 7 days from price_history with the trained model in ml_model.py
+
+    The model is loaded once when the worker imports the app (and warmed up
+    by gunicorn's post_worker_init hook), never per request. Products
+    without enough history, or a worker without a trained model, fall back
+    to the heuristic forecast.
+    """
+    
+    # How often to check whether the model file was retrained (seconds)
+    RELOAD_CHECK_INTERVAL = 300
+    
     def __init__(self):
-        print("✅ AIPredictor initialized")
-        self.model = None
+        self.model = self.load_or_create_model()
+        self._reload_checked_at = time.time()
+        log.info("✅ AIPredictor initialized")
     
     def load_or_create_model(self):
-        return None
+        return PricePredictor(MODEL_PATH)
+    
+    def warm_up(self):
+        """Run one throwaway prediction so the first request doesn't pay for lazy setup"""
+        if self.model.is_trained:
+            self.model.predict_horizon(np.ones(WINDOW))
+    
+    def _maybe_reload(self):
+        if time.time() - self._reload_checked_at > self.RELOAD_CHECK_INTERVAL:
+            self._reload_checked_at = time.time()
+            self.model.reload_if_changed()
+    
+    def forecast_many(self, items):
+        """Forecasts for [(product_name, current_price), ...] with one DB query and one model call
+
+        Returns a list aligned with items: ([7 prices], [7 confidences]) or
+        None where the model can't be used for that product.
+        """
+        self._maybe_reload()
+        results = [None] * len(items)
+        if not self.model.is_trained or not items:
+            return results
+        
+        series = load_daily_series_many([name for name, _ in items], days=WINDOW * 4)
+        
+        rows, windows = [], []
+        for i, (name, current_price) in enumerate(items):
+            history = series.get(normalize_query(name))
+            if history is not None and len(history) >= WINDOW and current_price:
+                rows.append(i)
+                windows.append(history[-WINDOW:] * (current_price / history[-1]))
+        if not rows:
+            return results
+        
+        current = np.array([items[i][1] for i in rows], dtype=np.float64).reshape(-1, 1)
+        prices = np.maximum(self.model.predict_horizon_many(np.vstack(windows)), current * 0.85).astype(int)
+        
+        # Forest quality on held-out samples, fading with distance into the future
+        base_confidence = self.model.score if self.model.score is not None else 0.8
+        base_confidence = min(max(base_confidence, 0.5), 0.95)
+        confidences = [round(base_confidence * (1 - 0.02 * i), 2) for i in range(HORIZON)]
+        
+        for row, i in enumerate(rows):
+            results[i] = (prices[row].tolist(), confidences)
+        return results
+    
+    def forecast(self, current_price, product_name):
+        """Seven predicted prices and a confidence per day; None when the model can't be used"""
+        return self.forecast_many([(product_name, current_price)])[0]
+    
+    def predict_many(self, items):
+        """Predictions for [(product_name, current_price), ...], keyed by product name"""
+        forecasts = self.forecast_many(items)
+        return {
+            name: self.build_prediction(current_price, forecast)
+            for (name, current_price), forecast in zip(items, forecasts)
+        }
     
     def predict(self, current_price, product_name):
+        return self.build_prediction(current_price, self.forecast(current_price, product_name))
+    
+    def build_prediction(self, current_price, forecast):
+        """Response payload for one product from a forecast (or the heuristic when it's None)"""
         predictions = []
         days = ['Tomorrow', 'Day 2', 'Day 3', 'Day 4', 'Day 5', 'Day 6', 'Day 7']
         day_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
         
         # Generate predictions
         for i in range(7):
-            change = random.uniform(-0.04, 0.02)
-            predicted_price = int(current_price * (1 + change))
-            predicted_price = max(predicted_price, int(current_price * 0.85))
+            if forecast:
+                predicted_price = forecast[0][i]
+                change = predicted_price / current_price - 1
+                confidence = forecast[1][i]
+            else:
+                change = random.uniform(-0.04, 0.02)
+                predicted_price = int(current_price * (1 + change))
+                predicted_price = max(predicted_price, int(current_price * 0.85))
+                confidence = round(random.uniform(0.75, 0.92), 2)
             
             predictions.append({
                 'date': days[i],
@@ -303,7 +410,7 @@ class AIPredictor:
                 'predicted_price': predicted_price,
                 'change_percent': round(change * 100, 1),
                 'is_cheaper': change < 0,
-                'confidence': round(random.uniform(0.75, 0.92), 2)
+                'confidence': confidence
             })
         
         # Find best day to buy
@@ -330,73 +437,206 @@ class AIPredictor:
                 'day': best_day['day'],
                 'savings': int(savings)
             },
-            'model_confidence': round(random.uniform(0.82, 0.95), 2)
+            'model_confidence': max(p['confidence'] for p in predictions) if forecast else round(random.uniform(0.82, 0.95), 2),
+            'model': 'random_forest' if forecast else 'heuristic'
         }
 
 # ==================== INITIALIZE ====================
+def make_search_flight():
+    if SEARCH_SINGLE_FLIGHT == 'file':
+        return FileLockSingleFlight(SEARCH_FLIGHT_LOCK_DIR)
+    if SEARCH_SINGLE_FLIGHT == 'local':
+        return SingleFlight()
+    return None
+
+app.config['JWT_SECRET_KEY'] = load_jwt_secret()
+token_auth = TokenAuth(app.config['JWT_SECRET_KEY'])
 db = Database()
 scraper = PriceScraper()
 predictor = AIPredictor()
+static_assets = AssetStore()
+json_responses = JSONResponseOptimizer()
+search_cache = SearchCache(
+    ttl=SEARCH_CACHE_TTL,
+    stale_ttl=SEARCH_CACHE_STALE_TTL,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    shared=SQLiteCache(max_age=SEARCH_CACHE_TTL + SEARCH_CACHE_STALE_TTL) if SEARCH_CACHE_SHARED else None,
+    flight=make_search_flight()
+)
+
+def build_search_payload(query):
+    """Products, statistics and predictions for a query (the cacheable part of /api/search)"""
+    with SEARCH_STAGE_SECONDS.time(stage='scrape'):
+        products = scraper.generate_realistic_data(query)
+    return finish_search_payload(query, products)
 
-def calculate_stats(products):
-    if not products:
-        return {}
+def finish_search_payload(query, products):
+    """Record scraped prices and add statistics and predictions for a complete, ranked product list"""
+    with SEARCH_STAGE_SECONDS.time(stage='history'):
+        price_history.record_products(query, products)
+    with SEARCH_STAGE_SECONDS.time(stage='stats'):
+        stats = calculate_stats(products)
+    with SEARCH_STAGE_SECONDS.time(stage='predict'):
+        predictions = predictor.predict(stats['lowest_price'], query)
+    return {
+        'results': products,
+        'platforms': platform_meta(p.platform for p in products),
+        'statistics': stats,
+        'predictions': predictions,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def iter_search_events(query, user_id=None):
+    """Events for /api/search/stream: products per platform as they arrive, running
+    statistics after each platform, then the final statistics and the prediction
+    """
+    started = time.perf_counter()
     
-    prices = [p['price'] for p in products]
-    originals = [p['original_price'] for p in products]
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000, 1)
     
-    return {
-        'lowest_price': min(prices),
-        'highest_price': max(prices),
-        'average_price': int(sum(prices) / len(prices)),
-        'stores_compared': len(products),
-        'max_savings': int(max(originals) - min(prices)),
-        'average_discount': int(((sum(originals) - sum(prices)) / sum(originals)) * 100),
-        'best_platform': min(products, key=lambda x: x['price'])['platform']
+    first_result_ms = None
+    key = normalize_query(query)
+    
+    yield {'type': 'start', 'query': query, 'platforms': platform_meta(scraper.platforms)}
+    
+    # A stale entry is served and refreshed in the background, as for /api/search
+    payload = search_cache.get_cached(key, lambda: build_search_payload(query))
+    cached = payload is not None
+    if not cached:
+        # Misses go through the cache's single flight, from a helper thread since
+        # it only takes a callable. If this request leads, compute_streaming runs
+        # and passes each platform back as it arrives; if another request is
+        # already computing the query, this one gets that payload to replay.
+        events = queue.Queue()
+        leading = threading.Event()
+        
+        def compute_streaming():
+            leading.set()
+            products = []
+            for platform, platform_products in scraper.iter_platform_results(query):
+                if platform_products:
+                    products.extend(platform_products)
+                    events.put(('products', platform, platform_products))
+            return finish_search_payload(query, scraper.rank_products(products))
+        
+        def lead_or_follow():
+            try:
+                events.put(('payload', search_cache.compute(key, compute_streaming)))
+            except Exception as e:
+                events.put(('error', e))
+        
+        threading.Thread(target=lead_or_follow, name='search-stream', daemon=True).start()
+        products = []
+        while True:
+            kind, *item = events.get()
+            if kind == 'error':
+                raise item[0]
+            if kind == 'payload':
+                payload, = item
+                break
+            platform, platform_products = item
+            if first_result_ms is None:
+                first_result_ms = elapsed_ms()
+            products.extend(platform_products)
+            yield {'type': 'products', 'platform': platform, 'results': platform_products, 'elapsed_ms': elapsed_ms()}
+            yield {'type': 'statistics', 'statistics': calculate_stats(products), 'partial': True}
+        cached = not leading.is_set()
+    if cached:
+        # Replay per platform so clients handle one shape of stream
+        by_platform = {}
+        for product in payload['results']:
+            by_platform.setdefault(product['platform'], []).append(product)
+        first_result_ms = elapsed_ms()
+        for platform, platform_products in by_platform.items():
+            yield {'type': 'products', 'platform': platform, 'results': platform_products, 'elapsed_ms': elapsed_ms()}
+    
+    yield {'type': 'statistics', 'statistics': payload['statistics'], 'partial': False}
+    yield {'type': 'predictions', 'predictions': payload['predictions'], 'elapsed_ms': elapsed_ms()}
+    
+    db.log_search(query, len(payload['results']), user_id)
+    yield {
+        'type': 'done',
+        'count': len(payload['results']),
+        'cached': cached,
+        'first_result_ms': first_result_ms,
+        'total_ms': elapsed_ms(),
+        'timestamp': datetime.now().isoformat()
     }
 
 def generate_jwt_token(user_id):
-    payload = {
-        'user_id': user_id,
-        'exp': datetime.utcnow() + timedelta(days=7)
-    }
-    return jwt.encode(payload, app.config['JWT_SECRET_KEY'], algorithm='HS256')
+    return token_auth.issue(user_id)
 
 def validate_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
+def authenticate():
+    """(user_id, error) for the request's Bearer token; worked out once per request"""
+    if 'auth' not in g:
+        token = bearer_token(request.headers)
+        if not token:
+            g.auth = (None, 'Token is missing')
+        else:
+            try:
+                user_id = token_auth.verify(token).get('user_id')
+                g.auth = (user_id, None) if user_id is not None else (None, 'Invalid token')
+            except jwt.ExpiredSignatureError:
+                g.auth = (None, 'Token has expired')
+            except jwt.InvalidTokenError:
+                g.auth = (None, 'Invalid token')
+    return g.auth
+
 def token_required(f):
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({'success': False, 'error': 'Token is missing'}), 401
-        
-        try:
-            payload = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            request.user_id = payload['user_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({'success': False, 'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'success': False, 'error': 'Invalid token'}), 401
+        user_id, error = authenticate()
+        if error:
+            return jsonify({'success': False, 'error': error}), 401
         
+        request.user_id = user_id
         return f(*args, **kwargs)
     decorated.__name__ = f.__name__
     return decorated
 
+def get_optional_user_id():
+    """User id from a valid Bearer token, or None for anonymous requests"""
+    return authenticate()[0]
+
+# ==================== REQUEST METRICS ====================
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Streaming responses are timed up to the first byte (when the generator starts)
+    started = g.get('request_started')
+    if started is not None and request.path.startswith('/api/'):
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                     method=request.method, status=response.status_code)
+    return response
+
+# Registered after record_request_time so it runs first: the timer sees 304s and compression
+@app.after_request
+def optimize_json_response(response):
+    if request.path.startswith('/api/'):
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        response = json_responses.process(response, request, endpoint)
+    return response
+
 # ==================== STATIC FILE SERVING ====================
 @app.route('/')
 def serve_index():
-    return send_from_directory('frontend', 'index.html')
+    return static_assets.response('index.html', request)
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('frontend', filename)
+    response = static_assets.response(filename, request)
+    if response is None:
+        # Files the build doesn't cover (subfolders) still come from the source folder
+        response = send_from_directory('frontend', filename)
+    return response
 
 # ==================== API ROUTES ====================
 @app.route('/debug')
@@ -443,7 +683,10 @@ def register():
             return jsonify({'success': False, 'error': 'Name must be at least 2 characters'}), 400
         
         # Create user
-        user_id = db.create_user(email, password, name)
+        try:
+            user_id = db.create_user(email, password, name)
+        except PasswordBusy:
+            return jsonify({'success': False, 'error': 'Too many sign-ups right now, try again shortly'}), 503, {'Retry-After': '1'}
         
         if not user_id:
             return jsonify({'success': False, 'error': 'Email already registered'}), 400
@@ -463,7 +706,7 @@ def register():
         })
         
     except Exception as e:
-        print(f"Registration error: {e}")
+        log.error("Registration error: %s", e)
         return jsonify({'success': False, 'error': 'Registration failed'}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
@@ -476,7 +719,10 @@ def login():
         if not email or not password:
             return jsonify({'success': False, 'error': 'Email and password required'}), 400
         
-        user = db.verify_user(email, password)
+        try:
+            user = db.verify_user(email, password)
+        except PasswordBusy:
+            return jsonify({'success': False, 'error': 'Too many sign-ins right now, try again shortly'}), 503, {'Retry-After': '1'}
         
         if not user:
             return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
@@ -492,7 +738,7 @@ def login():
         })
         
     except Exception as e:
-        print(f"Login error: {e}")
+        log.error("Login error: %s", e)
         return jsonify({'success': False, 'error': 'Login failed'}), 500
 
 @app.route('/api/auth/me', methods=['GET'])
@@ -508,55 +754,206 @@ def get_current_user():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/search', methods=['POST'])
+@app.route('/api/search', methods=['GET', 'POST'])
 def search():
+    """Search all platforms; GET /api/search?product=... lets clients revalidate with If-None-Match"""
     try:
-        data = request.get_json()
-        query = data.get('product', '').strip()
+        if request.method == 'POST':
+            query = (request.get_json(silent=True) or {}).get('product', '').strip()
+        else:
+            query = request.args.get('product', '').strip()
         
         if not query or len(query) < 2:
             return jsonify({'success': False, 'error': 'Enter at least 2 characters'}), 400
         
-        print(f"\n🔍 Searching for: {query}")
+        log.debug("🔍 Searching for: %s", query)
         
         # Get user ID from token if available
-        user_id = None
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            try:
-                token = auth_header.split(' ')[1]
-                payload = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-                user_id = payload['user_id']
-            except:
-                pass
+        with SEARCH_STAGE_SECONDS.time(stage='auth'):
+            user_id = get_optional_user_id()
         
-        # Generate realistic products
-        products = scraper.generate_realistic_data(query)
+        # Products, statistics and predictions (served from cache when fresh)
+        with SEARCH_STAGE_SECONDS.time(stage='search'):
+            payload = search_cache.get_or_compute(normalize_query(query), lambda: build_search_payload(query))
+        products = payload['results']
+        stats = payload['statistics']
         
         # Log search
-        db.log_search(query, len(products), user_id)
+        with SEARCH_STAGE_SECONDS.time(stage='log_search'):
+            db.log_search(query, len(products), user_id)
+        
+        log.debug("✅ Found %d products, ₹%s - ₹%s", len(products), stats['lowest_price'], stats['highest_price'])
+        
+        with SEARCH_STAGE_SECONDS.time(stage='serialize'):
+            return jsonify({
+                'success': True,
+                'query': query,
+                'results': products,
+                # Payloads cached before platform metadata moved out of the products lack it
+                'platforms': payload.get('platforms') or platform_meta(p['platform'] for p in products),
+                'statistics': stats,
+                'predictions': payload['predictions'],
+                # When the prices were fetched, so a cached payload always serializes (and ETags) the same
+                'timestamp': payload.get('timestamp') or datetime.now().isoformat()
+            })
         
-        # Calculate statistics
-        stats = calculate_stats(products)
+    except Exception as e:
+        log.error("❌ Search error: %s", e)
+        return jsonify({'success': False, 'error': 'Search failed. Please try again.'}), 500
+
+@app.route('/api/search/stream', methods=['GET', 'POST'])
+def search_stream():
+    """Search results as each platform answers
+
+    NDJSON (one event per line) by default, or Server-Sent Events when the
+    client sends ``Accept: text/event-stream`` (EventSource uses GET with
+    ``?product=``).
+    """
+    if request.method == 'POST':
+        query = (request.get_json(silent=True) or {}).get('product', '').strip()
+    else:
+        query = request.args.get('product', '').strip()
+    
+    if not query or len(query) < 2:
+        return jsonify({'success': False, 'error': 'Enter at least 2 characters'}), 400
+    
+    user_id = get_optional_user_id()
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+    
+    def generate():
+        try:
+            for event in iter_search_events(query, user_id):
+                data = dumps(event)
+                yield f"event: {event['type']}\ndata: {data}\n\n" if use_sse else data + '\n'
+        except Exception as e:
+            log.error("❌ Streaming search error: %s", e)
+            error = dumps({'type': 'error', 'error': 'Search failed. Please try again.'})
+            yield f"event: error\ndata: {error}\n\n" if use_sse else error + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        # Keep proxies from buffering the stream into one late response
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        data = request.get_json() or {}
+        products = data.get('products', [])
         
-        # Generate AI predictions
-        predictions = predictor.predict(stats['lowest_price'], query)
+        if not isinstance(products, list) or not products:
+            return jsonify({'success': False, 'error': 'products must be a non-empty list'}), 400
+        
+        if len(products) > MAX_BATCH_PREDICTIONS:
+            return jsonify({'success': False, 'error': f'At most {MAX_BATCH_PREDICTIONS} products per request'}), 400
+        
+        items = []
+        for product in products:
+            name = str(product.get('name') or product.get('product_name') or '').strip()
+            current_price = product.get('current_price')
+            if not name or not isinstance(current_price, (int, float)) or current_price <= 0:
+                return jsonify({'success': False, 'error': 'Each product needs a name and a positive current_price'}), 400
+            items.append((name, current_price))
         
-        print(f"✅ Found {len(products)} products")
-        print(f"💰 Price range: ₹{stats['lowest_price']:,} - ₹{stats['highest_price']:,}")
+        predictions = predictor.predict_many(items)
         
         return jsonify({
             'success': True,
-            'query': query,
-            'results': products,
-            'statistics': stats,
-            'predictions': predictions,
-            'timestamp': datetime.now().isoformat()
+            'count': len(predictions),
+            'predictions': predictions
         })
         
     except Exception as e:
-        print(f"❌ Search error: {e}")
-        return jsonify({'success': False, 'error': 'Search failed. Please try again.'}), 500
+        log.error("Batch prediction error: %s", e)
+        return jsonify({'success': False, 'error': 'Prediction failed'}), 500
+
+@app.route('/api/watchlist/predictions', methods=['GET'])
+@token_required
+def watchlist_predictions():
+    try:
+        items = pool.fetchall('SELECT product_name, current_price FROM watchlist WHERE user_id = ? AND is_active = 1 AND current_price > 0',
+                              (request.user_id,))
+        predictions = predictor.predict_many([(name, price) for name, price in items])
+        
+        return jsonify({
+            'success': True,
+            'count': len(predictions),
+            'predictions': predictions
+        })
+        
+    except Exception as e:
+        log.error("Watchlist prediction error: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/history/stats', methods=['GET'])
+def history_statistics():
+    """Daily and per-platform price aggregates from price_history (?product=&days=30)
+
+    Medians and percentiles need raw observations, so the window is capped at
+    the raw retention (rollups.py); /api/history/series covers longer ranges.
+    """
+    try:
+        product = request.args.get('product', '').strip()
+        if not 2 <= len(product) <= MAX_PRODUCT_NAME_LENGTH:
+            return jsonify({'success': False, 'error': f'product must be 2-{MAX_PRODUCT_NAME_LENGTH} characters'}), 400
+        try:
+            days = int(request.args.get('days', 30))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'days must be a whole number'}), 400
+        days = min(max(days, 1), 365, price_history.rollups.retention_days['raw'])
+        
+        return jsonify({'success': True, 'product': product, 'days': days, **history_stats(product, days)})
+        
+    except Exception as e:
+        log.error("History stats error: %s", e)
+        return jsonify({'success': False, 'error': 'Could not load price history'}), 500
+
+@app.route('/api/history/series', methods=['GET'])
+def history_series():
+    """OHLC price points for charts (?product=&days=30&platform=&resolution=raw|hour|day)
+
+    Without ?resolution the coarsest one that still gives a useful number of points is used.
+    """
+    try:
+        product = request.args.get('product', '').strip()
+        if not 2 <= len(product) <= MAX_PRODUCT_NAME_LENGTH:
+            return jsonify({'success': False, 'error': f'product must be 2-{MAX_PRODUCT_NAME_LENGTH} characters'}), 400
+        try:
+            days = int(request.args.get('days', 30))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'days must be a whole number'}), 400
+        days = min(max(days, 1), 3650)
+        resolution = request.args.get('resolution') or None
+        if resolution not in (None, 'raw', 'hour', 'day'):
+            return jsonify({'success': False, 'error': 'resolution must be raw, hour or day'}), 400
+        platform = request.args.get('platform') or None
+        if platform is not None and platform not in PLATFORMS:
+            return jsonify({'success': False, 'error': f"platform must be one of {', '.join(PLATFORMS)}"}), 400
+        
+        resolution, points = price_history.rollups.series(product, days, platform, resolution)
+        return jsonify({'success': True, 'product': product, 'days': days, 'platform': platform,
+                        'resolution': resolution, 'points': points})
+        
+    except Exception as e:
+        log.error("History series error: %s", e)
+        return jsonify({'success': False, 'error': 'Could not load price history'}), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics summed over every worker process"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'success': True,
+        'search_cache': search_cache.stats(),
+        'auth': {'tokens': token_auth.stats, 'users': db.users.stats},
+        'static': static_assets.stats,
+        'json_responses': json_responses.stats()
+    })
 
 @app.route('/api/trending', methods=['GET'])
 def trending():
@@ -567,7 +964,7 @@ def trending():
             'trending': trending_data
         })
     except Exception as e:
-        print(f"Trending error: {e}")
+        log.error("Trending error: %s", e)
         return jsonify({
             'success': True,
             'trending': [
@@ -586,14 +983,8 @@ def get_watchlist():
     try:
         user_id = request.user_id
         
-        # Connect to database
-        conn = sqlite3.connect(str(DB_PATH))
-        c = conn.cursor()
-        
         # Get user's watchlist
-        c.execute('SELECT product_name, current_price, target_price, added_at FROM watchlist WHERE user_id = ? AND is_active = 1', (user_id,))
-        items = c.fetchall()
-        conn.close()
+        items = pool.fetchall('SELECT product_name, current_price, target_price, added_at FROM watchlist WHERE user_id = ? AND is_active = 1', (user_id,))
         
         watchlist_items = []
         for item in items:
@@ -611,7 +1002,7 @@ def get_watchlist():
         })
         
     except Exception as e:
-        print(f"Watchlist error: {e}")
+        log.error("Watchlist error: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/watchlist/add', methods=['POST'])
@@ -627,26 +1018,20 @@ def add_to_watchlist():
         
         user_id = request.user_id
         
-        # Connect to database
-        conn = sqlite3.connect(str(DB_PATH))
-        c = conn.cursor()
-        
-        # Check if already in watchlist
-        c.execute('SELECT id FROM watchlist WHERE user_id = ? AND product_name = ?', (user_id, product_name))
-        existing = c.fetchone()
-        
-        if existing:
-            # Update existing
-            c.execute('UPDATE watchlist SET current_price = ?, last_checked = CURRENT_TIMESTAMP WHERE id = ?', 
-                     (current_price, existing[0]))
-        else:
-            # Add new
-            target_price = current_price * 0.9  # 10% below current price
-            c.execute('INSERT INTO watchlist (user_id, product_name, current_price, target_price) VALUES (?, ?, ?, ?)',
-                     (user_id, product_name, current_price, target_price))
-        
-        conn.commit()
-        conn.close()
+        with pool.transaction() as c:
+            # Check if already in watchlist
+            c.execute('SELECT id FROM watchlist WHERE user_id = ? AND product_name = ?', (user_id, product_name))
+            existing = c.fetchone()
+            
+            if existing:
+                # Update existing
+                c.execute('UPDATE watchlist SET current_price = ?, last_checked = CURRENT_TIMESTAMP WHERE id = ?', 
+                         (current_price, existing[0]))
+            else:
+                # Add new
+                target_price = current_price * 0.9  # 10% below current price
+                c.execute('INSERT INTO watchlist (user_id, product_name, current_price, target_price) VALUES (?, ?, ?, ?)',
+                         (user_id, product_name, current_price, target_price))
         
         return jsonify({
             'success': True,
@@ -654,7 +1039,7 @@ def add_to_watchlist():
         })
         
     except Exception as e:
-        print(f"Add to watchlist error: {e}")
+        log.error("Add to watchlist error: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/auth/google', methods=['POST'])
@@ -666,25 +1051,17 @@ def google_auth():
         name = data.get('name', 'Google User')
         
         # Check if user exists
-        conn = sqlite3.connect(str(DB_PATH))
-        c = conn.cursor()
-        c.execute('SELECT id, name, email FROM users WHERE email = ?', (email,))
-        existing = c.fetchone()
-        
-        if existing:
-            user_id, name, email = existing
-        else:
-            # Create new user
-            salt = secrets.token_hex(16)
-            random_password = secrets.token_hex(8)
-            hashed = hashlib.sha256((random_password + salt).encode()).hexdigest()
+        with pool.transaction() as c:
+            c.execute('SELECT id, name, email FROM users WHERE email = ?', (email,))
+            existing = c.fetchone()
             
-            c.execute('INSERT INTO users (email, password, name, salt) VALUES (?, ?, ?, ?)',
-                     (email, hashed, name, salt))
-            user_id = c.lastrowid
-            conn.commit()
-        
-        conn.close()
+            if existing:
+                user_id, name, email = existing
+            else:
+                # Create new user; they sign in through the provider, never with a password
+                c.execute('INSERT INTO users (email, password, name, salt) VALUES (?, ?, ?, ?)',
+                         (email, unusable_password(), name, ''))
+                user_id = c.lastrowid
         
         # Generate token
         token = generate_jwt_token(user_id)
@@ -697,7 +1074,7 @@ def google_auth():
         })
         
     except Exception as e:
-        print(f"Google auth error: {e}")
+        log.error("Google auth error: %s", e)
         return jsonify({'success': False, 'error': 'Google authentication failed'}), 500
 
 @app.route('/api/auth/github', methods=['POST'])
@@ -709,25 +1086,17 @@ def github_auth():
         name = data.get('name', 'GitHub User')
         
         # Check if user exists
-        conn = sqlite3.connect(str(DB_PATH))
-        c = conn.cursor()
-        c.execute('SELECT id, name, email FROM users WHERE email = ?', (email,))
-        existing = c.fetchone()
-        
-        if existing:
-            user_id, name, email = existing
-        else:
-            # Create new user
-            salt = secrets.token_hex(16)
-            random_password = secrets.token_hex(8)
-            hashed = hashlib.sha256((random_password + salt).encode()).hexdigest()
+        with pool.transaction() as c:
+            c.execute('SELECT id, name, email FROM users WHERE email = ?', (email,))
+            existing = c.fetchone()
             
-            c.execute('INSERT INTO users (email, password, name, salt) VALUES (?, ?, ?, ?)',
-                     (email, hashed, name, salt))
-            user_id = c.lastrowid
-            conn.commit()
-        
-        conn.close()
+            if existing:
+                user_id, name, email = existing
+            else:
+                # Create new user; they sign in through the provider, never with a password
+                c.execute('INSERT INTO users (email, password, name, salt) VALUES (?, ?, ?, ?)',
+                         (email, unusable_password(), name, ''))
+                user_id = c.lastrowid
         
         # Generate token
         token = generate_jwt_token(user_id)
@@ -740,7 +1109,7 @@ def github_auth():
         })
         
     except Exception as e:
-        print(f"GitHub auth error: {e}")
+        log.error("GitHub auth error: %s", e)
         return jsonify({'success': False, 'error': 'GitHub authentication failed'}), 500
 
 if __name__ == '__main__':
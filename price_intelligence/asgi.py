@@ -0,0 +1,33 @@
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app, predictor
+from database import flush_all_writers
+
+# ASGI entry point, used by GUNICORN_WORKER_CLASS=uvicorn or directly:
+#   uvicorn asgi:application --port 10000
+# Flask views run on a thread pool behind the event loop, so slow clients and
+# idle keep-alive connections cost no thread; ASGI_THREADS caps in-flight views.
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 64))
+
+flask_app = WSGIMiddleware(app, workers=ASGI_THREADS)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            predictor.warm_up()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            flush_all_writers()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    else:
+        await flask_app(scope, receive, send)
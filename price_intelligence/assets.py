@@ -0,0 +1,435 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from flask import Response
+
+# Frontend files are built once into frontend/dist: CSS and JS minified and renamed
+# after their content (project.3f2a9c1d.js), index.html pointing at those names,
+# and a .gz (and .br, with `pip install brotli`) next to every file that compresses.
+# Each worker keeps the built files in memory and answers from there:
+#   hashed names  -> Cache-Control: immutable for a year (a new build is a new name)
+#   index.html &c -> no-cache, revalidated with ETag / If-None-Match (304)
+# gunicorn builds in the master before forking (gunicorn_config.on_starting);
+# `python assets.py` builds by hand, e.g. for a CDN or nginx gzip_static to serve dist/.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, 'frontend')
+DIST_DIR = os.path.join(SOURCE_DIR, 'dist')
+MANIFEST_NAME = 'assets.json'
+
+# Files worth renaming by content: they are only ever referenced from index.html
+HASHED_EXTENSIONS = ('.css', '.js')
+COMPRESSIBLE_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg', '.txt')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# STATIC_AUTO_REBUILD=1 rebuilds when a source file changes (for frontend work)
+STATIC_AUTO_REBUILD = os.environ.get('STATIC_AUTO_REBUILD', '0') == '1'
+
+
+# ==================== MINIFICATION ====================
+JS_REGEX_PREFIX_WORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                         'throw', 'instanceof', 'yield', 'await'}
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch in '_$' or ord(ch) > 127
+
+
+def minify_js(source):
+    """Drop comments and indentation; strings, templates and regex literals are copied as is
+
+    Line breaks are kept (one per run of blank lines), so automatic semicolon
+    insertion sees the same statements as in the source.
+    """
+    out = []
+    i, n = 0, len(source)
+    braces = []  # 'code' for a plain {, 'template' for a ${ inside a template literal
+    pending_space = pending_newline = False
+
+    def last_char():
+        return out[-1][-1] if out else ''
+
+    def last_word():
+        match = re.search(r'[\w$]+$', out[-1]) if out else None
+        return match.group(0) if match else ''
+
+    def emit(text):
+        nonlocal pending_space, pending_newline
+        if out:
+            prev, nxt = last_char(), text[0]
+            if pending_newline:
+                out.append('\n')
+            elif pending_space and ((_is_word_char(prev) and _is_word_char(nxt)) or
+                                    (prev in '+-/' and nxt == prev)):
+                out.append(' ')
+        pending_space = pending_newline = False
+        out.append(text)
+
+    def read_template(start):
+        """Copy a template literal chunk from `start` (just after ` or }) to the closing ` or ${"""
+        j = start
+        while j < n:
+            if source[j] == '\\':
+                j += 2
+            elif source[j] == '`':
+                return j + 1, False
+            elif source.startswith('${', j):
+                return j + 2, True
+            else:
+                j += 1
+        return n, False
+
+    while i < n:
+        ch = source[i]
+        if ch in ' \t\r\n\f\v':
+            if ch == '\n':
+                pending_newline = True
+            else:
+                pending_space = True
+            i += 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end < 0 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            if '\n' in source[i:end]:
+                pending_newline = True
+            else:
+                pending_space = True
+            i = end
+        elif ch in '"\'':
+            j = i + 1
+            while j < n and source[j] != ch:
+                j += 2 if source[j] == '\\' else 1
+            emit(source[i:j + 1])
+            i = j + 1
+        elif ch == '`':
+            j, opened = read_template(i + 1)
+            emit(source[i:j])
+            if opened:
+                braces.append('template')
+            i = j
+        elif ch == '}' and braces and braces[-1] == 'template':
+            braces.pop()
+            j, opened = read_template(i + 1)
+            emit(source[i:j])
+            if opened:
+                braces.append('template')
+            i = j
+        elif ch == '/' and (not out or last_char() in '(,=:[!&|?{};+-*%<>~^' or
+                            last_word() in JS_REGEX_PREFIX_WORDS):
+            j, in_class = i + 1, False
+            while j < n and (in_class or source[j] != '/') and source[j] != '\n':
+                if source[j] == '\\':
+                    j += 1
+                elif source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                j += 1
+            emit(source[i:j + 1])
+            i = j + 1
+        else:
+            if ch == '{':
+                braces.append('code')
+            elif ch == '}' and braces:
+                braces.pop()
+            j = i + 1
+            if _is_word_char(ch):
+                while j < n and _is_word_char(source[j]):
+                    j += 1
+            emit(source[i:j])
+            i = j
+    return ''.join(out) + '\n'
+
+
+def minify_css(source):
+    """Drop comments and collapse whitespace; strings are copied as is"""
+    def squeeze(code):
+        code = re.sub(r'\s+', ' ', code)
+        code = re.sub(r' ?([{};,>]) ?', r'\1', code)
+        return code.replace(': ', ':')
+
+    out, code = [], []
+    for token in re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/)', source, flags=re.S):
+        if token[:1] in ('"', "'"):
+            out.append(squeeze(''.join(code)))
+            out.append(token)
+            code = []
+        else:
+            code.append(' ' if token.startswith('/*') else token)
+    out.append(squeeze(''.join(code)))
+    css = ''.join(out).strip()
+    return re.sub(r';}', '}', css) + '\n'
+
+
+def minify_html(source):
+    """Drop comments and indentation outside <pre>, <textarea>, <script> and <style>"""
+    parts = re.split(r'(<(pre|textarea|script|style)\b.*?</\2>)', source, flags=re.S | re.I)
+    out = []
+    for index, part in enumerate(parts):
+        if index % 3 == 2:
+            continue  # the tag name captured by the inner group
+        if index % 3 == 1:
+            out.append(part)
+            continue
+        part = re.sub(r'<!--(?!\[if).*?-->', '', part, flags=re.S)
+        out.append(re.sub(r'\n\s+', '\n', part))
+    return ''.join(out)
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css, '.html': minify_html}
+
+
+# ==================== BUILD ====================
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _write(path, data):
+    tmp = f'{path}.tmp{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _compressed_variants(data, extension):
+    """{'gzip': bytes, 'br': bytes} for the encodings that make the file smaller"""
+    variants = {}
+    if extension not in COMPRESSIBLE_EXTENSIONS:
+        return variants
+    # mtime=0 keeps the .gz byte-identical between builds
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        variants['gzip'] = gz
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            variants['br'] = br
+    return variants
+
+
+ENCODING_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+
+def source_files(source_dir=SOURCE_DIR):
+    return sorted(name for name in os.listdir(source_dir)
+                  if os.path.isfile(os.path.join(source_dir, name)) and not name.startswith('.'))
+
+
+def source_mtime(source_dir=SOURCE_DIR):
+    return max((os.path.getmtime(os.path.join(source_dir, name)) for name in source_files(source_dir)), default=0)
+
+
+def read_manifest(dist_dir=DIST_DIR):
+    try:
+        with open(os.path.join(dist_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_stale(source_dir=SOURCE_DIR, dist_dir=DIST_DIR):
+    manifest = read_manifest(dist_dir)
+    return manifest is None or manifest.get('source_mtime') != source_mtime(source_dir)
+
+
+def build(source_dir=SOURCE_DIR, dist_dir=DIST_DIR):
+    """Minify, hash and precompress every file in source_dir into dist_dir; returns the manifest
+
+    Hashed files from the previous build are kept (and listed under
+    'previous'), so pages loaded just before a deploy can still fetch their
+    scripts; anything older is removed.
+    """
+    os.makedirs(dist_dir, exist_ok=True)
+    previous = read_manifest(dist_dir) or {'files': {}}
+    mtime = source_mtime(source_dir)
+    outputs = {}
+    names = source_files(source_dir)
+
+    # Hashed assets first: index.html needs their final names
+    renamed = {}
+    for name in sorted(names, key=lambda name: name.endswith(HASHED_EXTENSIONS), reverse=True):
+        stem, extension = os.path.splitext(name)
+        with open(os.path.join(source_dir, name), 'rb') as f:
+            data = f.read()
+        minify = MINIFIERS.get(extension)
+        if minify:
+            text = data.decode('utf-8')
+            if extension == '.html':
+                text = _rewrite_references(text, renamed)
+            data = minify(text).encode('utf-8')
+        digest = content_hash(data)
+        immutable = extension in HASHED_EXTENSIONS
+        path = f'{stem}.{digest[:8]}{extension}' if immutable else name
+        if immutable:
+            renamed[name] = path
+
+        _write(os.path.join(dist_dir, path), data)
+        variants = _compressed_variants(data, extension)
+        for encoding, body in variants.items():
+            _write(os.path.join(dist_dir, path + ENCODING_SUFFIXES[encoding]), body)
+        outputs[name] = {
+            'path': path,
+            'hash': digest,
+            'immutable': immutable,
+            'content_type': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            'size': len(data),
+            'encodings': {encoding: len(body) for encoding, body in variants.items()}
+        }
+
+    current = {entry['path'] for entry in outputs.values()}
+    kept = {entry['path']: entry for entry in previous['files'].values()
+            if entry['immutable'] and entry['path'] not in current}
+    if not kept:
+        # Nothing changed since the last build: its 'previous' files are still the ones to keep
+        kept = {path: entry for path, entry in previous.get('previous', {}).items() if path not in current}
+    manifest = {'source_mtime': mtime, 'files': outputs, 'previous': kept}
+    _write(os.path.join(dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    _prune(dist_dir, [*outputs.values(), *kept.values()])
+    return manifest
+
+
+def _rewrite_references(html, renamed):
+    """src="project.js" -> src="project.3f2a9c1d.js" for every renamed file"""
+    def replace(match):
+        attr, quote, url = match.groups()
+        prefix = '/' if url.startswith('/') else ''
+        target = renamed.get(url.lstrip('./'))
+        return f'{attr}={quote}{prefix}{target}{quote}' if target else match.group(0)
+    return re.sub(r'\b(src|href)=(["\'])([^"\']+)\2', replace, html)
+
+
+def _prune(dist_dir, entries):
+    keep = {MANIFEST_NAME}
+    for entry in entries:
+        keep.add(entry['path'])
+        keep.update(entry['path'] + suffix for suffix in ENCODING_SUFFIXES.values())
+    for name in os.listdir(dist_dir):
+        if name not in keep and '.tmp' not in name:
+            try:
+                os.remove(os.path.join(dist_dir, name))
+            except OSError:
+                pass
+
+
+# ==================== SERVING ====================
+class Asset:
+    __slots__ = ('content_type', 'etag', 'cache_control', 'bodies')
+
+    def __init__(self, content_type, etag, cache_control, bodies):
+        self.content_type = content_type
+        self.etag = etag  # content hash of the identity body, unquoted
+        self.cache_control = cache_control
+        self.bodies = bodies  # encoding -> bytes, always including 'identity'
+
+    def etag_for(self, encoding):
+        # Each encoding is a different representation, so it gets its own strong validator
+        return f'"{self.etag}"' if encoding == 'identity' else f'"{self.etag}-{encoding}"'
+
+
+class AssetStore:
+    """The built frontend in memory, served with negotiated encoding and validators
+
+    Hashed paths (this build's and the previous one's) are immutable;
+    logical names (index.html, project.js, ...) are served with no-cache so
+    browsers revalidate them and get a 304. Unknown paths return None.
+    """
+
+    def __init__(self, source_dir=SOURCE_DIR, dist_dir=DIST_DIR, auto_rebuild=STATIC_AUTO_REBUILD):
+        self.source_dir = source_dir
+        self.dist_dir = dist_dir
+        self.auto_rebuild = auto_rebuild
+        self.assets = {}
+        self.source_mtime = None
+        self.stats = {'served': 0, 'not_modified': 0, 'bytes_sent': 0}
+        self.load()
+
+    def load(self):
+        """Build if dist is missing or older than the sources, then read it into memory"""
+        if is_stale(self.source_dir, self.dist_dir):
+            build(self.source_dir, self.dist_dir)
+        manifest = read_manifest(self.dist_dir)
+        assets = {}
+        entries = [*manifest['files'].items(), *manifest.get('previous', {}).items()]
+        for name, entry in entries:
+            bodies = {}
+            for encoding in ['identity', *entry['encodings']]:
+                suffix = ENCODING_SUFFIXES.get(encoding, '')
+                with open(os.path.join(self.dist_dir, entry['path'] + suffix), 'rb') as f:
+                    bodies[encoding] = f.read()
+            content_type = entry['content_type']
+            if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+                content_type += '; charset=utf-8'
+            etag = entry['hash']
+            assets[entry['path']] = Asset(content_type, etag,
+                                          IMMUTABLE_CACHE_CONTROL if entry['immutable'] else REVALIDATE_CACHE_CONTROL,
+                                          bodies)
+            if entry['path'] != name:
+                # The unhashed name still works (bookmarks, old pages), but must be revalidated
+                assets[name] = Asset(content_type, etag, REVALIDATE_CACHE_CONTROL, bodies)
+        self.assets = assets
+        self.source_mtime = manifest['source_mtime']
+
+    def get(self, path):
+        if self.auto_rebuild and source_mtime(self.source_dir) != self.source_mtime:
+            self.load()
+        return self.assets.get(path)
+
+    @staticmethod
+    def choose_encoding(asset, accept_encodings):
+        """br, then gzip, then identity: the first the client accepts that we have"""
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.bodies and accept_encodings[encoding]:
+                return encoding
+        return 'identity'
+
+    def response(self, path, request):
+        """Response for a frontend path, or None if it isn't part of the build"""
+        asset = self.get(path)
+        if asset is None:
+            return None
+        encoding = self.choose_encoding(asset, request.accept_encodings)
+        etag = asset.etag_for(encoding)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': asset.cache_control,
+            'Vary': 'Accept-Encoding'
+        }
+        if request.if_none_match and (request.if_none_match.star_tag or
+                                      any(request.if_none_match.contains(asset.etag_for(e)[1:-1])
+                                          for e in asset.bodies)):
+            self.stats['not_modified'] += 1
+            return Response(status=304, headers=headers)
+
+        body = asset.bodies[encoding]
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        self.stats['served'] += 1
+        self.stats['bytes_sent'] += len(body)
+        return Response(body, content_type=asset.content_type, headers=headers)
+
+
+def main():
+    manifest = build()
+    print(f'Built {len(manifest["files"])} files into {DIST_DIR}' + ('' if brotli else ' (no brotli module: gzip only)'))
+    for name, entry in sorted(manifest['files'].items()):
+        with open(os.path.join(SOURCE_DIR, name), 'rb') as f:
+            original = len(f.read())
+        sizes = '  '.join(f'{encoding} {size:>7,}' for encoding, size in entry['encodings'].items())
+        print(f"  {name:<16} {original:>8,} -> {entry['size']:>8,}  {sizes}  {entry['path']}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+
+import jwt
+
+from cache import TTLCache
+from database import DATA_DIR
+from logs import get_logger
+
+log = get_logger('auth')
+
+JWT_ALGORITHM = 'HS256'
+JWT_TTL = timedelta(days=int(os.environ.get('JWT_TTL_DAYS', 7)))
+JWT_SECRET_FILE = os.path.join(DATA_DIR, 'jwt_secret')
+
+# Verified tokens and user profiles kept per worker
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', 4096))
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 4096))
+
+
+def load_jwt_secret(path=JWT_SECRET_FILE):
+    """JWT_SECRET_KEY from the environment, else a key file shared by every worker on this host
+
+    The file is created once (O_EXCL, so concurrent workers agree on one key).
+    """
+    secret = os.environ.get('JWT_SECRET_KEY')
+    if secret:
+        return secret
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path) as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+        # Another worker created the file but hasn't written it yet
+        time.sleep(0.1)
+        with open(path) as f:
+            return f.read().strip()
+    secret = secrets.token_hex(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(secret)
+    log.warning("⚠️ JWT_SECRET_KEY not set; generated one in %s (set it in the environment for multi-host deploys)", path)
+    return secret
+
+
+class TokenAuth:
+    """Issues and verifies the HS256 JWTs used as Bearer tokens
+
+    Verified claims are cached by token string, each entry only until the
+    token's own ``exp``, so a cached token is never accepted past expiry.
+    Failures are not cached.
+    """
+
+    def __init__(self, secret, ttl=JWT_TTL, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+        self.secret = secret
+        self.ttl = ttl
+        self.cache = TTLCache(max_entries=max_entries)
+        self.stats = {'hits': 0, 'misses': 0, 'rejected': 0}
+
+    def issue(self, user_id):
+        payload = {'user_id': user_id, 'exp': datetime.utcnow() + self.ttl}
+        return jwt.encode(payload, self.secret, algorithm=JWT_ALGORITHM)
+
+    def verify(self, token):
+        """Claims for a token; raises jwt.ExpiredSignatureError / jwt.InvalidTokenError"""
+        entry = self.cache.get(token)
+        if entry is not None:
+            claims = entry[0]
+            if claims['exp'] > time.time():
+                self.stats['hits'] += 1
+                return claims
+            self.cache.delete(token)
+            raise jwt.ExpiredSignatureError('Signature has expired')
+
+        self.stats['misses'] += 1
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[JWT_ALGORITHM])
+        except jwt.InvalidTokenError:
+            self.stats['rejected'] += 1
+            raise
+        if 'exp' in claims:
+            self.cache.set(token, claims)
+        return claims
+
+
+def bearer_token(headers):
+    """Token from an 'Authorization: Bearer <token>' header, or None"""
+    auth_header = headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header[7:].strip() or None
+    return None
+
+
+class UserCache:
+    """User profiles by id for ``ttl`` seconds
+
+    Call ``invalidate`` whenever a user row changes. Other workers only
+    notice after ``ttl``, so keep it short.
+    """
+
+    def __init__(self, loader, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.loader = loader
+        self.ttl = ttl
+        self.cache = TTLCache(max_entries=max_entries)
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, user_id):
+        entry = self.cache.get(user_id)
+        if entry is not None and time.time() - entry[1] < self.ttl:
+            self.stats['hits'] += 1
+            return entry[0]
+        self.stats['misses'] += 1
+        user = self.loader(user_id)
+        # Unknown ids aren't cached, so a user created after a miss shows up at once
+        if user is not None and self.ttl > 0:
+            self.cache.set(user_id, user)
+        return user
+
+    def invalidate(self, user_id):
+        self.cache.delete(user_id)
@@ -0,0 +1,94 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import product_names
+from benchmarks.results import save
+from benchmarks.seed_db import scratch_database
+
+# Bytes on the wire per API request type: plain JSON, gzip, brotli (if installed)
+# and a revalidation that ends in 304, plus the CPU each encoding costs per response.
+# Runs the app in-process on a copy of a seeded database (or a small fresh one):
+#   python -m benchmarks.bench_compression --db /tmp/pricesmart-bench.db --out compression.json
+
+
+def header_bytes(response):
+    # Status line and headers as sent over HTTP/1.1
+    return len(f'HTTP/1.1 {response.status}\r\n') + sum(len(k) + len(v) + 4 for k, v in response.headers.items()) + 2
+
+
+def cpu_us(fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - start) / repeat * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON response sizes with compression and conditional GET')
+    parser.add_argument('--db', help='seeded database to copy (benchmarks/seed_db.py)')
+    parser.add_argument('--out', help='write results JSON here instead of printing it')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='pricesmart-compression-')
+    try:
+        scratch_database(args.db, scratch)
+        os.environ.setdefault('SEARCH_CACHE_SHARED', '0')
+        import app as app_module
+        from compression import brotli, compress
+
+        client = app_module.app.test_client()
+        names = product_names(20)
+        user_id = app_module.pool.fetchone('SELECT user_id FROM watchlist GROUP BY user_id ORDER BY COUNT(*) DESC')[0]
+        auth = {'Authorization': f'Bearer {app_module.token_auth.issue(user_id)}'}
+        client.get(f'/api/search?product={names[0]}')  # cache the payload the search rows below revalidate
+
+        requests_by_type = {
+            'search': ('GET', f'/api/search?product={names[0]}', None, {}),
+            'trending': ('GET', '/api/trending', None, {}),
+            'watchlist': ('GET', '/api/watchlist', None, auth),
+            'watchlist_predictions': ('GET', '/api/watchlist/predictions', None, auth),
+            'history_stats': ('GET', f'/api/history/stats?product={names[0]}&days=30', None, {}),
+            'predict_batch_20': ('POST', '/api/predict/batch',
+                                 {'products': [{'name': n, 'current_price': 50000} for n in names]}, {}),
+        }
+        encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+
+        results = {}
+        for name, (method, path, body, headers) in requests_by_type.items():
+            row = {}
+            for encoding in encodings:
+                response = client.open(path, method=method, json=body, headers=dict(headers, **{'Accept-Encoding': encoding}))
+                row[f'{encoding}_bytes'] = len(response.data)
+                row[f'{encoding}_wire_bytes'] = len(response.data) + header_bytes(response)
+                etag = response.headers.get('ETag')
+            raw = client.open(path, method=method, json=body, headers=dict(headers, **{'Accept-Encoding': 'identity'})).data
+            for encoding in encodings[1:]:
+                row[f'{encoding}_cpu_us'] = cpu_us(lambda: compress(raw, encoding))
+            if method == 'GET' and etag:
+                revalidated = client.open(path, method=method, headers=dict(headers, **{'If-None-Match': etag}))
+                row['not_modified_status'] = revalidated.status_code
+                row['not_modified_wire_bytes'] = header_bytes(revalidated) + len(revalidated.data)
+            best = min(row[f'{e}_wire_bytes'] for e in encodings)
+            row['saved_percent'] = round((1 - best / row['identity_wire_bytes']) * 100, 1)
+            results[name] = row
+            print(f"{name:<22} json {row['identity_bytes']:>7,} B   gzip {row['gzip_bytes']:>6,} B"
+                  + (f"   br {row['br_bytes']:>6,} B" if 'br_bytes' in row else '')
+                  + (f"   revalidated: {row['not_modified_status']}, {row['not_modified_wire_bytes']:,} B on the wire"
+                     if 'not_modified_wire_bytes' in row else ''),
+                  file=sys.stderr)
+
+        save('compression', {'db': args.db, 'min_bytes': app_module.json_responses.min_bytes,
+                             'gzip_level': app_module.json_responses.gzip_level,
+                             'brotli': brotli is not None}, results, args.out)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import load_page, product_names
+from benchmarks.results import save
+from benchmarks.seed_db import scratch_database
+
+# Micro-benchmarks for the code on the search and alerting paths, on a copy of a
+# seeded database (benchmarks/seed_db.py) so history-dependent code has real data:
+#   python -m benchmarks.seed_db --db /tmp/pricesmart-bench.db
+#   python -m benchmarks.bench_hotpaths --db /tmp/pricesmart-bench.db --out hotpaths.json
+# Without --db a small database is seeded in a scratch directory first.
+# Scraper parsers run on the generated search pages, or on saved ones with --fixtures DIR.
+
+
+def measure(fn, seconds=1.0, min_calls=5):
+    """Call fn repeatedly for about `seconds`; per-call timings"""
+    fn()  # warm up
+    timings = []
+    deadline = time.perf_counter() + seconds
+    while len(timings) < min_calls or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'calls': len(timings),
+        'per_s': round(len(timings) / sum(timings), 1),
+        'mean_us': round(sum(timings) / len(timings) * 1e6, 1),
+        'p50_us': round(timings[len(timings) // 2] * 1e6, 1),
+        'p99_us': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6, 1)
+    }
+
+
+def stub_price_fetcher(fetch_ms):
+    """Deterministic re-pricing for check_all_watchlists, so the run measures our code, not the network"""
+    def fetch(product_name):
+        if fetch_ms:
+            time.sleep(fetch_ms / 1000)
+        base = zlib.crc32(product_name.encode()) % 150000 + 500
+        products = [{'platform': platform, 'price': base + i * 100}
+                    for i, platform in enumerate(('Amazon', 'Flipkart', 'Croma'))]
+        return base, products
+    return fetch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for search, stats, prediction, parsing and alerting')
+    parser.add_argument('--db', help='seeded database to copy (benchmarks/seed_db.py)')
+    parser.add_argument('--fixtures', help='directory with saved amazon.html / flipkart.html')
+    parser.add_argument('--seconds', type=float, default=1.0, help='time spent on each micro-benchmark')
+    parser.add_argument('--fetch-ms', type=float, default=0, help='simulated fetch latency in the watchlist check')
+    parser.add_argument('--skip-watchlist', action='store_true', help="don't run check_all_watchlists")
+    parser.add_argument('--out', help='write results JSON here instead of printing it')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='pricesmart-hotpaths-')
+    try:
+        scratch_database(args.db, scratch)
+        os.environ.setdefault('SEARCH_CACHE_SHARED', '0')
+        import app as app_module
+        from ml_model import PricePredictor
+        from scraper import scraper as real_scraper
+        from stats import calculate_stats
+
+        results = {}
+        scraper, predictor = app_module.scraper, app_module.predictor
+        queries = product_names(200)
+        position = [0]
+
+        def next_query():
+            position[0] = (position[0] + 1) % len(queries)
+            return queries[position[0]]
+
+        results['generate_realistic_data'] = measure(lambda: scraper.generate_realistic_data(next_query()), args.seconds)
+        six = scraper.generate_realistic_data('iphone 15')
+        many = [product for query in queries[:100] for product in scraper.generate_realistic_data(query)]
+        results['calculate_stats_6'] = measure(lambda: calculate_stats(six), args.seconds)
+        results['calculate_stats_600'] = measure(lambda: calculate_stats(many), args.seconds)
+
+        # Model trained on the copied history, saved in the scratch directory, never over data/
+        predictor.model = PricePredictor(os.path.join(scratch, 'price_model.pkl'))
+        started = time.perf_counter()
+        trained = predictor.model.train()
+        results['model_train_seconds'] = round(time.perf_counter() - started, 2)
+        predictor.warm_up()
+        results['predict'] = measure(lambda: predictor.predict(50000, next_query()), args.seconds)
+        results['predict_many_20'] = measure(
+            lambda: predictor.predict_many([(next_query(), 50000) for _ in range(20)]), args.seconds)
+
+        for name in ('amazon', 'flipkart'):
+            html = load_page(name, args.fixtures)
+            parse = getattr(real_scraper, f'parse_{name}')
+            results[f'parse_{name}'] = dict(measure(lambda: parse(html), args.seconds),
+                                            page_kb=round(len(html.encode()) / 1024, 1),
+                                            products=len(parse(html)))
+
+        if not args.skip_watchlist:
+            from alert import PriceAlertSystem
+            checker = PriceAlertSystem(price_fetcher=stub_price_fetcher(args.fetch_ms))
+            started = time.perf_counter()
+            checker.check_all_watchlists()
+            elapsed = time.perf_counter() - started
+            run = checker.last_run
+            results['check_all_watchlists'] = {
+                'seconds': round(elapsed, 3),
+                'items_checked': run.get('items_checked', 0),
+                'products_priced': run.get('products_priced', 0),
+                'items_per_s': round(run.get('items_checked', 0) / elapsed, 1) if elapsed else 0.0
+            }
+            checker.mailer.flush()
+
+        from database import pool
+        rows = {table: pool.fetchone(f'SELECT COUNT(*) FROM {table}')[0]
+                for table in ('users', 'searches', 'watchlist', 'price_history')}
+        save('hotpaths', {'db': args.db, 'fixtures': args.fixtures, 'seconds': args.seconds,
+                          'fetch_ms': args.fetch_ms, 'model_trained': trained, 'rows': rows},
+             results, args.out)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serialization
+from products import PLATFORMS, Product, platform_meta
+
+# python -m benchmarks.bench_json --products 6,60,600
+
+
+def make_products(n, seed=7):
+    rng = random.Random(seed)
+    names = list(PLATFORMS)
+    products = []
+    for i in range(n):
+        platform = names[i % len(names)]
+        price = rng.randint(500, 150000) // 100 * 100
+        original = int(price * rng.uniform(1.1, 1.3))
+        products.append(Product(
+            platform=platform,
+            title=f"Iphone 15 - {platform} Exclusive",
+            price=price,
+            original_price=original,
+            discount_percent=int((original - price) / original * 100),
+            rating=round(rng.uniform(3.5, 4.8), 1),
+            reviews_count=rng.randint(100, 50000),
+            url=f"https://www.{platform.lower().replace(' ', '')}.com/search?q=iphone+15",
+            stock_status=rng.choice(['In Stock', 'Limited Stock', 'Out of Stock']),
+            shipping=rng.choice(['FREE Delivery', 'FREE Shipping', '₹49 Shipping']),
+            delivery=f"{rng.randint(1, 3)}-{rng.randint(3, 7)} days",
+            seller=f"{platform} {rng.choice(['Authorized', 'Certified', 'Official'])} Seller",
+            category='electronics'
+        ))
+    products[0].is_best_price = True
+    return products
+
+
+def legacy_dict(product):
+    """The 15-key dict products used to be, platform icon and color included"""
+    d = product.to_dict()
+    d['platform_icon'] = PLATFORMS[product.platform]['icon']
+    d['platform_color'] = PLATFORMS[product.platform]['color']
+    return d
+
+
+def payload(results, platforms=None):
+    body = {
+        'success': True,
+        'query': 'iphone 15',
+        'results': results,
+        'statistics': {'lowest_price': 64400, 'highest_price': 82900, 'average_price': 74950,
+                       'stores_compared': len(results), 'best_platform': 'Croma'},
+        'predictions': {'trend': 'stable', 'confidence': 0.82, 'current_lowest_price': 64400},
+        'timestamp': '2024-05-01T12:00:00'
+    }
+    if platforms is not None:
+        body['platforms'] = platforms
+    return body
+
+
+def retained_bytes(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del kept
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search response size and serialization time, old vs new')
+    parser.add_argument('--products', default='6,60,600')
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = serialization.FastJSONProvider(app)
+    encoder = 'orjson' if serialization.orjson is not None else 'json (orjson not installed)'
+
+    print(f'fast provider uses {encoder}')
+    print(f"{'products':>8}  {'variant':<34} {'bytes':>8}  {'us/serialize':>12}")
+    for n in (int(size) for size in args.products.split(',')):
+        products = make_products(n)
+        old = payload([legacy_dict(p) for p in products])
+        new = payload(products, platform_meta(p.platform for p in products))
+
+        def without_orjson():
+            fast_json, serialization.orjson = serialization.orjson, None
+            try:
+                return fast.response(new).get_data()
+            finally:
+                serialization.orjson = fast_json
+
+        # What jsonify did before, and the new layout through both encoders
+        variants = [
+            ('dicts + per-product meta, Flask', lambda: stdlib.response(old).get_data()),
+            ('records + meta once, json', without_orjson),
+            ('records + meta once, orjson', lambda: fast.response(new).get_data()),
+        ]
+        with app.app_context():
+            assert json.loads(variants[1][1]()) == json.loads(variants[2][1]())
+            for name, fn in variants:
+                size = len(fn())
+                seconds = min(timeit.repeat(fn, number=args.number, repeat=3)) / args.number
+                print(f"{n:>8}  {name:<34} {size:>8}  {seconds * 1e6:>12.1f}")
+
+    n = 10000
+    dict_bytes = retained_bytes(lambda: [legacy_dict(p) for p in make_products(n)])
+    record_bytes = retained_bytes(lambda: make_products(n))
+    print(f'memory per product: dict {dict_bytes / n:.0f} B, Product {record_bytes / n:.0f} B')
+
+
+if __name__ == '__main__':
+    main()
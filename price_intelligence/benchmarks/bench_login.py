@@ -0,0 +1,92 @@
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import Pbkdf2Hasher, PasswordHasher, ScryptHasher, verify_legacy_sha256
+
+# python -m benchmarks.bench_login --storm 32 --workers 1,2,8
+#
+# 1. Password checks per second on one core for each scheme at its configured cost.
+# 2. A burst of concurrent logins through PasswordHasher while another thread does
+#    1 ms slices of Python work (standing in for other requests): how long logins
+#    take and how much the other work slows down, for several KDF pool sizes.
+
+
+def per_second(fn, seconds=2.0):
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def busy_slice(ms=1.0):
+    deadline = time.perf_counter() + ms / 1000
+    while time.perf_counter() < deadline:
+        pass
+
+
+def storm(workers, logins, stored):
+    hasher = PasswordHasher(kdf='scrypt', max_workers=workers, max_pending=logins, verified_ttl=0)
+    stop = threading.Event()
+    slices = []
+
+    def other_requests():
+        while not stop.is_set():
+            start = time.perf_counter()
+            busy_slice()
+            slices.append(time.perf_counter() - start)
+
+    def login():
+        assert hasher.verify('correct horse', stored)[0]
+
+    background = threading.Thread(target=other_requests)
+    background.start()
+    clients = [threading.Thread(target=login) for _ in range(logins)]
+    started = time.perf_counter()
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    background.join()
+    return logins / elapsed, statistics.median(slices) * 1000, sorted(slices)[int(len(slices) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login cost per KDF and behaviour of the bounded KDF pool')
+    parser.add_argument('--storm', type=int, default=32, help='concurrent logins in the burst')
+    parser.add_argument('--workers', default='1,2,8', help='KDF pool sizes to compare')
+    args = parser.parse_args()
+
+    scrypt, pbkdf2 = ScryptHasher(), Pbkdf2Hasher()
+    scrypt_hash, pbkdf2_hash = scrypt.hash('correct horse'), pbkdf2.hash('correct horse')
+    cached = PasswordHasher()
+    cached.verify('correct horse', scrypt_hash)
+
+    print(f'{os.cpu_count()} CPU(s)')
+    print('checks per second, one thread:')
+    rows = [
+        ('legacy sha256 (no brute-force resistance)', lambda: verify_legacy_sha256('correct horse', 'x' * 64, 'salt')),
+        (scrypt.params(), lambda: scrypt.verify('correct horse', scrypt_hash)),
+        (pbkdf2.params(), lambda: pbkdf2.verify('correct horse', pbkdf2_hash)),
+        ('verified-credential cache hit', lambda: cached.verify('correct horse', scrypt_hash)),
+    ]
+    for name, fn in rows:
+        print(f'  {name:<44} {per_second(fn):>10.1f}/s')
+
+    print(f'\n{args.storm} concurrent logins ({scrypt.params()}) next to 1 ms slices of other work:')
+    print(f"  {'KDF threads':>11}  {'logins/s':>9}  {'other p50':>10}  {'other p99':>10}")
+    for workers in (int(w) for w in args.workers.split(',')):
+        rate, p50, p99 = storm(workers, args.storm, scrypt_hash)
+        print(f'  {workers:>11}  {rate:>9.1f}  {p50:>7.2f} ms  {p99:>7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
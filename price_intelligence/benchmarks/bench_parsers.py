@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from parsers import PLATFORM_SPECS, available_backends, get_extractor
+from benchmarks.fixtures import amazon_page, flipkart_page
+
+# python -m benchmarks.bench_parsers   (from price_intelligence/)
+
+
+def legacy_extract(spec, html):
+    """The scraper's original approach: html.parser and a fresh select per field"""
+    soup = BeautifulSoup(html, 'html.parser')
+    items = []
+    for selector in spec.items:
+        items = soup.select(selector)
+        if items:
+            break
+    rows = []
+    for item in items[:spec.limit]:
+        row = {}
+        for field, selectors in spec.fields.items():
+            elem = None
+            for selector in selectors:
+                elem = item.select_one(selector)
+                if elem:
+                    break
+            attr = spec.attrs.get(field)
+            row[field] = (elem.get(attr) if attr else elem.text) if elem else None
+        rows.append(row)
+    return rows
+
+
+def timed(fn, html, repeat):
+    fn(html)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(html)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time HTML extraction backends on fixture pages')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # Bytes, as RealScraper.fetch hands them over
+    pages = {'Amazon': amazon_page().encode(), 'Flipkart': flipkart_page().encode()}
+    for platform, html in pages.items():
+        spec = PLATFORM_SPECS[platform]
+        expected = legacy_extract(spec, html)
+        baseline = timed(lambda h: legacy_extract(spec, h), html, args.repeat)
+        print(f"\n{platform} ({len(html) // 1024} KB page, {len(expected)} items)")
+        print(f"  {'legacy bs4/html.parser':<24}{baseline * 1000:9.2f} ms")
+
+        for name in available_backends():
+            extractor = get_extractor(platform, name)
+            rows = extractor.extract(html)
+            match = 'ok' if rows == expected else 'MISMATCH'
+            seconds = timed(extractor.extract, html, args.repeat)
+            print(f"  {name:<24}{seconds * 1000:9.2f} ms  {baseline / seconds:6.1f}x  {match}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import ZipfSampler, product_names
+from benchmarks.results import latency_summary, save
+
+# Storage and query time of price_history with and without the hourly/daily
+# rollups (rollups.py), on a generated history of --rows observations (10M by
+# default) spread over --days, Zipf-distributed over products like real searches:
+#   python -m benchmarks.bench_rollups --rows 10000000 --out rollups.json
+#
+# Raw rows are bulk-inserted and then treated as history that predates the
+# rollups: the backfill builds them (the same apply_rows the writer calls per
+# flush), queries run raw vs rolled up, then compaction, then the queries again.
+# The scratch database needs about 200 bytes of disk per row (--dir).
+
+BATCH = 200000
+
+
+def generate_history(pool, rows, days, products, seed):
+    """Bulk-insert `rows` observations, oldest first so ids follow time like the writer's"""
+    from cache import normalize_query
+    from products import PLATFORMS
+
+    rng = random.Random(seed)
+    names = [normalize_query(name) for name in product_names(products)]
+    popular = ZipfSampler(names, seed=seed)
+    platforms = list(PLATFORMS)
+    base_price = {name: rng.randint(5, 1500) * 100 for name in names}
+    last_price = {}
+    end = int(time.time())
+    start = end - days * 86400
+    step = days * 86400 / rows
+    for offset in range(0, rows, BATCH):
+        n = min(BATCH, rows - offset)
+        batch = []
+        for i, name in enumerate(popular(n), offset):
+            platform = rng.choice(platforms)
+            key = (name, platform)
+            price = max(100.0, round(last_price.get(key, base_price[name]) * rng.uniform(0.98, 1.02), 2))
+            last_price[key] = price
+            batch.append((name, platform, price, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + i * step))))
+        with pool.transaction() as c:
+            c.executemany('INSERT INTO price_history (product_name, platform, price, timestamp) VALUES (?, ?, ?, ?)',
+                          batch)
+        print(f'\r  {offset + n:,}/{rows:,} rows', end='', file=sys.stderr)
+    print(file=sys.stderr)
+    return names
+
+
+def reset_rollups(pool):
+    """Empty the rollups and mark all of price_history as still to backfill"""
+    from rollups import TABLES
+
+    with pool.transaction() as c:
+        for table in TABLES.values():
+            c.execute(f'DELETE FROM {table}')
+        c.execute('SELECT COALESCE(MAX(id), 0) FROM price_history')
+        upto = c.fetchone()[0]
+        c.execute("UPDATE price_rollup_state SET value = ? WHERE name = 'backfill_upto'", (upto,))
+        c.execute("UPDATE price_rollup_state SET value = 0 WHERE name = 'backfill_done'")
+
+
+def table_sizes(pool):
+    """MB per table including its indexes, from SQLite's dbstat"""
+    rows = pool.fetchall("SELECT tbl_name, name FROM sqlite_master WHERE type IN ('table', 'index')")
+    owner = {name: table for table, name in rows}
+    sizes = {}
+    for name, size in pool.fetchall('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name'):
+        table = owner.get(name, name)
+        if table.startswith('price_'):
+            sizes[table] = sizes.get(table, 0) + size
+    return {table: round(size / 1e6, 1) for table, size in sorted(sizes.items())}
+
+
+@contextmanager
+def raw_reads(rollups):
+    """Answer from price_history as if the rollups were still being backfilled"""
+    saved = rollups._ready, rollups._ready_checked_at
+    rollups._ready, rollups._ready_checked_at = False, float('inf')
+    try:
+        yield
+    finally:
+        rollups._ready, rollups._ready_checked_at = saved
+
+
+def time_each(fn, items, rounds):
+    """Latency of fn(item) over every item, after one unmeasured pass"""
+    for item in items:
+        fn(item)
+    timings = []
+    for _ in range(rounds):
+        for item in items:
+            started = time.perf_counter()
+            fn(item)
+            timings.append(time.perf_counter() - started)
+    return latency_summary(timings)
+
+
+def query_benchmarks(rollups, names, rounds):
+    """Each query raw and rolled up, over the same products in the same order"""
+    from alert import product_volatility
+    from ml_model import load_daily_series_many
+
+    rng = random.Random(7)
+    # Half popular products (many rows each), half from the long tail
+    sample = names[:50] + rng.sample(names[50:], 50)
+    watchlist = rng.sample(names, 500)
+
+    results = {}
+    for days in (2, 30, 365):
+        row = results[f'series_{days}d'] = {'resolution': rollups.choose_resolution(days)}
+        row['raw'] = time_each(lambda name: rollups.series(name, days, resolution='raw'), sample, rounds)
+        row['rollup'] = time_each(lambda name: rollups.series(name, days), sample, rounds)
+
+    for name, fn in {'volatility_500_products_7d': lambda names: product_volatility(names, 7),
+                     'daily_series_500_products_90d': lambda names: load_daily_series_many(names, 90)}.items():
+        row = results[name] = {}
+        with raw_reads(rollups):
+            row['raw'] = time_each(fn, [watchlist], rounds)
+        row['rollup'] = time_each(fn, [watchlist], rounds)
+
+    for name, row in results.items():
+        row['speedup'] = round(row['raw']['p50_ms'] / row['rollup']['p50_ms'], 1)
+        print(f"  {name:<32} raw p50 {row['raw']['p50_ms']:>9.2f} ms   "
+              f"{row.get('resolution', 'rollup'):<6} p50 {row['rollup']['p50_ms']:>8.2f} ms   "
+              f"x{row['speedup']}", file=sys.stderr)
+    return results
+
+
+def flush_overhead(pool, rollups, names, batches=50):
+    """Milliseconds per 500-row writer flush, raw insert only vs insert plus rollup upserts
+
+    Batches look like the writer's: each search records every platform's
+    price for one product at one timestamp.
+    """
+    from database import utc_timestamp
+    from history import PriceHistory
+    from products import PLATFORMS
+
+    popular = ZipfSampler(names, seed=11)
+    rng = random.Random(11)
+    timings = {}
+    for label, on_flush in (('raw_only', None), ('with_rollups', rollups.apply_rows)):
+        flushes = []
+        for _ in range(batches):
+            batch = []
+            while len(batch) < 500:
+                product, now = popular()[0], utc_timestamp()
+                batch.extend((product, platform, float(rng.randint(100, 100000)), now) for platform in PLATFORMS)
+            flushes.append(batch[:500])
+        started = time.perf_counter()
+        for batch in flushes:
+            with pool.transaction() as c:
+                c.executemany(PriceHistory.INSERT_SQL, batch)
+                if on_flush:
+                    on_flush(c, batch)
+        timings[label] = round((time.perf_counter() - started) / batches * 1000, 2)
+    print(f"  500-row flush: {timings['raw_only']} ms raw, {timings['with_rollups']} ms with rollups", file=sys.stderr)
+    return {'flush_500_rows_ms': timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='price_history rollups: storage, query time and compaction')
+    parser.add_argument('--dir', help='where to put the scratch database (default: system temp directory)')
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--days', type=int, default=365, help='how far back the history goes')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--raw-retention-days', type=int, default=90)
+    parser.add_argument('--rounds', type=int, default=3, help='measured passes over the sampled products')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help='write results JSON here instead of printing it')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='pricesmart-rollups-', dir=args.dir)
+    # Must be set before anything imports database.py
+    os.environ['PRICESMART_DB_PATH'] = os.path.join(scratch, 'history.db')
+    try:
+        from cache import normalize_query
+        from database import pool
+        from history import price_history
+        from rollups import price_rollups
+
+        # Just the history tables: no Flask app and none of its background threads
+        price_history.ensure_schema()
+
+        results = {}
+        print(f'Generating {args.rows:,} price_history rows', file=sys.stderr)
+        started = time.perf_counter()
+        generate_history(pool, args.rows, args.days, args.products, args.seed)
+        results['generate_seconds'] = round(time.perf_counter() - started, 1)
+        with pool.transaction() as c:
+            c.execute('ANALYZE')
+        reset_rollups(pool)
+        price_rollups._ready = False
+        names = [normalize_query(name) for name in product_names(args.products)]
+
+        started = time.perf_counter()
+        price_rollups.backfill()
+        results['rollup_seconds'] = round(time.perf_counter() - started, 1)
+        results['rows'] = price_rollups.stats()['rows']
+        results['size_mb'] = table_sizes(pool)
+        print(f"Rolled up in {results['rollup_seconds']} s: {results['rows']}  MB {results['size_mb']}",
+              file=sys.stderr)
+
+        print('Queries (full raw history):', file=sys.stderr)
+        results['queries'] = query_benchmarks(price_rollups, names, args.rounds)
+        results.update(flush_overhead(pool, price_rollups, names))
+
+        results['compaction'] = price_rollups.compact(raw_retention_days=args.raw_retention_days)
+        with pool.transaction() as c:
+            c.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        pool.execute('VACUUM')
+        results['compacted_rows'] = price_rollups.stats()['rows']
+        results['compacted_size_mb'] = table_sizes(pool)
+        print(f"Compacted in {results['compaction']['seconds']} s: {results['compacted_rows']}  "
+              f"MB {results['compacted_size_mb']}", file=sys.stderr)
+
+        print(f'Queries (raw kept for {args.raw_retention_days} days):', file=sys.stderr)
+        results['compacted_queries'] = query_benchmarks(price_rollups, names, args.rounds)
+
+        save('rollups', {key: getattr(args, key) for key in ('rows', 'days', 'products', 'raw_retention_days',
+                                                             'seed')}, results, args.out)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stats import ProductColumns, calculate_stats, factorize, group_aggregate, summarize
+
+# python -m benchmarks.bench_stats --sizes 10000,100000,1000000
+
+PLATFORMS = ['Amazon', 'Flipkart', 'Myntra', 'Reliance Digital', 'Croma', 'Tata CLiQ']
+
+
+def legacy_calculate_stats(products):
+    """calculate_stats as it was in app.py: several Python passes over the list"""
+    prices = [p['price'] for p in products]
+    originals = [p['original_price'] for p in products]
+    return {
+        'lowest_price': min(prices),
+        'highest_price': max(prices),
+        'average_price': int(sum(prices) / len(prices)),
+        'stores_compared': len(products),
+        'max_savings': int(max(originals) - min(prices)),
+        'average_discount': int(((sum(originals) - sum(prices)) / sum(originals)) * 100),
+        'best_platform': min(products, key=lambda x: x['price'])['platform']
+    }
+
+
+def legacy_group(keys, values):
+    """Per-key count/min/max/mean/median with dicts and sorted lists"""
+    groups = defaultdict(list)
+    for key, value in zip(keys, values):
+        groups[key].append(value)
+    result = {}
+    for key, vals in groups.items():
+        vals.sort()
+        mid = len(vals) // 2
+        median = vals[mid] if len(vals) % 2 else (vals[mid - 1] + vals[mid]) / 2
+        result[key] = (len(vals), vals[0], vals[-1], sum(vals) / len(vals), median)
+    return result
+
+
+def make_products(n, rng):
+    prices = rng.integers(500, 150000, n)
+    originals = (prices * rng.uniform(1.05, 1.4, n)).astype(int)
+    platforms = rng.integers(0, len(PLATFORMS), n)
+    ratings = np.round(rng.uniform(3, 5, n), 1)
+    return [
+        {'platform': PLATFORMS[pl], 'price': int(p), 'original_price': int(o), 'rating': float(r)}
+        for p, o, pl, r in zip(prices, originals, platforms, ratings)
+    ]
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Columnar statistics vs the old Python loops')
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'rows':>9}  {'legacy stats':>13}  {'dicts->cols':>12}  {'columns':>9}  {'legacy group':>13}  {'grouped':>9}")
+    for n in (int(size) for size in args.sizes.split(',')):
+        products = make_products(n, rng)
+        columns = ProductColumns.from_products(products)
+        days = [f'2024-{m:02d}-{d:02d}' for m, d in zip(rng.integers(1, 4, n), rng.integers(1, 29, n))]
+        prices = columns.prices.tolist()
+
+        def columnar_group():
+            codes, labels = factorize(days)
+            return labels, group_aggregate(codes, columns.prices, len(labels))
+
+        legacy = timed(lambda: legacy_calculate_stats(products), args.repeat)
+        from_dicts = timed(lambda: calculate_stats(products), args.repeat)
+        columnar = timed(lambda: summarize(columns), args.repeat)
+        legacy_grouped = timed(lambda: legacy_group(days, prices), args.repeat)
+        grouped = timed(columnar_group, args.repeat)
+
+        expected, actual = legacy_calculate_stats(products), calculate_stats(products)
+        assert all(actual[key] == value for key, value in expected.items()), 'statistics differ'
+        labels, result = columnar_group()
+        reference = legacy_group(days, prices)
+        for code, label in enumerate(labels):
+            assert np.allclose([result[k][code] for k in ('count', 'min', 'max', 'mean', 'median')],
+                               reference[label]), f'group {label} differs'
+        print(f"{n:>9}  {legacy * 1000:>10.1f} ms  {from_dicts * 1000:>9.1f} ms  {columnar * 1000:>6.1f} ms  "
+              f"{legacy_grouped * 1000:>10.1f} ms  {grouped * 1000:>6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
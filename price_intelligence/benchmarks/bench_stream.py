@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Time-to-first-result of /api/search/stream against time-to-response of /api/search.
+# Runs the app in-process on a scratch database. The search endpoints stream the
+# generated per-platform data (PriceScraper), not live stores, so each platform is
+# delayed by its own simulated scrape latency (--platform-ms) to stand in for one.
+#   python -m benchmarks.bench_stream --platform-ms 150,300,450,600,900,1200
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming vs one-shot search latency')
+    parser.add_argument('--platform-ms', default='150,300,450,600,900,1200',
+                        help='comma-separated scrape latency for each platform')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='pricesmart-stream-')
+    os.environ.setdefault('PRICESMART_DB_PATH', os.path.join(scratch, 'bench.db'))
+    os.environ.setdefault('SEARCH_CACHE_SHARED', '0')
+    os.environ.setdefault('SEARCH_CACHE_TTL', '0')
+    os.environ.setdefault('SEARCH_CACHE_STALE_TTL', '0')
+    import app as app_module
+
+    delays = [int(ms) / 1000 for ms in args.platform_ms.split(',')]
+    scraper = app_module.scraper
+    original = scraper.iter_platform_results
+
+    def slow_platforms(query):
+        # Platforms are scraped concurrently, so each finishes at its own latency
+        started = time.perf_counter()
+        for delay, item in sorted(zip(delays, original(query)), key=lambda pair: pair[0]):
+            time.sleep(max(0, delay - (time.perf_counter() - started)))
+            yield item
+
+    scraper.iter_platform_results = slow_platforms
+    client = app_module.app.test_client()
+
+    one_shot, first_result, stream_total = [], [], []
+    for run in range(args.runs):
+        query = f'iphone 15 bench {run}'
+        start = time.perf_counter()
+        client.post('/api/search', json={'product': query + ' full'})
+        one_shot.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = client.post('/api/search/stream', json={'product': query}, buffered=False)
+        first = None
+        for chunk in response.response:
+            for line in chunk.splitlines():
+                if line and first is None and json.loads(line)['type'] == 'products':
+                    first = time.perf_counter() - start
+        first_result.append(first)
+        stream_total.append(time.perf_counter() - start)
+
+    print(f"{args.runs} runs, platform latencies {args.platform_ms} ms")
+    print(f"  /api/search          response     p50 {percentile(one_shot, 50) * 1000:8.1f} ms")
+    print(f"  /api/search/stream   first result p50 {percentile(first_result, 50) * 1000:8.1f} ms")
+    print(f"  /api/search/stream   complete     p50 {percentile(stream_total, 50) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import itertools
+import os
+import random
+
+# Search result pages shaped like the real Amazon / Flipkart markup the scraper
+# targets, padded with the navigation and ad noise that makes up most of a real page.
+# Generated from a fixed seed so every run parses identical bytes; captured real pages
+# can be saved as <dir>/amazon.html and <dir>/flipkart.html and passed with --fixtures.
+#   python -m benchmarks.fixtures /tmp/pages   (writes the generated pages there)
+
+NOISE_BLOCK = '''<div class="nav-sprite s-widget"><ul>{links}</ul>
+<script type="text/javascript">window.ue_t0 = {n}; (function(){{var a = "{pad}";}})();</script>
+<span class="a-color-secondary">Sponsored</span></div>
+'''
+
+
+def _noise(rng, blocks):
+    parts = []
+    for n in range(blocks):
+        links = ''.join(f'<li><a href="/b/{rng.randint(1000, 9999)}">Category {i}</a></li>' for i in range(12))
+        parts.append(NOISE_BLOCK.format(links=links, n=n, pad='x' * rng.randint(200, 600)))
+    return ''.join(parts)
+
+
+def amazon_page(results=48, seed=1, noise_blocks=120):
+    rng = random.Random(seed)
+    items = []
+    for i in range(results):
+        price = rng.randint(499, 149999)
+        items.append(f'''<div data-component-type="s-search-result" data-asin="B0{i:08d}" class="s-result-item s-asin">
+  <div class="a-section"><div class="s-image"><img src="/images/I/{i}.jpg" alt=""></div>
+  <h2 class="a-size-mini"><a class="a-link-normal" href="/dp/B0{i:08d}?ref=sr_1_{i}"><span class="a-size-medium a-text-normal">Product {i} with a long descriptive marketing title, 128GB, Blue</span></a></h2>
+  <div class="a-row"><span class="a-icon-alt">{rng.uniform(3, 5):.1f} out of 5 stars</span>
+  <span class="a-size-base">{rng.randint(10, 99999):,}</span></div>
+  <div class="a-row"><span class="a-price"><span class="a-offscreen">₹{price:,}.00</span><span class="a-price-whole">{price:,}.</span></span></div>
+  {_noise(rng, 1)}</div></div>
+''')
+    return f'<!DOCTYPE html><html><head><title>Amazon.in</title></head><body>{_noise(rng, noise_blocks)}{"".join(items)}{_noise(rng, noise_blocks // 4)}</body></html>'
+
+
+def flipkart_page(results=40, seed=2, noise_blocks=120):
+    rng = random.Random(seed)
+    items = []
+    for i in range(results):
+        price = rng.randint(499, 149999)
+        items.append(f'''<div data-id="MOB{i:012d}" style="width:100%"><div class="_2kHMtA">
+  <a class="_1fQZEK" href="/product-{i}/p/itm{i:010d}" title="Product {i} (Blue, 128 GB)"><div class="_4rR01T">Product {i} (Blue, 128 GB)</div></a>
+  <div class="gUuXy-"><span><div class="_3LWZlK">{rng.uniform(3, 5):.1f}</div></span>
+  <span class="_2_R_DZ"><span><span>{rng.randint(10, 99999):,} Ratings&nbsp;</span><span>({rng.randint(10, 9999):,})</span></span></span></div>
+  <div class="_30jeq3 _1_WHN1">₹{price:,}</div>
+  {_noise(rng, 1)}</div></div>
+''')
+    return f'<!DOCTYPE html><html><head><title>Flipkart</title></head><body>{_noise(rng, noise_blocks)}{"".join(items)}{_noise(rng, noise_blocks // 4)}</body></html>'
+
+
+PAGES = {'amazon': amazon_page, 'flipkart': flipkart_page}
+
+
+def load_page(name, directory=None):
+    """A saved search page from directory/<name>.html if there is one, else the generated page"""
+    if directory:
+        path = os.path.join(directory, f'{name}.html')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+    return PAGES[name]()
+
+
+# ==================== QUERY VOCABULARY ====================
+BRANDS = ['Apple', 'Samsung', 'OnePlus', 'Xiaomi', 'Sony', 'Nike', 'Adidas', 'Puma', 'HP', 'Dell',
+          'Lenovo', 'Asus', 'Boat', 'JBL', 'Canon', 'LG', 'Philips', 'Realme', 'Vivo', 'Noise']
+ITEMS = ['phone', 'laptop', 'headphones', 'earbuds', 'smartwatch', 'running shoes', 'tv', 'tablet',
+         'camera', 'speaker', 'monitor', 'keyboard', 'trimmer', 'backpack', 'power bank']
+
+
+def product_names(n=2000, seed=3):
+    """n distinct product queries like 'Samsung smartwatch 7', in a fixed order"""
+    rng = random.Random(seed)
+    names, seen = [], set()
+    while len(names) < n:
+        name = f'{rng.choice(BRANDS)} {rng.choice(ITEMS)} {rng.randint(1, 99)}'
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+class ZipfSampler:
+    """Draws from a list with Zipf-like popularity: item i has weight 1 / (i + 1) ** s
+
+    Real search traffic is dominated by a few queries, which is what makes
+    caches and the trending top-K matter; uniform picks would understate both.
+    """
+
+    def __init__(self, values, s=1.1, seed=4):
+        self.values = values
+        self.rng = random.Random(seed)
+        self.cum_weights = list(itertools.accumulate(1 / (i + 1) ** s for i in range(len(values))))
+
+    def __call__(self, k=1):
+        return self.rng.choices(self.values, cum_weights=self.cum_weights, k=k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the generated search pages to disk')
+    parser.add_argument('directory')
+    args = parser.parse_args()
+    os.makedirs(args.directory, exist_ok=True)
+    for name, page in PAGES.items():
+        with open(os.path.join(args.directory, f'{name}.html'), 'w', encoding='utf-8') as f:
+            f.write(page())
+        print(os.path.join(args.directory, f'{name}.html'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import ZipfSampler, product_names
+from benchmarks.results import latency_summary, save
+from benchmarks.seed_db import scratch_database
+
+# Closed-loop load: --concurrency clients each send requests back to back for
+# --duration seconds, drawn from a traffic mix; throughput and p50/p95/p99 per
+# endpoint. Searches follow a Zipf popularity over the seeded product names, with
+# --cold-ratio of them never seen before; watchlist reads use seeded users.
+#
+#   python -m benchmarks.seed_db --db /tmp/pricesmart-bench.db
+#   python -m benchmarks.load_api --db /tmp/pricesmart-bench.db --mix search,trending,watchlist,mixed
+#   python -m benchmarks.load_api --db /tmp/pricesmart-bench.db --gunicorn --concurrency 32
+#   python -m benchmarks.load_api --url http://127.0.0.1:10000   (a server you started)
+#
+# In-process runs (the default) drive the Flask app through its test client: no
+# sockets, no gunicorn, one process, so they show the cost of our code.
+# --gunicorn starts gunicorn_config.py on a copy of the database for the real thing.
+
+MIXES = {
+    'search': {'search': 1.0},
+    'trending': {'trending': 1.0},
+    'watchlist': {'watchlist': 1.0},
+    'mixed': {'search': 0.6, 'trending': 0.3, 'watchlist': 0.1},
+}
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, headers=None):
+        response = self.client.open(path, method=method, json=json, headers=headers)
+        response.close()
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, json=None, headers=None):
+        import requests
+        try:
+            return self.session.request(method, self.base_url + path, json=json, headers=headers, timeout=30).status_code
+        except requests.RequestException:
+            return 0
+
+
+class Traffic:
+    """What each virtual client sends: one (endpoint, method, path, body, headers) per call"""
+
+    def __init__(self, mix, user_ids, token_for, cold_ratio, seed):
+        self.endpoints = list(mix)
+        self.weights = [mix[name] for name in self.endpoints]
+        self.user_ids = user_ids
+        self.token_for = token_for
+        self.cold_ratio = cold_ratio
+        self.rng = random.Random(seed)
+        self.queries = ZipfSampler(product_names(), seed=seed)
+        self.run_id = uuid.uuid4().hex[:6]
+
+    def next(self):
+        endpoint = self.rng.choices(self.endpoints, weights=self.weights)[0]
+        if endpoint == 'search':
+            query = self.queries()[0]
+            if self.rng.random() < self.cold_ratio:
+                query = f'{query} {self.run_id}{self.rng.randrange(10 ** 9)}'
+            return endpoint, 'POST', '/api/search', {'product': query}, None
+        if endpoint == 'trending':
+            return endpoint, 'GET', '/api/trending', None, None
+        token = self.token_for(self.rng.choice(self.user_ids))
+        return endpoint, 'GET', '/api/watchlist', None, {'Authorization': f'Bearer {token}'}
+
+
+def run_mix(make_client, mix, args, user_ids, token_for):
+    """Run one traffic mix; latencies and errors per endpoint"""
+    latencies = {name: [] for name in mix}
+    errors = {name: 0 for name in mix}
+    lock = threading.Lock()
+    start_at = time.perf_counter() + args.warmup
+    stop_at = start_at + args.duration
+
+    def virtual_client(index):
+        client = make_client()
+        traffic = Traffic(mix, user_ids, token_for, args.cold_ratio, seed=args.seed + index)
+        mine = {name: [] for name in mix}
+        failed = {name: 0 for name in mix}
+        while True:
+            endpoint, method, path, body, headers = traffic.next()
+            started = time.perf_counter()
+            if started >= stop_at:
+                break
+            status = client.request(method, path, json=body, headers=headers)
+            if started < start_at:
+                continue  # warm-up: caches, connections, model
+            if status == 200:
+                mine[endpoint].append(time.perf_counter() - started)
+            else:
+                failed[endpoint] += 1
+        with lock:
+            for name in mix:
+                latencies[name].extend(mine[name])
+                errors[name] += failed[name]
+
+    threads = [threading.Thread(target=virtual_client, args=(i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Clients finish the request in flight when time is up, so measure to the last one
+    elapsed = max(time.perf_counter() - start_at, args.duration)
+
+    completed = sum(len(v) for v in latencies.values())
+    return {
+        'requests': completed,
+        'errors': sum(errors.values()),
+        'throughput_rps': round(completed / elapsed, 1),
+        'latency': latency_summary([s for v in latencies.values() for s in v]),
+        'endpoints': {name: dict(latency_summary(latencies[name]), errors=errors[name]) for name in mix}
+    }
+
+
+def seeded_user_ids(db_path, limit=5000):
+    try:
+        with sqlite3.connect(db_path) as conn:
+            ids = [r[0] for r in conn.execute('SELECT w.user_id FROM watchlist w WHERE w.is_active = 1 '
+                                              'GROUP BY w.user_id LIMIT ?', (limit,))]
+    except sqlite3.Error:
+        ids = []
+    return ids or list(range(1, 101))
+
+
+def start_gunicorn(db_path, port, workers):
+    env = dict(os.environ, PRICESMART_DB_PATH=db_path, PORT=str(port))
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn_config.py', '--bind', f'127.0.0.1:{port}', 'app:app'],
+                              cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    import requests
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {server.returncode}')
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/api/health', timeout=1).status_code == 200:
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError('gunicorn did not become healthy within 60 s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput and latency of /api/search, /api/trending and /api/watchlist')
+    parser.add_argument('--db', help='seeded database to copy (benchmarks/seed_db.py); small one seeded if omitted')
+    parser.add_argument('--mix', default='mixed', help=f"comma-separated, run in turn: {', '.join(MIXES)}")
+    parser.add_argument('--concurrency', type=int, default=8, help='virtual clients')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per mix')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds before each mix')
+    parser.add_argument('--cold-ratio', type=float, default=0.1, help='share of searches for never-seen queries')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--url', help='load a server that is already running instead')
+    parser.add_argument('--gunicorn', action='store_true', help='start gunicorn on a copy of the database')
+    parser.add_argument('--port', type=int, default=18000, help='port for --gunicorn')
+    parser.add_argument('--workers', type=int, help='WEB_CONCURRENCY for --gunicorn')
+    parser.add_argument('--out', help='write results JSON here instead of printing it')
+    args = parser.parse_args()
+
+    mixes = args.mix.split(',')
+    unknown = [m for m in mixes if m not in MIXES]
+    if unknown:
+        parser.error(f"unknown mix {', '.join(unknown)}; choose from {', '.join(MIXES)}")
+
+    scratch = tempfile.mkdtemp(prefix='pricesmart-load-')
+    server = None
+    try:
+        if args.url:
+            mode = 'url'
+            db_path = args.db
+            os.environ.setdefault('PRICESMART_DB_PATH', os.path.join(scratch, 'unused.db'))
+        else:
+            db_path = scratch_database(args.db, scratch)
+            mode = 'gunicorn' if args.gunicorn else 'in-process'
+        user_ids = seeded_user_ids(db_path) if db_path else list(range(1, 101))
+
+        # Tokens signed with the same key the server uses (env or the data/jwt_secret file)
+        from auth import TokenAuth, load_jwt_secret
+        tokens = {}
+        signer = TokenAuth(load_jwt_secret())
+
+        def token_for(user_id):
+            if user_id not in tokens:
+                tokens[user_id] = signer.issue(user_id)
+            return tokens[user_id]
+
+        if mode == 'in-process':
+            import app as app_module
+            make_client = lambda: InProcessClient(app_module.app)
+        else:
+            if mode == 'gunicorn':
+                server = start_gunicorn(db_path, args.port, args.workers)
+                base_url = f'http://127.0.0.1:{args.port}'
+            else:
+                base_url = args.url
+            make_client = lambda: HttpClient(base_url)
+
+        results = {}
+        for mix in mixes:
+            results[mix] = run_mix(make_client, MIXES[mix], args, user_ids, token_for)
+            row = results[mix]
+            print(f"{mix:<10} {row['throughput_rps']:>8} req/s  p50 {row['latency']['p50_ms']:>8} ms  "
+                  f"p95 {row['latency']['p95_ms']:>8} ms  p99 {row['latency']['p99_ms']:>8} ms  "
+                  f"errors {row['errors']}", file=sys.stderr)
+
+        config = {key: getattr(args, key) for key in ('db', 'concurrency', 'duration', 'warmup', 'cold_ratio',
+                                                      'seed', 'url', 'workers')}
+        config.update(mode=mode, mixes={m: MIXES[m] for m in mixes})
+        save('load_api', config, results, args.out)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Bursts of identical searches; every round uses a query nobody has searched
+# yet, so the whole burst lands on a cold cache.
+#
+# Against a running server:
+#   SEARCH_SINGLE_FLIGHT=off  gunicorn -c gunicorn_config.py app:app
+#   SEARCH_SINGLE_FLIGHT=file gunicorn -c gunicorn_config.py app:app
+#   python -m benchmarks.load_search --url http://127.0.0.1:10000 --burst 100
+#
+# Without a server: worker processes share a SearchCache over a scratch SQLite
+# file and a search pipeline burning --compute-ms of CPU, once per flight mode:
+#   python -m benchmarks.load_search --simulate --workers 4 --burst 100
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_burst(url, query, burst):
+    """Fire `burst` identical searches at once; returns (latencies, errors)"""
+    barrier = threading.Barrier(burst)
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def one():
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            response = requests.post(url + '/api/search', json={'product': query}, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            (latencies if ok else errors).append(elapsed)
+
+    threads = [threading.Thread(target=one) for _ in range(burst)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors
+
+
+def simulated_worker(mode, lock_dir, rounds, threads, compute_ms, start_at, spacing, results):
+    from cache import SearchCache, SQLiteCache
+    from singleflight import SingleFlight, FileLockSingleFlight
+
+    flight = {'off': None, 'local': SingleFlight(), 'file': FileLockSingleFlight(lock_dir)}[mode]
+    cache = SearchCache(ttl=300, stale_ttl=0, shared=SQLiteCache(), flight=flight)
+    computed = []
+
+    def pipeline():
+        computed.append(1)
+        # CPU-bound like parsing and prediction, so duplicate runs compete for the GIL and cores
+        deadline = time.thread_time() + compute_ms / 1000
+        while time.thread_time() < deadline:
+            pass
+        return {'results': []}
+
+    latencies = []
+    for round_no in range(rounds):
+        begin = start_at + round_no * spacing
+
+        def one():
+            time.sleep(max(0, begin - time.time()))
+            start = time.perf_counter()
+            cache.get_or_compute(f'query {round_no}', pipeline)
+            latencies.append(time.perf_counter() - start)
+
+        workers = [threading.Thread(target=one) for _ in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+    results.put((latencies, len(computed)))
+
+
+def simulate(args):
+    rows = {}
+    threads = max(1, args.burst // args.workers)
+    # Room for a whole burst to run uncoalesced on one core before the next starts
+    spacing = args.compute_ms / 1000 * args.burst + 0.5
+    for mode in ('off', 'local', 'file'):
+        scratch = tempfile.mkdtemp(prefix='pricesmart-load-')
+        # Fresh database for every mode; workers inherit it through the environment
+        os.environ['PRICESMART_DB_PATH'] = os.path.join(scratch, 'load.db')
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1
+        procs = [multiprocessing.Process(target=simulated_worker,
+                                         args=(mode, os.path.join(scratch, 'locks'), args.rounds, threads,
+                                               args.compute_ms, start_at, spacing, results))
+                 for _ in range(args.workers)]
+        for p in procs:
+            p.start()
+        latencies, computed = [], 0
+        for _ in procs:
+            lat, n = results.get()
+            latencies.extend(lat)
+            computed += n
+        for p in procs:
+            p.join()
+        latencies.sort()
+        rows[mode] = {
+            'pipeline_runs': computed,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1)
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='p99 latency of /api/search under bursts of identical queries')
+    parser.add_argument('--url', default='http://127.0.0.1:10000')
+    parser.add_argument('--query', default='iphone 15')
+    parser.add_argument('--burst', type=int, default=100, help='concurrent identical requests per round')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--simulate', action='store_true', help='no server: compare flight modes in-process')
+    parser.add_argument('--workers', type=int, default=4, help='simulated worker processes')
+    parser.add_argument('--compute-ms', type=int, default=300, help='simulated search pipeline time')
+    args = parser.parse_args()
+
+    if args.simulate:
+        rows = simulate(args)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+            return
+        print(f"{args.rounds} bursts of {args.burst} identical searches, {args.workers} workers, "
+              f"{args.compute_ms} ms pipeline")
+        for mode, row in rows.items():
+            print(f"  {mode:<6} pipeline runs {row['pipeline_runs']:>5}   p50 {row['p50_ms']:>8} ms   p99 {row['p99_ms']:>8} ms")
+        return
+
+    run_id = uuid.uuid4().hex[:6]
+    latencies, errors = [], []
+    started = time.perf_counter()
+    for round_no in range(args.rounds):
+        lat, err = run_burst(args.url, f'{args.query} {run_id}{round_no}', args.burst)
+        latencies.extend(lat)
+        errors.extend(err)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        'requests': len(latencies) + len(errors),
+        'errors': len(errors),
+        'wall_seconds': round(wall, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round((latencies[-1] if latencies else 0) * 1000, 1)
+    }
+    try:
+        result['server_cache'] = requests.get(args.url + '/api/cache/stats', timeout=5).json().get('search_cache')
+    except (requests.RequestException, ValueError):
+        pass
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['requests']} requests in {args.rounds} bursts of {args.burst} ({result['errors']} errors)")
+    print(f"p50 {result['p50_ms']} ms   p95 {result['p95_ms']} ms   p99 {result['p99_ms']} ms   max {result['max_ms']} ms")
+    if 'server_cache' in result:
+        print(f"server (one worker's view): {result['server_cache']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+# Benchmark results as JSON, with enough about the machine and the code to know
+# whether two files are comparable:
+#   python -m benchmarks.bench_hotpaths --out before.json
+#   ... change something ...
+#   python -m benchmarks.bench_hotpaths --out after.json
+#   python -m benchmarks.results before.json after.json
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_summary(seconds):
+    """count / p50 / p95 / p99 / max in milliseconds for a list of durations in seconds"""
+    values = sorted(seconds)
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round((values[-1] if values else 0) * 1000, 3)
+    }
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {
+        'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def save(name, config, results, path=None):
+    """Print the results as JSON, or write them to path"""
+    document = {'benchmark': name, 'environment': environment(), 'config': config, 'results': results}
+    text = json.dumps(document, indent=2, sort_keys=True)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+        print(f'results written to {path}')
+    else:
+        print(text)
+    return document
+
+
+def flatten(results, prefix=''):
+    """{'a': {'p99_ms': 3}} -> {'a.p99_ms': 3}, numbers only"""
+    flat = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+# Metric name endings where bigger is better; everything else (times, sizes) is smaller-is-better
+HIGHER_IS_BETTER = ('per_s', 'per_second', 'rps', 'throughput', 'hit_ratio')
+
+
+def compare(before, after, threshold=0.10):
+    """Rows of (metric, before, after, relative change, verdict) for metrics in both files"""
+    old, new = flatten(before['results']), flatten(after['results'])
+    rows = []
+    for metric in sorted(old.keys() & new.keys()):
+        a, b = old[metric], new[metric]
+        change = (b - a) / a if a else 0.0
+        better = change > 0 if metric.endswith(HIGHER_IS_BETTER) else change < 0
+        if abs(change) < threshold or metric.endswith(('count', 'requests', 'rows')):
+            verdict = ''
+        else:
+            verdict = 'better' if better else 'WORSE'
+        rows.append((metric, a, b, change, verdict))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative change worth flagging')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before.get('benchmark') != after.get('benchmark'):
+        print(f"⚠️ comparing different benchmarks: {before.get('benchmark')} vs {after.get('benchmark')}")
+    for label, doc in (('before', before), ('after', after)):
+        env = doc.get('environment', {})
+        print(f"{label:<7} {env.get('git')}  {env.get('timestamp')}  python {env.get('python')}  {env.get('cpus')} CPU(s)")
+    if before.get('config') != after.get('config'):
+        print('⚠️ configs differ; numbers may not be comparable')
+
+    rows = compare(before, after, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    print(f"\n{'metric':<{width}}  {'before':>12}  {'after':>12}  {'change':>8}")
+    for metric, a, b, change, verdict in rows:
+        print(f'{metric:<{width}}  {a:>12.3f}  {b:>12.3f}  {change:>+7.1%}  {verdict}')
+    worse = sum(1 for row in rows if row[4] == 'WORSE')
+    print(f'\n{worse} metric(s) worse by more than {args.threshold:.0%}')
+    sys.exit(1 if worse else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import ZipfSampler, product_names
+from benchmarks.results import save
+
+# A database the size of a busy deployment, from a fixed seed, so benchmarks and
+# load tests run against the same large users / searches / watchlist / price_history
+# tables every time:
+#   python -m benchmarks.seed_db --db /tmp/pricesmart-bench.db --scale 1
+#   PRICESMART_DB_PATH=/tmp/pricesmart-bench.db python -m benchmarks.load_api
+#
+# --scale 1 is 50k users, 500k searches, 100k watchlist rows and 1M price points.
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), 'pricesmart-bench.db')
+BASE_ROWS = {'users': 50000, 'searches': 500000, 'watchlist': 100000, 'price_history': 1000000}
+BENCH_PASSWORD = 'benchmark-password'
+BATCH = 50000
+
+
+def timestamps(rng, n, days, now):
+    """n 'YYYY-MM-DD HH:MM:SS' UTC times spread over the last `days` days, oldest first"""
+    span = days * 86400
+    offsets = sorted((rng.random() * span for _ in range(n)), reverse=True)
+    return [(now - timedelta(seconds=s)).strftime('%Y-%m-%d %H:%M:%S') for s in offsets]
+
+
+def insert_batches(pool, sql, rows, on_batch=None):
+    for start in range(0, len(rows), BATCH):
+        batch = rows[start:start + BATCH]
+        with pool.transaction() as c:
+            c.executemany(sql, batch)
+            if on_batch:
+                on_batch(c, batch)
+
+
+def seed(rows, days=30, products=2000, seed=42):
+    """Fill the database at PRICESMART_DB_PATH; returns seconds spent per table"""
+    import app as app_module
+    from cache import normalize_query
+    from database import pool
+    from products import PLATFORMS
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    names = product_names(products)
+    popular = ZipfSampler(names, seed=seed)
+    platforms = list(PLATFORMS)
+    base_price = {name: rng.randint(5, 1500) * 100 for name in names}
+    timings = {}
+
+    # One hash for every account: hashing each with the real KDF would take hours
+    started = time.perf_counter()
+    hashed = app_module.db.passwords.hash(BENCH_PASSWORD)
+    created = timestamps(rng, rows['users'], days * 6, now)
+    insert_batches(pool, 'INSERT INTO users (email, password, name, salt, created_at) VALUES (?, ?, ?, ?, ?)',
+                   [(f'user{i}@bench.pricesmart.ai', hashed, f'Bench User {i}', '', created[i])
+                    for i in range(rows['users'])])
+    user_ids = [r[0] for r in pool.fetchall("SELECT id FROM users WHERE email LIKE '%@bench.pricesmart.ai'")]
+    timings['users'] = time.perf_counter() - started
+
+    # Searches also go into search_trends, the way the search log writer does it
+    started = time.perf_counter()
+    queries = popular(rows['searches'])
+    when = timestamps(rng, rows['searches'], days, now)
+    searches = [(rng.choice(user_ids) if rng.random() < 0.3 else None, queries[i], 6, when[i])
+                for i in range(rows['searches'])]
+    insert_batches(pool, 'INSERT INTO searches (user_id, query, result_count, timestamp) VALUES (?, ?, ?, ?)',
+                   searches, on_batch=app_module.db.trending.apply_search_rows)
+    timings['searches'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    watched = popular(rows['watchlist'])
+    added = timestamps(rng, rows['watchlist'], days, now)
+    watchlist = []
+    for i, name in enumerate(watched):
+        price = base_price[name] * rng.uniform(0.9, 1.2)
+        watchlist.append((rng.choice(user_ids), name, round(price, 2), round(price * rng.uniform(0.8, 0.97), 2),
+                          added[i]))
+    insert_batches(pool, '''INSERT INTO watchlist (user_id, product_name, current_price, target_price, added_at)
+                            VALUES (?, ?, ?, ?, ?)''', watchlist)
+    timings['watchlist'] = time.perf_counter() - started
+
+    # A random walk per (product, platform), observed at random times, rolled up like history.py does
+    started = time.perf_counter()
+    observed = popular(rows['price_history'])
+    when = timestamps(rng, rows['price_history'], days, now)
+    last_price = {}
+    history = []
+    for i, name in enumerate(observed):
+        platform = rng.choice(platforms)
+        price = last_price.get((name, platform), base_price[name])
+        price = max(100.0, round(price * rng.uniform(0.97, 1.03), 2))
+        last_price[(name, platform)] = price
+        history.append((normalize_query(name), platform, price, when[i]))
+    insert_batches(pool, 'INSERT INTO price_history (product_name, platform, price, timestamp) VALUES (?, ?, ?, ?)',
+                   history, on_batch=app_module.price_history.rollups.apply_rows)
+    timings['price_history'] = time.perf_counter() - started
+
+    with pool.transaction() as c:
+        c.execute('ANALYZE')
+    return timings
+
+
+def scratch_database(source, scratch):
+    """Point PRICESMART_DB_PATH at a copy of a seeded database (benchmarks write to it),
+    or at a small freshly seeded one; call before anything imports database.py"""
+    path = os.path.join(scratch, 'bench.db')
+    os.environ['PRICESMART_DB_PATH'] = path
+    if source:
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+    else:
+        seed({'users': 1000, 'searches': 10000, 'watchlist': 2000, 'price_history': 50000})
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a large, reproducible benchmark database')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies every table size')
+    for table, n in BASE_ROWS.items():
+        parser.add_argument(f"--{table.replace('_', '-')}", type=int, help=f'rows (default {n} x scale)')
+    parser.add_argument('--days', type=int, default=30, help='how far back timestamps go')
+    parser.add_argument('--products', type=int, default=2000, help='distinct product queries')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='replace an existing file')
+    parser.add_argument('--out', help='write the summary JSON here')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f'{args.db} exists; pass --force to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    # Must be set before anything imports database.py
+    os.environ['PRICESMART_DB_PATH'] = args.db
+
+    rows = {table: getattr(args, table) or int(n * args.scale) for table, n in BASE_ROWS.items()}
+    started = time.perf_counter()
+    timings = seed(rows, days=args.days, products=args.products, seed=args.seed)
+    from database import flush_all_writers
+    flush_all_writers()
+
+    save('seed_db', {'db': args.db, 'rows': rows, 'days': args.days, 'products': args.products, 'seed': args.seed}, {
+        'seconds': {table: round(s, 2) for table, s in timings.items()},
+        'total_seconds': round(time.perf_counter() - started, 2),
+        'size_mb': round(os.path.getsize(args.db) / 1e6, 1)
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
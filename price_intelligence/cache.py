@@ -0,0 +1,242 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from database import pool
+from serialization import dumps, loads
+from logs import get_logger
+
+log = get_logger('cache')
+
+
+def normalize_query(query):
+    """Cache key for a search query: case- and whitespace-insensitive"""
+    return ' '.join(query.lower().split())
+
+
+class TTLCache:
+    """In-process LRU cache whose entries remember when they were stored"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (value, stored_at) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at=None):
+        with self._lock:
+            self._entries[key] = (value, stored_at or time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Cache tier stored in SQLite so every gunicorn worker sees the same entries"""
+
+    def __init__(self, max_entries=10000, max_age=3600, table='search_cache'):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.table = table
+        self.evictions = 0
+        self._writes = 0
+        with pool.transaction() as c:
+            c.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )''')
+            c.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_stored_at ON {table}(stored_at)')
+
+    def get(self, key):
+        row = pool.fetchone(f'SELECT payload, stored_at FROM {self.table} WHERE key = ?', (key,))
+        if row is None:
+            return None
+        return loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at=None):
+        with pool.transaction() as c:
+            c.execute(f'INSERT OR REPLACE INTO {self.table} (key, payload, stored_at) VALUES (?, ?, ?)',
+                      (key, dumps(value), stored_at or time.time()))
+        self._writes += 1
+        # Trim occasionally rather than on every write
+        if self._writes % 100 == 0:
+            self.trim()
+
+    def delete(self, key):
+        with pool.transaction() as c:
+            c.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def trim(self):
+        """Drop expired rows, then the oldest rows beyond max_entries"""
+        with pool.transaction() as c:
+            c.execute(f'DELETE FROM {self.table} WHERE stored_at < ?', (time.time() - self.max_age,))
+            removed = c.rowcount
+            c.execute(f'''DELETE FROM {self.table} WHERE key IN (
+                SELECT key FROM {self.table} ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+            )''', (self.max_entries,))
+            removed += c.rowcount
+        self.evictions += removed
+        return removed
+
+    def clear(self):
+        with pool.transaction() as c:
+            c.execute(f'DELETE FROM {self.table}')
+
+
+class SearchCache:
+    """Two-tier result cache with TTL and stale-while-revalidate
+
+    Entries younger than ``ttl`` are served as-is. Entries older than ``ttl``
+    but younger than ``ttl + stale_ttl`` are served immediately while a
+    background thread recomputes them. Anything older is a miss. With a
+    ``flight`` (see singleflight.py) concurrent misses and background
+    refreshes for one key are computed once and shared.
+    """
+
+    def __init__(self, ttl=300, stale_ttl=600, max_entries=1024, shared=None, refresh_workers=2, flight=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local = TTLCache(max_entries)
+        self.shared = shared
+        self.flight = flight
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='cache-refresh')
+        self.counters = {'hits': 0, 'shared_hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def _lookup(self, key):
+        entry = self.local.get(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                # Promote into the local tier, keeping the original timestamp
+                self.local.set(key, entry[0], entry[1])
+                self.counters['shared_hits'] += 1
+        return entry
+
+    def set(self, key, value):
+        stored_at = time.time()
+        self.local.set(key, value, stored_at)
+        if self.shared is not None:
+            self.shared.set(key, value, stored_at)
+
+    def invalidate(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def _refresh(self, key, compute):
+        def recompute():
+            value = compute()
+            self.counters['refreshes'] += 1
+            return value
+
+        try:
+            # Another worker may have refreshed the shared tier already; if not,
+            # recompute through the flight so the workers that all found the key
+            # stale at once scrape it only once
+            if self._fresh_value(key) is None:
+                self.compute(key, recompute)
+        except Exception as e:
+            self.counters['refresh_errors'] += 1
+            log.error("Cache refresh error for '%s': %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key, compute):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, compute)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get_cached(key, compute)
+        if value is not None:
+            return value
+        return self.compute(key, compute)
+
+    def get_cached(self, key, compute):
+        """Cached value for key while it is fresh or stale-but-servable, else None (a miss)
+
+        A stale value is served and recomputed in the background with ``compute``.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self.counters['hits'] += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.counters['stale_hits'] += 1
+                self._schedule_refresh(key, compute)
+                return value
+        self.counters['misses'] += 1
+        return None
+
+    def compute(self, key, compute):
+        """Compute and store key's value after a miss, once for all concurrent callers
+
+        Through the flight, if any: callers that arrive while another is
+        computing the key wait for it and get its value, and ``compute`` is
+        not called for them.
+        """
+        if self.flight is not None:
+            return self.flight.do(key, lambda: self._compute_and_set(key, compute), lambda: self._fresh_value(key))
+        return self._compute_and_set(key, compute)
+
+    def _compute_and_set(self, key, compute):
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def _fresh_value(self, key):
+        """Value for key if another caller, in this worker or another, has just stored a fresh one, else None"""
+        entry = self.local.get(key)
+        if entry is not None and time.time() - entry[1] < self.ttl:
+            return entry[0]
+        # The local copy is missing or stale; the shared tier may hold a newer one
+        if self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None and time.time() - entry[1] < self.ttl:
+                self.local.set(key, entry[0], entry[1])
+                self.counters['shared_hits'] += 1
+                return entry[0]
+        return None
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['evictions'] = self.local.evictions
+        stats['local_entries'] = len(self.local)
+        if self.shared is not None:
+            stats['shared_evictions'] = self.shared.evictions
+        if self.flight is not None:
+            stats['flight'] = dict(self.flight.stats)
+            if hasattr(self.flight, 'local'):
+                stats['flight'].update(self.flight.local.stats)
+        return stats
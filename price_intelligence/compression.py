@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from cache import TTLCache
+from metrics import JSON_RESPONSE_BYTES
+
+# JSON API responses get a strong ETag (hash of the body) and, from
+# JSON_COMPRESS_MIN_BYTES up, the best encoding the client accepts. Below the
+# threshold the headers cost more than compression saves. Levels are tuned for
+# per-request work, not for the smallest output (that's assets.py's job).
+JSON_COMPRESS_MIN_BYTES = int(os.environ.get('JSON_COMPRESS_MIN_BYTES', 1024))
+JSON_GZIP_LEVEL = int(os.environ.get('JSON_GZIP_LEVEL', 6))
+JSON_BROTLI_QUALITY = int(os.environ.get('JSON_BROTLI_QUALITY', 5))
+# Compressed bodies by (ETag, encoding): identical payloads (trending, cached
+# searches) are compressed once per worker, not once per request
+JSON_COMPRESSED_CACHE_ENTRIES = int(os.environ.get('JSON_COMPRESSED_CACHE_ENTRIES', 512))
+
+
+def body_etag(body):
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def compress(body, encoding, gzip_level=JSON_GZIP_LEVEL, brotli_quality=JSON_BROTLI_QUALITY):
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class JSONResponseOptimizer:
+    """ETags, 304s and compression for JSON responses, applied in an after_request hook
+
+    Each encoding is its own representation with its own strong ETag
+    ("<hash>", "<hash>-gzip", "<hash>-br"), but If-None-Match with any of
+    them answers 304, since the JSON underneath is the same. Only GET and
+    HEAD are answered with 304; POST responses still carry the ETag.
+    Streaming responses are left alone.
+    """
+
+    def __init__(self, min_bytes=JSON_COMPRESS_MIN_BYTES, gzip_level=JSON_GZIP_LEVEL,
+                 brotli_quality=JSON_BROTLI_QUALITY, cache_entries=JSON_COMPRESSED_CACHE_ENTRIES):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        self.compressed = TTLCache(max_entries=cache_entries)
+        self._stats = {}  # endpoint -> counters
+        self._lock = threading.Lock()
+
+    def choose_encoding(self, accept_encodings):
+        for encoding in self.encodings:
+            if accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def _count(self, endpoint, body_bytes, sent_bytes, not_modified=False):
+        with self._lock:
+            row = self._stats.get(endpoint)
+            if row is None:
+                row = self._stats[endpoint] = {'responses': 0, 'not_modified': 0, 'json_bytes': 0, 'sent_bytes': 0}
+            row['responses'] += 1
+            row['not_modified'] += not_modified
+            row['json_bytes'] += body_bytes
+            row['sent_bytes'] += sent_bytes
+        JSON_RESPONSE_BYTES.inc(body_bytes, endpoint=endpoint, stage='json')
+        JSON_RESPONSE_BYTES.inc(sent_bytes, endpoint=endpoint, stage='sent')
+
+    def stats(self):
+        with self._lock:
+            rows = {endpoint: dict(row) for endpoint, row in self._stats.items()}
+        for row in rows.values():
+            row['saved_percent'] = round((1 - row['sent_bytes'] / row['json_bytes']) * 100, 1) if row['json_bytes'] else 0.0
+        return rows
+
+    def process(self, response, request, endpoint):
+        if (response.status_code != 200 or response.mimetype != 'application/json' or
+                response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers):
+            return response
+
+        body = response.get_data()
+        etag = body_etag(body)
+        encoding = self.choose_encoding(request.accept_encodings) if len(body) >= self.min_bytes else None
+        if len(body) >= self.min_bytes:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+        if 'Cache-Control' not in response.headers:
+            # Let clients keep the body but check back every time (a 304 when nothing changed)
+            response.headers['Cache-Control'] = 'private, no-cache' if 'Authorization' in request.headers else 'no-cache'
+
+        if request.method in ('GET', 'HEAD') and request.if_none_match and (
+                request.if_none_match.star_tag or
+                any(request.if_none_match.contains(tag) for tag in (etag, f'{etag}-gzip', f'{etag}-br'))):
+            response.status_code = 304
+            response.set_data(b'')
+            # A 304 carries no body, so no Content-Type / Content-Length for one
+            response.headers.pop('Content-Type', None)
+            response.headers.pop('Content-Length', None)
+            self._count(endpoint, len(body), 0, not_modified=True)
+            return response
+
+        if encoding:
+            key = (etag, encoding)
+            entry = self.compressed.get(key)
+            if entry is None:
+                data = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                self.compressed.set(key, data)
+            else:
+                data = entry[0]
+            if len(data) < len(body):
+                response.set_data(data)
+                response.headers['Content-Encoding'] = encoding
+            else:
+                response.set_etag(etag)
+        self._count(endpoint, len(body), len(response.get_data()))
+        return response
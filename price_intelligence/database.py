@@ -0,0 +1,312 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from logs import get_logger
+from metrics import DB_QUERY_SECONDS
+
+try:
+    from gevent import monkey as gevent_monkey
+except ImportError:
+    gevent_monkey = None
+
+log = get_logger('database')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+DB_PATH = os.environ.get('PRICESMART_DB_PATH', os.path.join(DATA_DIR, 'pricesmart.db'))
+# Page cache per connection (KiB). Every thread that touches the database holds
+# its own connection, so a gthread worker keeps ~45 of them (request threads plus
+# background ones); reads mostly come from the shared mmap, so keep this small
+SQLITE_CACHE_KB = int(os.environ.get('SQLITE_CACHE_KB', 2048))
+
+
+def native_thread_ident():
+    """get_ident for the OS thread, plus whether gevent greenlets share it
+
+    Under gevent workers ``threading.get_ident`` returns a greenlet id, which
+    would mean one SQLite connection per in-flight request.
+    """
+    if gevent_monkey is not None and gevent_monkey.is_module_patched('threading'):
+        return gevent_monkey.get_original('threading', 'get_ident'), True
+    return threading.get_ident, False
+
+
+def utc_timestamp():
+    """Current UTC time in SQLite's CURRENT_TIMESTAMP format"""
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ConnectionPool:
+    """Per-thread SQLite connections, opened once and reused across requests"""
+
+    # Applied to every new connection. WAL lets readers run alongside the
+    # single writer; NORMAL sync is durable in WAL mode on application crash.
+    PRAGMAS = (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -SQLITE_CACHE_KB),  # 2 MB page cache per connection by default
+        ('mmap_size', 268435456),     # 256 MB memory-mapped reads
+        ('busy_timeout', 5000),       # wait up to 5 s for the write lock
+        ('temp_store', 'MEMORY'),
+    )
+
+    def __init__(self, path=DB_PATH, statement_cache_size=128):
+        self.path = str(path)
+        self.statement_cache_size = statement_cache_size
+        self._connections = {}
+        self._inherited = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._get_ident = None
+        self._cooperative = False
+        self._tx_lock = None
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=5.0,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        for name, value in self.PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _after_fork(self):
+        """Drop connections inherited from the parent process without closing them"""
+        # SQLite connections must not be used (or closed) across fork(), so
+        # keep a reference around and let the child open fresh ones.
+        self._inherited.extend(self._connections.values())
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._get_ident = None
+
+    def _prune_dead_threads(self):
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._connections if i not in alive]:
+            try:
+                self._connections.pop(ident).close()
+            except sqlite3.Error:
+                pass
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        if os.getpid() != self._pid:
+            self._after_fork()
+
+        if self._get_ident is None:
+            # Resolved lazily: gevent workers patch threading after this module may be imported
+            self._get_ident, self._cooperative = native_thread_ident()
+            self._tx_lock = threading.RLock() if self._cooperative else None
+
+        ident = self._get_ident()
+        conn = self._connections.get(ident)
+        if conn is None:
+            conn = self._connect()
+            with self._lock:
+                # Greenlets all live on one OS thread, which threading.enumerate() can't see
+                if not self._cooperative:
+                    self._prune_dead_threads()
+                self._connections[ident] = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor and commit on success, roll back on error"""
+        conn = self.connection()
+        # Greenlets share their thread's connection, so one transaction at a time
+        tx_lock = self._tx_lock if self._cooperative else None
+        start = time.perf_counter()
+        if tx_lock is not None:
+            tx_lock.acquire()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            if tx_lock is not None:
+                tx_lock.release()
+            # Includes waiting for the write lock and the commit
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, op='transaction')
+
+    def execute(self, sql, params=()):
+        with DB_QUERY_SECONDS.time(op='execute'):
+            return self.connection().execute(sql, params)
+
+    def fetchone(self, sql, params=()):
+        with DB_QUERY_SECONDS.time(op='fetchone'):
+            return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        with DB_QUERY_SECONDS.time(op='fetchall'):
+            return self.connection().execute(sql, params).fetchall()
+
+    def close_all(self):
+        """Close every connection owned by this process"""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = {}
+
+
+def add_column_if_missing(cursor, table, column, declaration):
+    """Tiny migration helper for columns added after a table was first created"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+        return True
+    return False
+
+
+# Global pool shared by app.py and alert.py
+pool = ConnectionPool()
+
+
+class BatchWriter:
+    """Buffers rows in memory and writes them with one executemany per flush
+
+    A flush happens when ``max_batch`` rows are pending or ``flush_interval``
+    seconds have passed since the first pending row, whichever comes first.
+    At most ``max_pending`` rows are buffered; beyond that ``overflow``
+    decides whether new rows are dropped at once ('drop') or the caller
+    waits up to ``block_timeout`` seconds for room before dropping ('block').
+    ``on_flush(cursor, rows)`` runs inside the same transaction, for derived
+    tables that must stay in step with the rows written; ``after_commit(rows)``
+    runs once that transaction has committed, for in-memory state that must
+    not forget rows a rolled-back flush will retry.
+    """
+
+    def __init__(self, sql, max_batch=500, flush_interval=1.0, name='batch-writer', connection_pool=None,
+                 max_pending=None, overflow='drop', block_timeout=0.5, on_flush=None, after_commit=None):
+        if overflow not in ('drop', 'block'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.sql = sql
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.name = name
+        self.pool = connection_pool or pool
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.on_flush = on_flush
+        self.after_commit = after_commit
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self._rows = []
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._full = threading.Event()
+        self._thread = None
+        self._pid = None
+        _writers.append(self)
+        atexit.register(self.flush)
+
+    def _ensure_thread(self):
+        # The flusher thread does not survive fork(), so start one per process
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Give the batch time to fill, but go as soon as it is full
+            self._full.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._full.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("%s flush error: %s", self.name, e)
+
+    def _has_room(self, count):
+        return self.max_pending is None or len(self._rows) + count <= self.max_pending
+
+    def add(self, row):
+        return self.add_many([row])
+
+    def add_many(self, rows):
+        """Queue rows for the next flush; returns False if they were dropped"""
+        if not rows:
+            return True
+        with self._not_full:
+            if not self._has_room(len(rows)):
+                if self.overflow == 'block':
+                    self._full.set()
+                    self._wakeup.set()
+                    self._not_full.wait_for(lambda: self._has_room(len(rows)), timeout=self.block_timeout)
+                if not self._has_room(len(rows)):
+                    self.rows_dropped += len(rows)
+                    return False
+            self._rows.extend(rows)
+            self._ensure_thread()
+            if len(self._rows) >= self.max_batch:
+                self._full.set()
+        self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Write all pending rows in a single transaction"""
+        with self._not_full:
+            rows, self._rows = self._rows, []
+            self._not_full.notify_all()
+        if not rows:
+            return 0
+        try:
+            with self.pool.transaction() as c:
+                c.executemany(self.sql, rows)
+                if self.on_flush is not None:
+                    self.on_flush(c, rows)
+        except Exception:
+            # Put the batch back so the next flush retries it, within the buffer limit
+            with self._lock:
+                self._rows[:0] = rows
+                if self.max_pending is not None and len(self._rows) > self.max_pending:
+                    self.rows_dropped += len(self._rows) - self.max_pending
+                    del self._rows[self.max_pending:]
+            raise
+        self.rows_written += len(rows)
+        self.flushes += 1
+        if self.after_commit is not None:
+            self.after_commit(rows)
+        return len(rows)
+
+    def pending(self):
+        return len(self._rows)
+
+    def stats(self):
+        return {
+            'pending': self.pending(),
+            'written': self.rows_written,
+            'dropped': self.rows_dropped,
+            'flushes': self.flushes
+        }
+
+
+# Every writer created in this process, so shutdown hooks can drain them all
+_writers = []
+
+
+def flush_all_writers():
+    """Flush every BatchWriter; called from gunicorn's worker_exit hook"""
+    for writer in _writers:
+        try:
+            writer.flush()
+        except Exception as e:
+            log.error("%s final flush error: %s", writer.name, e)
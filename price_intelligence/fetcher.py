@@ -0,0 +1,287 @@
+import os
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from database import DATA_DIR, ConnectionPool
+from singleflight import SingleFlight
+
+HTTP_CACHE_PATH = os.environ.get('PRICESMART_HTTP_CACHE_PATH', os.path.join(DATA_DIR, 'http_cache.db'))
+HTTP_CACHE_MAX_BYTES = int(os.environ.get('HTTP_CACHE_MAX_MB', 64)) * 1024 * 1024
+# Reads refresh an entry's last_used (its LRU position) at most this often, so
+# a cache hit is a read, not a write transaction
+HTTP_CACHE_TOUCH_SECONDS = float(os.environ.get('HTTP_CACHE_TOUCH_SECONDS', 300))
+
+
+def parse_cache_control(value):
+    """'max-age=60, no-cache' -> {'max-age': '60', 'no-cache': True}"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers, default_ttl):
+    """Seconds a response may be served without revalidation; None if it must not be stored"""
+    cc = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in cc:
+        return None
+    if 'no-cache' in cc:
+        return 0
+    # This cache only ever serves our own scraper, so 'private' responses are fine to keep
+    for directive in ('s-maxage', 'max-age'):
+        if directive in cc:
+            try:
+                return max(0, int(cc[directive]))
+            except ValueError:
+                return 0
+    if 'Expires' in headers:
+        expires = _http_date(headers['Expires'])
+        date = _http_date(headers.get('Date')) or time.time()
+        return max(0, expires - date) if expires else 0
+    # No explicit freshness: fall back to a short heuristic lifetime
+    return default_ttl
+
+
+class HttpCache:
+    """Size-capped, zlib-compressed response cache in its own SQLite file
+
+    Shared by every worker process. When the stored bodies exceed
+    ``max_bytes`` the least recently used entries are evicted. Lookups
+    read only the validators and expiry; the body is read and decompressed
+    only when a caller is about to use it.
+    """
+
+    def __init__(self, path=HTTP_CACHE_PATH, max_bytes=HTTP_CACHE_MAX_BYTES, compress_level=6,
+                 touch_interval=HTTP_CACHE_TOUCH_SECONDS):
+        self.pool = ConnectionPool(path)
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self.touch_interval = touch_interval
+        self.evictions = 0
+        self._writes = 0
+        with self.pool.transaction() as c:
+            c.execute('''CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_last_used ON http_cache(last_used)')
+            c.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache')
+            self._approx_bytes = c.fetchone()[0]
+
+    def get(self, url):
+        """Validators and expiry for url (no body), or None if it isn't cached"""
+        row = self.pool.fetchone('SELECT etag, last_modified, expires_at FROM http_cache WHERE url = ?', (url,))
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'expires_at': row[2]}
+
+    def read_body(self, url):
+        """Decompressed body for url, or None if it was evicted since the lookup"""
+        row = self.pool.fetchone('SELECT body, last_used FROM http_cache WHERE url = ?', (url,))
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] >= self.touch_interval:
+            with self.pool.transaction() as c:
+                c.execute('UPDATE http_cache SET last_used = ? WHERE url = ?', (now, url))
+        return zlib.decompress(row[0])
+
+    def put(self, url, body, expires_at, etag=None, last_modified=None):
+        compressed = zlib.compress(body, self.compress_level)
+        now = time.time()
+        with self.pool.transaction() as c:
+            c.execute('''INSERT OR REPLACE INTO http_cache
+                         (url, etag, last_modified, body, size, stored_at, expires_at, last_used)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                      (url, etag, last_modified, compressed, len(compressed), now, expires_at, now))
+        self._writes += 1
+        self._approx_bytes += len(compressed)
+        # Other workers write too, so recount now and then even when under the cap
+        if self._approx_bytes > self.max_bytes or self._writes % 100 == 0:
+            self.evict()
+
+    def touch(self, url, expires_at):
+        """Extend an entry's freshness after a 304 Not Modified"""
+        with self.pool.transaction() as c:
+            c.execute('UPDATE http_cache SET expires_at = ?, last_used = ? WHERE url = ?',
+                      (expires_at, time.time(), url))
+
+    def evict(self):
+        """Drop least recently used entries until the total size is under max_bytes"""
+        with self.pool.transaction() as c:
+            c.execute('''DELETE FROM http_cache WHERE url IN (
+                SELECT url FROM (
+                    SELECT url, SUM(size) OVER (ORDER BY last_used DESC, url) AS running
+                    FROM http_cache
+                ) WHERE running > ?
+            )''', (self.max_bytes,))
+            self.evictions += c.rowcount
+            c.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache')
+            self._approx_bytes = c.fetchone()[0]
+
+    def clear(self):
+        with self.pool.transaction() as c:
+            c.execute('DELETE FROM http_cache')
+        self._approx_bytes = 0
+
+    def stats(self):
+        entries, size = self.pool.fetchone('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache')
+        return {'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class RateLimited(Exception):
+    pass
+
+
+class HostRateLimiter:
+    """Token bucket per host: ``rate`` requests a second with bursts of up to ``burst``"""
+
+    def __init__(self, rate=1.0, burst=5, max_wait=5.0, host_rates=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.host_rates = host_rates or {}
+        self._buckets = {}  # host -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        """Reserve a request slot for host, sleeping until it is due; returns seconds waited"""
+        rate = self.host_rates.get(host, self.rate)
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * rate) - 1
+            # A negative balance is a queue of callers; each waits for its own token
+            wait = max(0.0, -tokens / rate)
+            if wait > self.max_wait:
+                raise RateLimited(f'{host}: next request slot is {wait:.1f}s away')
+            self._buckets[host] = (tokens, now)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class HttpFetcher:
+    """HTTP GETs for the scrapers
+
+    One pooled session, a response cache shared across workers, conditional
+    revalidation with ETag / Last-Modified, per-host rate limits, and
+    coalescing of concurrent requests for the same URL.
+    """
+
+    def __init__(self, headers=None, timeout=10, cache=None, default_ttl=120, rate=1.0, burst=5,
+                 max_wait=5.0, host_rates=None, pool_maxsize=16):
+        self.timeout = timeout
+        self.cache = cache
+        self.default_ttl = default_ttl
+
+        # requests keeps one urllib3 connection pool per host under each adapter
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.limiter = HostRateLimiter(rate, burst, max_wait, host_rates)
+        self.inflight = SingleFlight()
+        self.counters = {'requests': 0, 'hits': 0, 'misses': 0, 'revalidated': 0, 'not_modified': 0,
+                         'stored': 0, 'uncacheable': 0, 'throttled_seconds': 0.0}
+
+    def _cached(self, url):
+        """(entry, is_fresh) for url"""
+        entry = self.cache.get(url) if self.cache is not None else None
+        return entry, entry is not None and entry['expires_at'] > time.time()
+
+    def _fresh_body(self, url):
+        """(body or None if not fresh in the cache, cache entry or None)"""
+        entry, fresh = self._cached(url)
+        body = self.cache.read_body(url) if fresh else None
+        if body is not None:
+            self.counters['hits'] += 1
+        return body, entry
+
+    def get(self, url):
+        """Response body for url, from the cache when still fresh"""
+        self.counters['requests'] += 1
+        body, _ = self._fresh_body(url)
+        if body is not None:
+            return body
+        # Concurrent misses for one URL share a single upstream request
+        return self.inflight.do(url, lambda: self._fetch(url))
+
+    def _fetch(self, url):
+        # Someone may have just refreshed it while this caller waited to lead
+        # (a metadata read; the body is only loaded when it is fresh)
+        body, entry = self._fresh_body(url)
+        if body is not None:
+            return body
+
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+            self.counters['revalidated'] += 1 if headers else 0
+        self.counters['misses'] += 0 if headers else 1
+
+        self.counters['throttled_seconds'] += self.limiter.acquire(urlsplit(url).hostname)
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and entry is not None:
+            body = self.cache.read_body(url)
+            if body is not None:
+                self.counters['not_modified'] += 1
+                lifetime = freshness_lifetime(response.headers, self.default_ttl) or 0
+                self.cache.touch(url, time.time() + lifetime)
+                return body
+            # Evicted while we revalidated: ask again without the validators
+            self.counters['throttled_seconds'] += self.limiter.acquire(urlsplit(url).hostname)
+            response = self.session.get(url, timeout=self.timeout)
+
+        response.raise_for_status()
+        body = response.content
+        self._store(url, response, body)
+        return body
+
+    def _store(self, url, response, body):
+        if self.cache is None:
+            return
+        lifetime = freshness_lifetime(response.headers, self.default_ttl)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        # Worth keeping if it can be served fresh or at least revalidated cheaply
+        if lifetime is None or (lifetime == 0 and not (etag or last_modified)):
+            self.counters['uncacheable'] += 1
+            return
+        self.cache.put(url, body, time.time() + lifetime, etag, last_modified)
+        self.counters['stored'] += 1
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['throttled_seconds'] = round(stats['throttled_seconds'], 3)
+        stats['coalesced'] = self.inflight.stats['shared']
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
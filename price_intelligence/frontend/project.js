@@ -289,16 +289,49 @@ async function performSearch() {
     if (mlInsights) mlInsights.style.display = 'none';
     
     try {
-        // For demo - use local data
-        await new Promise(resolve => setTimeout(resolve, 1000));
+        // Render each store's deals as soon as the server streams them
+        const startedAt = performance.now();
+        let firstResultMs = null;
+        const results = [];
+        currentSearchData = { success: true, query: query, results: results, statistics: null, predictions: null };
         
-        // Hide loader
-        if (loader) loader.classList.add('hidden');
-        
-        // Generate demo data
-        useDemoData(query);
+        await streamSearch(query, event => {
+            switch (event.type) {
+                case 'start':
+                    currentSearchData.platforms = event.platforms;
+                    break;
+                case 'products': {
+                    if (firstResultMs === null) {
+                        firstResultMs = performance.now() - startedAt;
+                        if (loader) loader.classList.add('hidden');
+                    }
+                    const rendered = results.length;
+                    results.push(...event.results);
+                    renderProductCards(results, rendered);
+                    break;
+                }
+                case 'statistics':
+                    currentSearchData.statistics = event.statistics;
+                    updateStatistics(event.statistics);
+                    break;
+                case 'predictions':
+                    currentSearchData.predictions = event.predictions;
+                    displayPredictions(event.predictions);
+                    renderComparisonTable(results);
+                    if (chartContainer) chartContainer.style.display = 'block';
+                    if (comparisonTable) comparisonTable.style.display = 'block';
+                    if (mlInsights) mlInsights.style.display = 'block';
+                    break;
+                case 'done':
+                    console.log(`⚡ First results after ${Math.round(firstResultMs)} ms, complete after ${Math.round(performance.now() - startedAt)} ms (server: ${event.first_result_ms} / ${event.total_ms} ms)`);
+                    break;
+                case 'error':
+                    throw new Error(event.error);
+            }
+        });
         
-        showNotification(`✅ Found 6 deals for "${query}"!`, 'success');
+        if (loader) loader.classList.add('hidden');
+        showNotification(`✅ Found ${results.length} deals for "${query}"!`, 'success');
         
     } catch (error) {
         console.error('❌ Search error:', error);
@@ -312,6 +345,39 @@ async function performSearch() {
     }
 }
 
+// ==================== STREAMING SEARCH ====================
+// Reads /api/search/stream (one JSON event per line) and hands each event to onEvent as it arrives
+async function streamSearch(query, onEvent) {
+    const headers = { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' };
+    if (authToken) headers['Authorization'] = `Bearer ${authToken}`;
+    
+    const response = await fetch(`${API_BASE_URL}/search/stream`, {
+        method: 'POST',
+        headers: headers,
+        body: JSON.stringify({ product: query })
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Search failed with status ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline).trim();
+            buffer = buffer.slice(newline + 1);
+            if (line) onEvent(JSON.parse(line));
+        }
+    }
+}
+
 // ==================== VOICE SEARCH ====================
 function toggleVoiceSearch() {
     if (isListening) {
@@ -705,7 +771,8 @@ function getProductURL(query, platform) {
 }
 
 // ==================== RENDERING FUNCTIONS ====================
-function renderProductCards(products) {
+// Cards before animateFrom were already on screen and appear without animating again
+function renderProductCards(products, animateFrom = 0) {
     const grid = document.getElementById('resultsGrid');
     if (!grid) return;
     
@@ -729,11 +796,18 @@ function renderProductCards(products) {
         if (card) {
             grid.appendChild(card);
             
+            if (index < animateFrom) {
+                card.style.transition = 'none';
+                card.style.opacity = '1';
+                card.style.transform = 'translateY(0)';
+                return;
+            }
+            
             // Animate cards
             setTimeout(() => {
                 card.style.opacity = '1';
                 card.style.transform = 'translateY(0)';
-            }, index * 100);
+            }, (index - animateFrom) * 100);
         }
     });
 }
@@ -764,7 +838,7 @@ function createProductCard(product, isBestPrice, index) {
         ${isBestPrice ? '<div class="best-price-badge">🏆 BEST PRICE</div>' : ''}
         ${discount > 0 ? `<div class="discount-badge">${discount}% OFF</div>` : ''}
         
-        <div class="platform-icon">${product.platform_icon || '🛒'}</div>
+        <div class="platform-icon">${platformIcon(product)}</div>
         <div class="platform-name">${product.platform || 'Store'}</div>
         
         <div class="price" style="color: ${isBestPrice ? '#22c55e' : 'white'}; font-size: 2.5rem; margin: 15px 0;">
@@ -990,7 +1064,7 @@ function renderComparisonTable(products) {
             <tr style="background: ${isBest ? 'rgba(34, 197, 94, 0.05)' : 'transparent'};">
                 <td>
                     <div style="display: flex; align-items: center; gap: 10px;">
-                        <span style="font-size: 1.3rem;">${p.platform_icon || '🛒'}</span>
+                        <span style="font-size: 1.3rem;">${platformIcon(p)}</span>
                         <span style="font-weight: 600;">${p.platform || 'Store'}</span>
                         ${isBest ? '<span style="color: #22c55e; font-size: 1.2rem;">🏆</span>' : ''}
                     </div>
@@ -1551,6 +1625,13 @@ function upgradeToPremium() {
 }
 
 // ==================== HELPER FUNCTIONS ====================
+// The server sends store icons once per search in `platforms`; demo data still carries them per product
+function platformIcon(product) {
+    const platforms = (currentSearchData && currentSearchData.platforms) || {};
+    const meta = platforms[product.platform];
+    return product.platform_icon || (meta && meta.icon) || '🛒';
+}
+
 function showNotification(message, type = 'info') {
     const colors = {
         'success': '#22c55e',
@@ -1,3 +1,68 @@
-bind = "0.0.0.0:10000"
-workers = 2
-timeout = 120
\ No newline at end of file
+import importlib.util
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 10000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = 120
+wsgi_app = 'app:app'
+
+# Worker model, picked with GUNICORN_WORKER_CLASS:
+#   sync    - one request per process at a time (the old behaviour)
+#   gthread - GUNICORN_THREADS requests per process on OS threads (default)
+#   gevent  - thousands of requests per process on greenlets
+#   uvicorn - ASGI event loop serving asgi.py
+# gevent and uvicorn need the extras: pip install -r requirements-async.txt
+#
+# The default used to be sync: 2 workers served 2 requests at once, with a
+# 120 s timeout. It is now gthread with 32 threads, so the same 2 workers
+# serve up to 64 concurrent requests, and the timeout is 30 s. Set
+# GUNICORN_WORKER_CLASS=sync to get the old model back, or lower
+# GUNICORN_THREADS if a host is short on memory.
+worker_mode = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# Fail at boot with the fix spelled out, not with an import error from inside a worker
+EXTRA_MODULES = {'gevent': ['gevent'], 'uvicorn': ['uvicorn', 'a2wsgi']}
+missing = [name for name in EXTRA_MODULES.get(worker_mode, []) if importlib.util.find_spec(name) is None]
+if missing:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS={worker_mode} needs {', '.join(missing)}: "
+                       f"pip install -r requirements-async.txt")
+
+if worker_mode == 'gthread':
+    worker_class = 'gthread'
+    # Memory per worker grows with threads: each one that touches the database opens
+    # its own SQLite connection with a SQLITE_CACHE_KB page cache (2 MB by default),
+    # so 32 threads plus the background ones cost up to ~90 MB of page cache per worker
+    threads = int(os.environ.get('GUNICORN_THREADS', 32))
+elif worker_mode == 'gevent':
+    worker_class = 'gevent'
+    # Outbound requests, sleeps and locks yield to other greenlets while they wait
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+elif worker_mode == 'uvicorn':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:application'
+else:
+    worker_class = 'sync'
+
+if worker_mode != 'sync':
+    # Only a stuck worker (no heartbeat) is killed; long scrapes no longer need a big timeout
+    timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+    keepalive = 5
+
+
+def on_starting(server):
+    # Minify, hash and precompress the frontend once, before any worker loads it
+    from assets import build, is_stale
+    if is_stale():
+        build()
+
+
+def worker_exit(server, worker):
+    # Write out search logs and price history still buffered in this worker
+    from database import flush_all_writers
+    flush_all_writers()
+
+
+def post_worker_init(worker):
+    # The app and its price model are loaded by now; warm the model before taking traffic
+    from app import predictor
+    predictor.warm_up()
@@ -0,0 +1,72 @@
+from database import BatchWriter, pool, utc_timestamp
+from cache import normalize_query
+from rollups import price_rollups
+
+
+class PriceHistory:
+    """Append-only price observations, written in batches
+
+    Each flush also updates the hourly and daily rollups (rollups.py) in the
+    same transaction.
+    """
+
+    INSERT_SQL = 'INSERT INTO price_history (product_name, platform, price, timestamp) VALUES (?, ?, ?, ?)'
+
+    def __init__(self, max_batch=500, flush_interval=2.0, rollups=None):
+        self.rollups = rollups or price_rollups
+        self.writer = BatchWriter(self.INSERT_SQL, max_batch=max_batch, flush_interval=flush_interval,
+                                  name='price-history-writer', on_flush=self.rollups.apply_rows)
+
+    def ensure_schema(self):
+        """Create price_history and its lookup indexes, then the rollup tables"""
+        with pool.transaction() as c:
+            c.execute('''CREATE TABLE IF NOT EXISTS price_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_name TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                price REAL NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )''')
+            # History lookups filter by product (and platform) over a time window
+            c.execute('''CREATE INDEX IF NOT EXISTS idx_price_history_product_platform_ts
+                         ON price_history(product_name, platform, timestamp)''')
+            c.execute('''CREATE INDEX IF NOT EXISTS idx_price_history_product_ts
+                         ON price_history(product_name, timestamp)''')
+        self.rollups.ensure_schema()
+
+    def record(self, product_name, platform, price):
+        self.rollups.ensure_schema()
+        self.writer.add((normalize_query(product_name), platform, float(price), utc_timestamp()))
+
+    def record_products(self, product_name, products):
+        """Queue one observation per scraped product (needs 'platform' and 'price')
+
+        Generated offers (real_data not set) are skipped: the model trains on
+        this table and the rollups aggregate it, so only observed prices go in.
+        """
+        self.rollups.ensure_schema()
+        key = normalize_query(product_name)
+        now = utc_timestamp()
+        self.writer.add_many([(key, p['platform'], float(p['price']), now)
+                              for p in products if p.get('real_data') and p.get('price')])
+
+    def flush(self):
+        return self.writer.flush()
+
+    def get_history(self, product_name, platform=None, days=30, limit=1000):
+        """Raw observations for a product, oldest first (rollups.series for charts and long ranges)"""
+        key = normalize_query(product_name)
+        since = f'-{int(days)} days'
+        if platform:
+            rows = pool.fetchall('''SELECT platform, price, timestamp FROM price_history
+                                    WHERE product_name = ? AND platform = ? AND timestamp > datetime('now', ?)
+                                    ORDER BY timestamp DESC LIMIT ?''', (key, platform, since, limit))
+        else:
+            rows = pool.fetchall('''SELECT platform, price, timestamp FROM price_history
+                                    WHERE product_name = ? AND timestamp > datetime('now', ?)
+                                    ORDER BY timestamp DESC LIMIT ?''', (key, since, limit))
+        return [{'platform': r[0], 'price': r[1], 'timestamp': r[2]} for r in reversed(rows)]
+
+
+# Global history instance
+price_history = PriceHistory()
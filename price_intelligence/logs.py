@@ -0,0 +1,74 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+# LOG_LEVEL=DEBUG shows per-request lines (searches, scrapes); INFO keeps startup and
+# background-job summaries; each call site logs at most LOG_RATE_LIMIT records per
+# LOG_RATE_WINDOW seconds, so a failing dependency can't flood the output.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_RATE_LIMIT = int(os.environ.get('LOG_RATE_LIMIT', 20))
+LOG_RATE_WINDOW = float(os.environ.get('LOG_RATE_WINDOW', 60))
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops records from a call site past ``limit`` per ``window`` seconds
+
+    The first record let through after a suppressed stretch says how many
+    were dropped. Call sites are (file, line), so one noisy error doesn't
+    silence the others.
+    """
+
+    def __init__(self, limit=LOG_RATE_LIMIT, window=LOG_RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._sites = {}  # (pathname, lineno) -> [window_start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.limit <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < self.limit:
+                site[1] += 1
+                suppressed = 0
+            else:
+                site[2] += 1
+                return False
+        if suppressed:
+            record.msg = f'{record.msg} ({suppressed} similar messages suppressed)'
+        return True
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _configure():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'))
+        handler.addFilter(RateLimitFilter())
+        root = logging.getLogger('pricesmart')
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        # Gunicorn/Flask configure the root logger their own way; keep ours separate
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name):
+    """Logger for a module, e.g. get_logger('scraper') -> 'pricesmart.scraper'"""
+    _configure()
+    return logging.getLogger(f'pricesmart.{name}')
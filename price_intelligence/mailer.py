@@ -0,0 +1,301 @@
+import html
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from string import Template
+
+from cache import normalize_query
+from logs import get_logger
+
+log = get_logger('mailer')
+
+# SMTP settings come from the environment; without SMTP_HOST alerts are only logged
+SMTP_HOST = os.environ.get('SMTP_HOST')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_USER = os.environ.get('SMTP_USER')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '1') == '1'
+ALERT_SENDER = os.environ.get('ALERT_SENDER', 'alerts@pricesmart.ai')
+APP_URL = os.environ.get('APP_URL', 'http://localhost:5000')
+
+# Templates are parsed once at import; only substitution runs per message
+DIGEST_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #c026d3, #3b82f6); color: white; padding: 30px; text-align: center; border-radius: 10px; }
+        .content { padding: 20px; background: #f9f9f9; border-radius: 10px; margin-top: 20px; }
+        .price { font-size: 32px; font-weight: bold; color: #22c55e; }
+        .old-price { text-decoration: line-through; color: #666; }
+        .savings { background: #22c55e; color: white; padding: 10px 20px; border-radius: 20px; font-weight: bold; }
+        .button { display: inline-block; background: #c026d3; color: white; padding: 12px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🎯 PriceSmart AI Alert</h1>
+            <p>$headline</p>
+        </div>
+        $items
+        <div class="content">
+            <p style="margin-top: 10px;">
+                <a href="$app_url" class="button">View on PriceSmart AI →</a>
+            </p>
+
+            <p style="margin-top: 30px; color: #666; font-size: 14px;">
+                This alert was triggered because the price reached your target.<br>
+                You can manage your alerts in your PriceSmart AI account.
+            </p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+ITEM_TEMPLATE = Template("""
+        <div class="content">
+            <h2>$product_name</h2>
+
+            <div style="margin: 30px 0;">
+                <span class="old-price">₹$old_price</span>
+                <span class="price">→ ₹$new_price</span>
+            </div>
+
+            <div class="savings">
+                You save: ₹$savings
+            </div>
+        </div>
+""")
+
+
+def format_price(value):
+    return f"{value:,.0f}" if value is not None else '-'
+
+
+def render_digest(alerts):
+    """HTML body for one recipient's alerts"""
+    items = ''.join(
+        ITEM_TEMPLATE.substitute(
+            product_name=html.escape(a['product_name']),
+            old_price=format_price(a['old_price']),
+            new_price=format_price(a['new_price']),
+            savings=format_price(a['savings'])
+        )
+        for a in alerts
+    )
+    headline = 'Your price drop is here!' if len(alerts) == 1 else f'{len(alerts)} of your items dropped in price!'
+    return DIGEST_TEMPLATE.substitute(headline=headline, items=items, app_url=APP_URL)
+
+
+class AlertMailer:
+    """Background delivery of price alerts over one reused SMTP connection
+
+    Alerts are queued by ``enqueue`` and collected for ``digest_window``
+    seconds. Each recipient then gets one email covering all their products,
+    with repeats of the same product collapsed to the lowest price. Failed
+    sends are retried with exponential backoff.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, sender=ALERT_SENDER, digest_window=30, max_retries=4,
+                 retry_base_delay=2.0, idle_timeout=60):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.idle_timeout = idle_timeout
+        self.stats = {'queued': 0, 'deduplicated': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'connections': 0}
+
+        self._queue = queue.Queue()
+        # recipient -> {normalized product -> alert}
+        self._pending = {}
+        self._pending_since = None
+        self._retries = []  # (due_at, attempt, recipient, alerts)
+        self._smtp = None
+        self._smtp_used_at = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    # ---------- producer side ----------
+
+    def enqueue(self, email, product_name, old_price, new_price, savings):
+        """Queue an alert; returns immediately"""
+        self._ensure_thread()
+        self._queue.put({
+            'email': email,
+            'product_name': product_name,
+            'old_price': old_price,
+            'new_price': new_price,
+            'savings': savings
+        })
+        self.stats['queued'] += 1
+        return True
+
+    def flush(self, wait=True, timeout=30):
+        """Send pending digests (and due retries) now instead of waiting for the digest window"""
+        if self._thread is None:
+            return True
+        self._ensure_thread()
+        done = threading.Event()
+        # FIFO queue: every alert queued before this point is collected first
+        self._queue.put(done)
+        return done.wait(timeout) if wait else True
+
+    def _ensure_thread(self):
+        with self._lock:
+            # A new process (fork) needs its own thread; so does one whose thread died
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._smtp = None
+                self._thread = threading.Thread(target=self._run, name='alert-mailer', daemon=True)
+                self._thread.start()
+
+    # ---------- worker side ----------
+
+    def _collect(self, alert):
+        recipient = self._pending.setdefault(alert['email'], {})
+        key = normalize_query(alert['product_name'])
+        existing = recipient.get(key)
+        if existing is not None:
+            self.stats['deduplicated'] += 1
+            # Keep the deepest drop, but the oldest "was" price
+            if alert['new_price'] >= existing['new_price']:
+                return
+            alert = dict(alert, old_price=existing['old_price'])
+            alert['savings'] = (alert['old_price'] or alert['new_price']) - alert['new_price']
+        recipient[key] = alert
+        if self._pending_since is None:
+            self._pending_since = time.time()
+
+    def _next_wakeup(self):
+        deadlines = []
+        if self._pending_since is not None:
+            deadlines.append(self._pending_since + self.digest_window)
+        if self._retries:
+            deadlines.append(min(r[0] for r in self._retries))
+        if self._smtp is not None:
+            deadlines.append(self._smtp_used_at + self.idle_timeout)
+        if not deadlines:
+            return None
+        return max(0, min(deadlines) - time.time())
+
+    def _run(self):
+        while True:
+            flush_events = []
+            try:
+                item = self._queue.get(timeout=self._next_wakeup())
+                # Drain whatever else is already queued before deciding to send
+                while True:
+                    if isinstance(item, threading.Event):
+                        flush_events.append(item)
+                    else:
+                        self._collect(item)
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                self._send_due(force=bool(flush_events))
+            except Exception:
+                # Anything escaping here would end the thread and strand every later alert
+                log.exception("❌ Alert delivery error")
+            finally:
+                for done in flush_events:
+                    done.set()
+
+    def _send_due(self, force=False):
+        now = time.time()
+        # Pick the due retries first: a digest that fails below waits out its backoff
+        due, later = [], []
+        for retry in self._retries:
+            (due if force or retry[0] <= now else later).append(retry)
+        self._retries = later
+
+        if self._pending and (force or now - self._pending_since >= self.digest_window):
+            pending, self._pending, self._pending_since = self._pending, {}, None
+            for email, alerts in pending.items():
+                self._deliver(email, list(alerts.values()), attempt=0)
+
+        for _, attempt, email, alerts in due:
+            self._deliver(email, alerts, attempt)
+
+        if self._smtp is not None and time.time() - self._smtp_used_at >= self.idle_timeout:
+            self._disconnect()
+
+    def _build_message(self, email, alerts):
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = email
+        if len(alerts) == 1:
+            msg['Subject'] = f"🔥 Price Drop Alert: {alerts[0]['product_name']}"
+        else:
+            msg['Subject'] = f"🔥 Price Drop Alert: {len(alerts)} items on your watchlist"
+        msg.attach(MIMEText(render_digest(alerts), 'html'))
+        return msg
+
+    def _connection(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except smtplib.SMTPException:
+                self._disconnect()
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            smtp.starttls()
+        if self.user:
+            smtp.login(self.user, self.password)
+        self._smtp = smtp
+        self._smtp_used_at = time.time()
+        self.stats['connections'] += 1
+        return smtp
+
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _deliver(self, email, alerts, attempt):
+        if not self.host:
+            # No SMTP configured: log the digest, as the demo setup always did
+            log.info("📧 Price alert digest for %s: %d item(s)", email, len(alerts))
+            self.stats['sent'] += 1
+            return
+
+        try:
+            message = self._build_message(email, alerts)
+        except Exception as e:
+            # A bad value in the alert won't render on a retry either; the other digests still go out
+            self.stats['failed'] += 1
+            log.error("❌ Could not build alert email for %s: %s", email, e)
+            return
+
+        try:
+            self._connection().send_message(message)
+            self._smtp_used_at = time.time()
+            self.stats['sent'] += 1
+        except (smtplib.SMTPException, OSError) as e:
+            self._disconnect()
+            if attempt + 1 >= self.max_retries:
+                self.stats['failed'] += 1
+                log.error("❌ Failed to send alert email to %s after %d attempts: %s", email, attempt + 1, e)
+                return
+            delay = self.retry_base_delay * (2 ** attempt)
+            self._retries.append((time.time() + delay, attempt + 1, email, alerts))
+            self.stats['retried'] += 1
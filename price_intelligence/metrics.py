@@ -0,0 +1,259 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Every process (gunicorn workers, the scheduler) writes its metrics to its own file
+# here every few seconds; /api/metrics adds them all up. (Not imported from database,
+# which times its queries with this module.)
+METRICS_DIR = os.environ.get('PRICESMART_METRICS_DIR',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    type = 'counter'
+    registry = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        self.registry.touch()
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations (seconds) or other values"""
+
+    type = 'histogram'
+    registry = None
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        self.registry.touch()
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        # Index of the first bucket the value fits in; len(buckets) is +Inf
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(row)] for key, row in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """This process's metrics, written to METRICS_DIR for /api/metrics to merge"""
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self.changed = False
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        metric.registry = self
+        self.metrics[metric.name] = metric
+        return metric
+
+    def touch(self):
+        """Called before every update: marks the metrics dirty and starts the flusher in a new process"""
+        self.changed = True
+        if self._pid != os.getpid():
+            self.start()
+
+    def start(self):
+        """Start the background flusher for this process (again after a fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked child: the parent's numbers are the parent's
+                for metric in self.metrics.values():
+                    metric.reset()
+            self._pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = self._pid
+        while pid == os.getpid():
+            time.sleep(self.flush_interval)
+            if self.changed:
+                self.flush()
+
+    def path_for(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def snapshot(self):
+        return {
+            name: {'type': m.type, 'help': m.help, 'labels': list(m.labelnames),
+                   'buckets': list(getattr(m, 'buckets', ())), 'samples': m.snapshot()}
+            for name, m in self.metrics.items()
+        }
+
+    def flush(self):
+        """Write this process's metrics atomically (tmp file + rename)"""
+        self.changed = False
+        path = self.path_for(os.getpid())
+        tmp = f'{path}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def collect(self):
+        """Metrics of every live process, merged: counters and histogram buckets are summed"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.flush()
+        merged = {}
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            pid = int(filename[8:-5])
+            if not _alive(pid):
+                # Its counts leave the totals; Prometheus treats that like a restart
+                _remove(os.path.join(self.directory, filename))
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, dict(metric, samples={}))
+                for labels, value in metric['samples']:
+                    key = tuple(labels)
+                    if key not in target['samples']:
+                        target['samples'][key] = value
+                    elif metric['type'] == 'histogram':
+                        target['samples'][key] = [a + b for a, b in zip(target['samples'][key], value)]
+                    else:
+                        target['samples'][key] += value
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for labels, value in sorted(metric['samples'].items()):
+                pairs = list(zip(metric['labels'], labels))
+                if metric['type'] == 'counter':
+                    lines.append(f'{name}{_labels(pairs)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(metric['buckets']) + ['+Inf'], value[:-1]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f'{name}_bucket{_labels(pairs + [("le", le)])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(pairs)} {_number(value[-1])}')
+                lines.append(f'{name}_count{_labels(pairs)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = ('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+atexit.register(lambda: registry.flush() if registry._pid == os.getpid() else None)
+
+# ==================== METRICS ====================
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'pricesmart_http_request_duration_seconds', 'Time to handle an API request',
+    ('endpoint', 'method', 'status'))
+SEARCH_STAGE_SECONDS = registry.histogram(
+    'pricesmart_search_stage_seconds', 'Time spent in each stage of a search request', ('stage',))
+SCRAPE_SECONDS = registry.histogram(
+    'pricesmart_scrape_duration_seconds', 'Time to fetch and parse one platform', ('platform',))
+SCRAPE_RESULTS = registry.counter(
+    'pricesmart_scrape_total', 'Platform scrapes by outcome (ok, empty, error, timeout)', ('platform', 'outcome'))
+DB_QUERY_SECONDS = registry.histogram(
+    'pricesmart_db_query_duration_seconds', 'SQLite time per call, by kind of call', ('op',))
+ALERT_CHECK_SECONDS = registry.histogram(
+    'pricesmart_alert_check_duration_seconds', 'Time for one watchlist price check run',
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+ALERT_EVENTS = registry.counter(
+    'pricesmart_alert_events_total', 'Watchlist checker events (items checked, fetch failures, alerts)', ('event',))
+JSON_RESPONSE_BYTES = registry.counter(
+    'pricesmart_json_response_bytes_total', 'JSON API body bytes before (json) and after (sent) compression / 304s',
+    ('endpoint', 'stage'))
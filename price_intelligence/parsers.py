@@ -0,0 +1,214 @@
+# Extraction backends for RealScraper: the fastest installed one is used,
+# selectolax (lexbor) > lxml (+cssselect) > BeautifulSoup.
+import threading
+
+try:
+    from selectolax.lexbor import LexborCSSSelector, LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+    from cssselect import GenericTranslator
+except ImportError:
+    lxml = None
+
+from bs4 import BeautifulSoup, UnicodeDammit
+import soupsieve
+
+
+def to_text(html):
+    """Decode response bytes; both sites serve UTF-8, so only sniff when that fails"""
+    if isinstance(html, str):
+        return html
+    try:
+        return html.decode('utf-8')
+    except UnicodeDecodeError:
+        return UnicodeDammit(html).unicode_markup
+
+
+class PlatformSpec:
+    """Selectors for one platform's search results page
+
+    ``items`` are tried in order until one matches. Each field maps to a
+    list of fallback selectors; the first one that matches wins. ``attrs``
+    names fields whose value is an attribute (e.g. href) rather than text.
+    """
+
+    def __init__(self, name, items, fields, attrs=None, limit=5):
+        self.name = name
+        self.items = items
+        self.fields = fields
+        self.attrs = attrs or {}
+        self.limit = limit
+
+
+PLATFORM_SPECS = {
+    'Amazon': PlatformSpec(
+        'Amazon',
+        items=['div[data-component-type="s-search-result"]', '.s-result-item', '[data-asin]'],
+        fields={
+            'title': ['h2 a span', '.a-size-medium', '.a-text-normal'],
+            'price': ['.a-price-whole', '.a-price .a-offscreen'],
+            'rating': ['.a-icon-alt'],
+            'reviews': ['.a-size-base'],
+            'link': ['h2 a'],
+        },
+        attrs={'link': 'href'}
+    ),
+    'Flipkart': PlatformSpec(
+        'Flipkart',
+        items=['div[data-id]'],
+        fields={
+            'title': ['a[title]', '._4rR01T', '.s1Q9rs'],
+            'price': ['._30jeq3', '._30jeq3._16Jk6d', 'div._30jeq3'],
+            'rating': ['._3LWZlK', 'div._3LWZlK'],
+            'reviews': ['._2_R_DZ span span:last-child'],
+            'link': ['a[href]'],
+        },
+        attrs={'link': 'href'}
+    ),
+}
+
+
+class Bs4Backend:
+    """BeautifulSoup with soupsieve selectors compiled once"""
+
+    name = 'bs4'
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.parser = 'lxml' if lxml is not None else 'html.parser'
+        self.items = [soupsieve.compile(s) for s in spec.items]
+        self.fields = {f: [soupsieve.compile(s) for s in sels] for f, sels in spec.fields.items()}
+
+    def extract(self, html):
+        soup = BeautifulSoup(html, self.parser)
+        nodes = []
+        for selector in self.items:
+            nodes = selector.select(soup, limit=self.spec.limit)
+            if nodes:
+                break
+
+        rows = []
+        for node in nodes:
+            row = {}
+            for field, selectors in self.fields.items():
+                attr = self.spec.attrs.get(field)
+                for selector in selectors:
+                    match = selector.select_one(node)
+                    if match is not None:
+                        row[field] = match.get(attr) if attr else match.get_text()
+                        break
+                else:
+                    row[field] = None
+            rows.append(row)
+        return rows
+
+
+class LxmlBackend:
+    """lxml tree with selectors translated to precompiled XPath"""
+
+    name = 'lxml'
+
+    def __init__(self, spec):
+        self.spec = spec
+        translate = GenericTranslator().css_to_xpath
+        self.items = [etree.XPath(translate(s)) for s in spec.items]
+        # Field selectors are evaluated relative to the item node
+        self.fields = {f: [etree.XPath(translate(s, prefix='descendant::')) for s in sels]
+                       for f, sels in spec.fields.items()}
+
+    def extract(self, html):
+        root = lxml.html.fromstring(to_text(html))
+        nodes = []
+        for xpath in self.items:
+            nodes = xpath(root)
+            if nodes:
+                break
+
+        rows = []
+        for node in nodes[:self.spec.limit]:
+            row = {}
+            for field, xpaths in self.fields.items():
+                attr = self.spec.attrs.get(field)
+                for xpath in xpaths:
+                    matches = xpath(node)
+                    if matches:
+                        row[field] = matches[0].get(attr) if attr else matches[0].text_content()
+                        break
+                else:
+                    row[field] = None
+            rows.append(row)
+        return rows
+
+
+class SelectolaxBackend:
+    """lexbor parser via selectolax; the C engine parses and matches selectors
+
+    selectolax has no public compiled-selector object: ``node.css`` builds a
+    lexbor CSS parser and selector engine, parses the query and tears it all
+    down on every call. Here each thread keeps one ``LexborCSSSelector``
+    (parser plus engine) for all its lookups, so a call only parses the
+    short query string, and field lookups stop at the first match.
+    """
+
+    name = 'selectolax'
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.items = list(spec.items)
+        self.fields = [(field, spec.attrs.get(field), list(selectors)) for field, selectors in spec.fields.items()]
+        self._local = threading.local()
+
+    def _selector(self):
+        selector = getattr(self._local, 'selector', None)
+        if selector is None:
+            selector = self._local.selector = LexborCSSSelector()
+        return selector
+
+    def extract(self, html):
+        tree = LexborHTMLParser(to_text(html))
+        selector = self._selector()
+        nodes = []
+        for query in self.items:
+            nodes = selector.find(query, tree.root)
+            if nodes:
+                break
+
+        rows = []
+        for node in nodes[:self.spec.limit]:
+            row = {}
+            for field, attr, queries in self.fields:
+                for query in queries:
+                    # A list of at most one node
+                    matches = selector.find_first(query, node)
+                    if matches:
+                        row[field] = matches[0].attributes.get(attr) if attr else matches[0].text()
+                        break
+                else:
+                    row[field] = None
+            rows.append(row)
+        return rows
+
+
+BACKENDS = {
+    'selectolax': SelectolaxBackend if LexborHTMLParser is not None else None,
+    'lxml': LxmlBackend if lxml is not None else None,
+    'bs4': Bs4Backend,
+}
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend is not None]
+
+
+def get_extractor(platform, backend=None):
+    """Extractor for a platform using the named backend, or the fastest installed one"""
+    spec = PLATFORM_SPECS[platform]
+    name = backend or available_backends()[0]
+    backend_cls = BACKENDS.get(name)
+    if backend_cls is None:
+        raise ValueError(f"HTML backend '{name}' is not installed")
+    return backend_cls(spec)
@@ -0,0 +1,190 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from database import native_thread_ident
+
+# Stored hashes carry their own algorithm and cost: 'scrypt$16384$8$1$<salt>$<hash>',
+# 'pbkdf2_sha256$600000$<salt>$<hash>'. Rows from before that are a bare salted
+# SHA-256 hex digest with the salt in users.salt; they are upgraded at the next login.
+PASSWORD_KDF = os.environ.get('PASSWORD_KDF', 'scrypt')
+SCRYPT_N = int(os.environ.get('SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', 8))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', 1))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 600000))
+
+# KDF work runs on at most this many threads (hashlib releases the GIL, so they use
+# real cores; the default leaves half of them to other requests), with at most
+# KDF_MAX_PENDING logins queued; beyond that logins are turned away
+KDF_MAX_WORKERS = int(os.environ.get('KDF_MAX_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+KDF_MAX_PENDING = int(os.environ.get('KDF_MAX_PENDING', 32))
+
+# Seconds a successful (stored hash, password) check is remembered in memory; 0 disables
+VERIFIED_CACHE_TTL = int(os.environ.get('VERIFIED_CACHE_TTL', 300))
+
+
+class ScryptHasher:
+    name = 'scrypt'
+
+    def __init__(self, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32):
+        self.n, self.r, self.p, self.dklen = n, r, p, dklen
+
+    def params(self):
+        return f'{self.name}${self.n}${self.r}${self.p}'
+
+    def _derive(self, password, salt, n, r, p, dklen):
+        # maxmem: OpenSSL's 32 MB default is too small above n=2**15
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=dklen,
+                              maxmem=256 * n * r + 1024 * 1024)
+
+    def hash(self, password):
+        salt = secrets.token_bytes(16)
+        derived = self._derive(password, salt, self.n, self.r, self.p, self.dklen)
+        return f'{self.name}${self.n}${self.r}${self.p}${salt.hex()}${derived.hex()}'
+
+    def verify(self, password, encoded):
+        _, n, r, p, salt, expected = encoded.split('$')
+        expected = bytes.fromhex(expected)
+        derived = self._derive(password, bytes.fromhex(salt), int(n), int(r), int(p), len(expected))
+        return hmac.compare_digest(derived, expected)
+
+    def needs_rehash(self, encoded):
+        _, n, r, p, _, _ = encoded.split('$')
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+
+class Pbkdf2Hasher:
+    name = 'pbkdf2_sha256'
+
+    def __init__(self, iterations=PBKDF2_ITERATIONS):
+        self.iterations = iterations
+
+    def params(self):
+        return f'{self.name}${self.iterations}'
+
+    def hash(self, password):
+        salt = secrets.token_bytes(16)
+        derived = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.iterations)
+        return f'{self.name}${self.iterations}${salt.hex()}${derived.hex()}'
+
+    def verify(self, password, encoded):
+        _, iterations, salt, expected = encoded.split('$')
+        derived = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), int(iterations))
+        return hmac.compare_digest(derived, bytes.fromhex(expected))
+
+    def needs_rehash(self, encoded):
+        return int(encoded.split('$')[1]) != self.iterations
+
+
+HASHERS = {
+    ScryptHasher.name: ScryptHasher,
+    Pbkdf2Hasher.name: Pbkdf2Hasher,
+}
+
+
+def verify_legacy_sha256(password, stored_hash, salt):
+    """The original scheme: sha256(password + salt) as hex"""
+    return hmac.compare_digest(hashlib.sha256((password + salt).encode()).hexdigest(), stored_hash or '')
+
+
+def unusable_password():
+    """Stored for accounts that sign in through Google/GitHub; matches no password"""
+    return '!' + secrets.token_hex(16)
+
+
+class PasswordBusy(Exception):
+    """Too many password checks are already queued"""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with the configured KDF on a bounded thread pool
+
+    ``verify`` understands every scheme in ``HASHERS`` plus legacy salted
+    SHA-256 rows, and says when a stored hash should be replaced (legacy
+    scheme, other algorithm or other cost). Successful checks are
+    remembered for ``verified_ttl`` seconds under an HMAC of the stored
+    hash and password, so repeated logins skip the KDF; wrong passwords
+    always pay full price, and changing the stored hash invalidates the
+    entry.
+    """
+
+    def __init__(self, kdf=PASSWORD_KDF, max_workers=KDF_MAX_WORKERS, max_pending=KDF_MAX_PENDING,
+                 verified_ttl=VERIFIED_CACHE_TTL, verified_max_entries=10000, **params):
+        if kdf == 'pbkdf2':
+            kdf = Pbkdf2Hasher.name
+        self.hasher = HASHERS[kdf](**params)
+        self.max_workers = max_workers
+        self.executor = None
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.verified_ttl = verified_ttl
+        self.verified_max_entries = verified_max_entries
+        self._verified = OrderedDict()  # HMAC digest -> expires_at
+        self._verified_lock = threading.Lock()
+        self._cache_key = secrets.token_bytes(32)
+        self.stats = {'hashed': 0, 'verified': 0, 'cache_hits': 0, 'rejected_busy': 0}
+
+    def _get_executor(self):
+        if self.executor is None:
+            # Under gevent, pool threads must be real OS threads or a KDF call stalls every greenlet
+            if native_thread_ident()[1]:
+                from gevent.threadpool import ThreadPoolExecutor as executor_cls
+            else:
+                executor_cls = ThreadPoolExecutor
+            self.executor = executor_cls(max_workers=self.max_workers)
+        return self.executor
+
+    def _run(self, fn, *args):
+        """Run fn on the KDF pool and wait for it; PasswordBusy if the queue is full"""
+        if not self.slots.acquire(blocking=False):
+            self.stats['rejected_busy'] += 1
+            raise PasswordBusy('password hashing queue is full')
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        self.stats['hashed'] += 1
+        return self._run(self.hasher.hash, password)
+
+    def _check(self, password, stored_hash, salt):
+        scheme = stored_hash.split('$', 1)[0]
+        if scheme in HASHERS:
+            hasher = self.hasher if scheme == self.hasher.name else HASHERS[scheme]()
+            return hasher.verify(password, stored_hash), scheme != self.hasher.name or hasher.needs_rehash(stored_hash)
+        if stored_hash.startswith('!'):
+            return False, False
+        return verify_legacy_sha256(password, stored_hash, salt), True
+
+    def _verified_key(self, password, stored_hash):
+        return hmac.new(self._cache_key, f'{stored_hash}\0{password}'.encode(), hashlib.sha256).digest()
+
+    def verify(self, password, stored_hash, salt=None):
+        """(matches, needs_rehash) for a password against a stored hash"""
+        key = self._verified_key(password, stored_hash) if self.verified_ttl else None
+        if key is not None:
+            with self._verified_lock:
+                expires_at = self._verified.get(key)
+            if expires_at and expires_at > time.time():
+                self.stats['cache_hits'] += 1
+                return True, False
+
+        self.stats['verified'] += 1
+        ok, needs_rehash = self._run(self._check, password, stored_hash, salt)
+        if ok and key is not None and not needs_rehash:
+            with self._verified_lock:
+                self._verified[key] = time.time() + self.verified_ttl
+                self._verified.move_to_end(key)
+                while len(self._verified) > self.verified_max_entries:
+                    self._verified.popitem(last=False)
+        return ok, needs_rehash
+
+
+# Verified against when a login names no account, so an unknown email costs the
+# same KDF run as a wrong password and response times don't reveal which emails exist
+DUMMY_HASH = PasswordHasher().hasher.hash(secrets.token_hex(16))
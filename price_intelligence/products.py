@@ -0,0 +1,86 @@
+import sys
+from dataclasses import dataclass, fields
+
+# Display metadata per store; responses carry it once in 'platforms' instead of on every product
+PLATFORMS = {
+    'Amazon': {'icon': '📦', 'color': '#FF9900'},
+    'Flipkart': {'icon': '🛒', 'color': '#047BD5'},
+    'Myntra': {'icon': '👕', 'color': '#FF3F6C'},
+    'Reliance Digital': {'icon': '🔷', 'color': '#0078FF'},
+    'Croma': {'icon': '🔴', 'color': '#E42529'},
+    'Tata CLiQ': {'icon': '⚡', 'color': '#000000'}
+}
+
+UNKNOWN_PLATFORM = {'icon': '🛒', 'color': '#64748B'}
+
+
+def platform_meta(names):
+    """{name: {'icon', 'color'}} for the given platform names, in first-seen order"""
+    return {name: PLATFORMS.get(name, UNKNOWN_PLATFORM) for name in dict.fromkeys(names)}
+
+
+def intern(value):
+    """Share one copy of short strings that repeat across products (sellers, stock and shipping text)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def slotted(cls):
+    """Rebuild a dataclass with __slots__ for its fields
+
+    What ``@dataclass(slots=True)`` does, which needs Python 3.10 while
+    runtime.txt pins 3.9. Slots can't be declared in the class body itself:
+    they would clash with the class attributes holding the field defaults.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {key: value for key, value in cls.__dict__.items() if key not in names + ('__dict__', '__weakref__')}
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@slotted
+@dataclass
+class Product:
+    """One offer from one store
+
+    Slotted, so a record is a fixed-size object rather than a 15-key dict.
+    Reads like a dict too (``product['price']``, ``product.get('rating')``)
+    so code written against product dicts - statistics, price history, the
+    cached-payload replay - works with either.
+    """
+
+    platform: str
+    title: str
+    price: int
+    original_price: int = None
+    discount_percent: int = 0
+    rating: float = None
+    reviews_count: int = 0
+    url: str = '#'
+    stock_status: str = None
+    shipping: str = None
+    delivery: str = None
+    seller: str = None
+    category: str = None
+    is_best_price: bool = False
+    real_data: bool = None
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self):
+        """JSON form; fields that were never set (None) are left out"""
+        return {name: value for name in FIELD_NAMES if (value := getattr(self, name)) is not None}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Product from a dict, ignoring keys that aren't fields (e.g. the old per-product platform_icon)"""
+        return cls(**{key: value for key, value in data.items() if key in FIELD_NAMES})
+
+
+FIELD_NAMES = tuple(f.name for f in fields(Product))
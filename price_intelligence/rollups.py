@@ -0,0 +1,420 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database import pool
+from cache import normalize_query
+from logs import get_logger
+from trending import hour_bucket
+
+log = get_logger('rollups')
+
+# price_history keeps every observation; charts, training and volatility only
+# need per-hour or per-day OHLC. Hourly and daily rollups are updated in the
+# same transaction as the raw rows (history.py's writer), and compaction drops
+# raw rows past PRICE_HISTORY_RAW_RETENTION_DAYS once they are rolled up, and
+# hourly rollups past PRICE_HISTORY_HOURLY_RETENTION_DAYS. Daily rollups are kept.
+# Hourly buckets only save space where a product is seen several times an hour,
+# so they are kept about as long as raw rows: long ranges are read per day anyway.
+RAW_RETENTION_DAYS = int(os.environ.get('PRICE_HISTORY_RAW_RETENTION_DAYS', 90))
+HOURLY_RETENTION_DAYS = int(os.environ.get('PRICE_HISTORY_HOURLY_RETENTION_DAYS', 90))
+# Rows per transaction for backfill and raw deletes, so writers never wait long
+COMPACTION_BATCH = int(os.environ.get('PRICE_HISTORY_COMPACTION_BATCH', 50000))
+# Existing price_history up to this size is rolled up at startup; larger tables
+# are backfilled in batches by the compaction job and read raw until then
+BACKFILL_INLINE_ROWS = int(os.environ.get('PRICE_HISTORY_BACKFILL_INLINE_ROWS', 200000))
+# Fewest points a series query should return at the resolution it picks
+SERIES_MIN_POINTS = int(os.environ.get('PRICE_HISTORY_SERIES_MIN_POINTS', 48))
+
+# Coarsest first
+RESOLUTIONS = {'day': 86400, 'hour': 3600}
+TABLES = {'hour': 'price_history_hourly', 'day': 'price_history_daily'}
+
+
+def day_bucket(timestamp):
+    """'YYYY-MM-DD HH:MM:SS' -> 'YYYY-MM-DD'"""
+    return timestamp[:10]
+
+
+def seconds_into_hour(timestamp):
+    return int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+
+
+def seconds_into_day(timestamp):
+    return int(timestamp[11:13]) * 3600 + seconds_into_hour(timestamp)
+
+
+# resolution -> (bucket of a timestamp, seconds from the bucket's start)
+BUCKETS = {'hour': (hour_bucket, seconds_into_hour), 'day': (day_bucket, seconds_into_day)}
+
+
+def aggregate(rows, bucket, offset):
+    """Fold (product, platform, price, timestamp) rows into OHLC per (product, bucket, platform)
+
+    Values are [open, open_at, close, close_at, low, high, total, samples],
+    with open_at/close_at in seconds from the start of the bucket (small
+    integers rather than a second copy of the timestamp per row); rows may
+    arrive in any order.
+    """
+    groups = {}
+    for product, platform, price, ts in rows:
+        key = (product, bucket(ts), platform)
+        at = offset(ts)
+        g = groups.get(key)
+        if g is None:
+            groups[key] = [price, at, price, at, price, price, price, 1]
+            continue
+        if at < g[1]:
+            g[0], g[1] = price, at
+        if at >= g[3]:
+            g[2], g[3] = price, at
+        if price < g[4]:
+            g[4] = price
+        if price > g[5]:
+            g[5] = price
+        g[6] += price
+        g[7] += 1
+    return groups
+
+
+def upsert_sql(table):
+    # SET expressions all see the stored row, so open/close compare against its old offsets
+    return f'''INSERT INTO {table} (product_name, bucket, platform, open, open_at, close, close_at,
+                                    low, high, total, samples)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (product_name, bucket, platform) DO UPDATE SET
+                   open = CASE WHEN excluded.open_at < open_at THEN excluded.open ELSE open END,
+                   open_at = MIN(open_at, excluded.open_at),
+                   close = CASE WHEN excluded.close_at >= close_at THEN excluded.close ELSE close END,
+                   close_at = MAX(close_at, excluded.close_at),
+                   low = MIN(low, excluded.low),
+                   high = MAX(high, excluded.high),
+                   total = total + excluded.total,
+                   samples = samples + excluded.samples'''
+
+
+def merge_platforms(rows):
+    """(bucket, platform, open, open_at, close, close_at, low, high, total, samples) rows,
+    ordered by bucket, as one OHLC point per bucket across platforms"""
+    points = []
+    for bucket, _, open_, open_at, close, close_at, low, high, total, samples in rows:
+        if points and points[-1]['bucket'] == bucket:
+            p = points[-1]
+            if open_at < p['_open_at']:
+                p['open'], p['_open_at'] = open_, open_at
+            if close_at >= p['_close_at']:
+                p['close'], p['_close_at'] = close, close_at
+            p['low'] = min(p['low'], low)
+            p['high'] = max(p['high'], high)
+            p['_total'] += total
+            p['count'] += samples
+        else:
+            points.append({'bucket': bucket, 'open': open_, 'high': high, 'low': low, 'close': close,
+                           'count': samples, '_open_at': open_at, '_close_at': close_at, '_total': total})
+    for p in points:
+        p['avg'] = round(p.pop('_total') / p['count'], 2)
+        del p['_open_at'], p['_close_at']
+    return points
+
+
+class PriceRollups:
+    """Hourly and daily OHLC aggregates of price_history, plus its retention
+
+    ``price_history_hourly`` and ``price_history_daily`` hold one row per
+    (product, bucket, platform) with open/close (and when in the bucket they
+    were seen), low, high, total and samples, so averages stay exact when
+    buckets are merged. New rows are added by ``apply_rows`` inside the
+    price_history writer's transaction. Rows that existed before the tables
+    did are backfilled by id up to a watermark stored in ``price_rollup_state``;
+    until that finishes, reads fall back to the raw table and nothing is
+    compacted.
+    """
+
+    def __init__(self, raw_retention_days=RAW_RETENTION_DAYS, hourly_retention_days=HOURLY_RETENTION_DAYS,
+                 batch=COMPACTION_BATCH, backfill_inline_rows=BACKFILL_INLINE_ROWS, min_points=SERIES_MIN_POINTS,
+                 ready_check_interval=30):
+        self.retention_days = {'raw': raw_retention_days, 'hour': hourly_retention_days, 'day': None}
+        self.batch = batch
+        self.backfill_inline_rows = backfill_inline_rows
+        self.min_points = min_points
+        self.ready_check_interval = ready_check_interval
+        self.upserts = {resolution: upsert_sql(table) for resolution, table in TABLES.items()}
+        self._schema_ready = False
+        self._ready = False
+        self._ready_checked_at = 0
+        self._lock = threading.Lock()
+
+    # ==================== SCHEMA ====================
+
+    def ensure_schema(self):
+        """Create the rollup tables; on first creation record how far back the backfill must go
+
+        Runs under the write lock so no writer can flush rows between the
+        tables appearing and the watermark being read. Call before queueing
+        rows whose flush will call ``apply_rows``.
+        """
+        if self._schema_ready:
+            return
+        with self._lock:
+            if self._schema_ready:
+                return
+            with pool.transaction() as c:
+                c.execute('BEGIN IMMEDIATE')
+                c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'price_rollup_state'")
+                created = c.fetchone() is None
+                for table in TABLES.values():
+                    c.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                        product_name TEXT NOT NULL,
+                        bucket TEXT NOT NULL,
+                        platform TEXT NOT NULL,
+                        open REAL NOT NULL,
+                        open_at INTEGER NOT NULL,
+                        close REAL NOT NULL,
+                        close_at INTEGER NOT NULL,
+                        low REAL NOT NULL,
+                        high REAL NOT NULL,
+                        total REAL NOT NULL,
+                        samples INTEGER NOT NULL,
+                        PRIMARY KEY (product_name, bucket, platform)
+                    ) WITHOUT ROWID''')
+                c.execute('''CREATE TABLE IF NOT EXISTS price_rollup_state (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )''')
+                if created:
+                    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'price_history'")
+                    upto = 0
+                    if c.fetchone() is not None:
+                        c.execute('SELECT COALESCE(MAX(id), 0) FROM price_history')
+                        upto = c.fetchone()[0]
+                    c.executemany('INSERT OR IGNORE INTO price_rollup_state (name, value) VALUES (?, ?)',
+                                  [('backfill_upto', upto), ('backfill_done', 0)])
+            self._schema_ready = True
+        if created:
+            log.info("Rollup tables created; %d price_history rows to backfill", upto)
+            if upto <= self.backfill_inline_rows:
+                self.backfill()
+
+    def backfill_progress(self):
+        """(rows rolled up so far, watermark) for price_history rows older than the rollup tables"""
+        self.ensure_schema()
+        state = dict(pool.fetchall('SELECT name, value FROM price_rollup_state'))
+        return state.get('backfill_done', 0), state.get('backfill_upto', 0)
+
+    def is_ready(self):
+        """True once the rollups cover everything in price_history"""
+        if self._ready:
+            return True
+        now = time.time()
+        if now - self._ready_checked_at >= self.ready_check_interval:
+            self._ready_checked_at = now
+            done, upto = self.backfill_progress()
+            self._ready = done >= upto
+        return self._ready
+
+    # ==================== MAINTENANCE ====================
+
+    def apply_rows(self, c, rows):
+        """Add (product, platform, price, timestamp) rows to both rollups; the writer's on_flush"""
+        for resolution, table in TABLES.items():
+            groups = aggregate(rows, *BUCKETS[resolution])
+            c.executemany(self.upserts[resolution], [(*key, *values) for key, values in groups.items()])
+
+    def backfill(self, max_rows=None):
+        """Roll up pre-existing price_history rows in id batches; returns True when complete
+
+        Progress is committed with each batch, so it resumes where it stopped.
+        Each batch re-reads it under the write lock: several workers starting
+        at once must not roll up the same rows twice.
+        """
+        done, upto = self.backfill_progress()
+        rolled = 0
+        while done < upto and (max_rows is None or rolled < max_rows):
+            with pool.transaction() as c:
+                c.execute('BEGIN IMMEDIATE')
+                c.execute("SELECT value FROM price_rollup_state WHERE name = 'backfill_done'")
+                done = c.fetchone()[0]
+                if done >= upto:
+                    break
+                c.execute('''SELECT id, product_name, platform, price, timestamp FROM price_history
+                             WHERE id > ? AND id <= ? ORDER BY id LIMIT ?''', (done, upto, self.batch))
+                rows = c.fetchall()
+                last = rows[-1][0] if rows else upto
+                self.apply_rows(c, [row[1:] for row in rows])
+                c.execute("UPDATE price_rollup_state SET value = ? WHERE name = 'backfill_done'", (last,))
+            done = last
+            rolled += len(rows)
+        if rolled:
+            log.info("Backfilled %d price_history rows into rollups (%d/%d)", rolled, done, upto)
+        self._ready = done >= upto
+        return self._ready
+
+    def compact(self, raw_retention_days=None, hourly_retention_days=None):
+        """Drop raw rows and hourly rollups past their retention; returns counts and timing
+
+        Raw rows are only deleted once the backfill has finished, i.e. once
+        every one of them is in the rollups.
+        """
+        raw_days = raw_retention_days or self.retention_days['raw']
+        hourly_days = hourly_retention_days or self.retention_days['hour']
+        started = time.time()
+        if not self.backfill():
+            return {'raw_deleted': 0, 'hourly_deleted': 0, 'seconds': round(time.time() - started, 2)}
+
+        now = datetime.utcnow()
+        raw_cutoff = (now - timedelta(days=raw_days)).strftime('%Y-%m-%d %H:%M:%S')
+        # ids follow insertion time, so walk them oldest first and stop at the
+        # first batch with nothing old enough instead of scanning the whole table
+        raw_deleted = 0
+        last_id = 0
+        while True:
+            with pool.transaction() as c:
+                c.execute('SELECT MAX(id) FROM (SELECT id FROM price_history WHERE id > ? ORDER BY id LIMIT ?)',
+                          (last_id, self.batch))
+                upper = c.fetchone()[0]
+                if upper is None:
+                    break
+                c.execute('DELETE FROM price_history WHERE id > ? AND id <= ? AND timestamp < ?',
+                          (last_id, upper, raw_cutoff))
+                deleted = c.rowcount
+            raw_deleted += deleted
+            last_id = upper
+            if not deleted:
+                break
+
+        # Per chunk of products, so each delete is a primary-key range scan
+        hourly_cutoff = hour_bucket((now - timedelta(days=hourly_days)).strftime('%Y-%m-%d %H:%M:%S'))
+        products = [r[0] for r in pool.fetchall(f"SELECT DISTINCT product_name FROM {TABLES['hour']}")]
+        hourly_deleted = 0
+        for start in range(0, len(products), 500):
+            chunk = products[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            with pool.transaction() as c:
+                c.execute(f'''DELETE FROM {TABLES['hour']}
+                              WHERE product_name IN ({placeholders}) AND bucket < ?''', (*chunk, hourly_cutoff))
+                hourly_deleted += c.rowcount
+
+        result = {'raw_deleted': raw_deleted, 'hourly_deleted': hourly_deleted,
+                  'seconds': round(time.time() - started, 2)}
+        log.info("Compacted price_history: %d raw rows and %d hourly buckets removed in %.2f s",
+                 raw_deleted, hourly_deleted, result['seconds'])
+        return result
+
+    # ==================== QUERIES ====================
+
+    def covers(self, resolution, days):
+        retention = self.retention_days[resolution]
+        return retention is None or days <= retention
+
+    def choose_resolution(self, days, min_points=None):
+        """Coarsest resolution that still gives min_points over `days` and keeps that far back"""
+        if not self.is_ready():
+            return 'raw'
+        min_points = min_points or self.min_points
+        for resolution, seconds in RESOLUTIONS.items():
+            if days * 86400 / seconds >= min_points and self.covers(resolution, days):
+                return resolution
+        # Too short a range for any rollup: the finest one that reaches back far enough
+        for resolution in ('raw', 'hour', 'day'):
+            if self.covers(resolution, days):
+                return resolution
+        return 'day'
+
+    def series(self, product_name, days=30, platform=None, resolution=None):
+        """OHLC points for a product, oldest first: (resolution, [{'bucket', 'open', 'high', 'low',
+        'close', 'avg', 'count'}]); across all platforms unless one is given"""
+        self.ensure_schema()
+        resolution = resolution or self.choose_resolution(days)
+        key = normalize_query(product_name)
+        since = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        platform_clause = 'AND platform = ?' if platform else ''
+        params = (key, *((platform,) if platform else ()))
+        if resolution == 'raw':
+            rows = pool.fetchall(f'''SELECT timestamp, platform, price, 0, price, 0, price, price, price, 1
+                                     FROM price_history
+                                     WHERE product_name = ? {platform_clause} AND timestamp > ?
+                                     ORDER BY timestamp''', (*params, since))
+        else:
+            rows = pool.fetchall(f'''SELECT bucket, platform, open, open_at, close, close_at,
+                                            low, high, total, samples
+                                     FROM {TABLES[resolution]}
+                                     WHERE product_name = ? {platform_clause} AND bucket >= ?
+                                     ORDER BY bucket''', (*params, BUCKETS[resolution][0](since)))
+        return resolution, merge_platforms(rows)
+
+    def daily_lows(self, product_names=None, days=90, chunk_size=500):
+        """(product, day, lowest price) rows ordered by product and day, for every product or the given ones"""
+        self.ensure_schema()
+        since = f'-{int(days)} days'
+        if self.is_ready():
+            source = f'''SELECT product_name, bucket, MIN(low) FROM {TABLES['day']}
+                         WHERE {{names}} bucket >= date('now', ?)
+                         GROUP BY product_name, bucket ORDER BY product_name, bucket'''
+        else:
+            source = '''SELECT product_name, date(timestamp) AS day, MIN(price) FROM price_history
+                        WHERE {names} timestamp > datetime('now', ?)
+                        GROUP BY product_name, day ORDER BY product_name, day'''
+        if product_names is None:
+            return pool.fetchall(source.format(names=''), (since,))
+
+        keys = sorted({normalize_query(name) for name in product_names})
+        rows = []
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            rows.extend(pool.fetchall(source.format(names=f'product_name IN ({placeholders}) AND'), (*chunk, since)))
+        return rows
+
+    def price_ranges(self, product_names, days=7):
+        """{product: (low, high, avg)} over the last few days"""
+        self.ensure_schema()
+        keys = sorted({normalize_query(name) for name in product_names})
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        since = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        resolution = 'hour' if self.is_ready() and self.covers('hour', days) else 'raw'
+        if resolution == 'raw':
+            rows = pool.fetchall(f'''SELECT product_name, MIN(price), MAX(price), AVG(price)
+                                     FROM price_history
+                                     WHERE product_name IN ({placeholders}) AND timestamp > ?
+                                     GROUP BY product_name''', (*keys, since))
+        else:
+            rows = pool.fetchall(f'''SELECT product_name, MIN(low), MAX(high), SUM(total) / SUM(samples)
+                                     FROM {TABLES['hour']}
+                                     WHERE product_name IN ({placeholders}) AND bucket >= ?
+                                     GROUP BY product_name''', (*keys, hour_bucket(since)))
+        return {name: (low, high, avg) for name, low, high, avg in rows}
+
+    def stats(self):
+        done, upto = self.backfill_progress()
+        counts = {resolution: pool.fetchone(f'SELECT COUNT(*) FROM {table}')[0] for resolution, table in TABLES.items()}
+        counts['raw'] = pool.fetchone('SELECT COUNT(*) FROM price_history')[0]
+        return {'rows': counts, 'backfill_done': done, 'backfill_upto': upto, 'ready': done >= upto,
+                'retention_days': self.retention_days}
+
+
+# Global rollups instance
+price_rollups = PriceRollups()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='price_history rollups and retention')
+    parser.add_argument('command', choices=('status', 'backfill', 'compact'))
+    parser.add_argument('--raw-retention-days', type=int, help=f'default {RAW_RETENTION_DAYS}')
+    parser.add_argument('--hourly-retention-days', type=int, help=f'default {HOURLY_RETENTION_DAYS}')
+    args = parser.parse_args()
+
+    if args.command == 'backfill':
+        price_rollups.backfill()
+    elif args.command == 'compact':
+        print(json.dumps(price_rollups.compact(args.raw_retention_days, args.hourly_retention_days), indent=2))
+    print(json.dumps(price_rollups.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+from database import pool
+from logs import get_logger
+
+log = get_logger('scheduler')
+
+
+class LeaseStore:
+    """Job leases and run bookkeeping in SQLite
+
+    A job runs only in the process holding its lease, and only once its
+    shared ``next_run_at`` has passed, so any number of web workers or
+    scheduler processes can register the same job without duplicating it.
+    """
+
+    def __init__(self):
+        with pool.transaction() as c:
+            c.execute('''CREATE TABLE IF NOT EXISTS job_leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT,
+                expires_at REAL NOT NULL DEFAULT 0,
+                next_run_at REAL NOT NULL DEFAULT 0,
+                last_started_at REAL,
+                last_finished_at REAL,
+                last_duration REAL,
+                last_lag REAL,
+                last_error TEXT,
+                runs INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0
+            )''')
+
+    def acquire(self, name, owner, ttl):
+        """Take the lease if the job is due and nobody else holds it; returns the scheduled time or None"""
+        now = time.time()
+        with pool.transaction() as c:
+            c.execute('INSERT OR IGNORE INTO job_leases (name) VALUES (?)', (name,))
+            c.execute('''UPDATE job_leases SET owner = ?, expires_at = ?, last_started_at = ?
+                         WHERE name = ? AND next_run_at <= ? AND (expires_at < ? OR owner = ?)''',
+                      (owner, now + ttl, now, name, now, now, owner))
+            if c.rowcount != 1:
+                return None
+            c.execute('SELECT next_run_at FROM job_leases WHERE name = ?', (name,))
+            return c.fetchone()[0]
+
+    def renew(self, name, owner, ttl):
+        with pool.transaction() as c:
+            c.execute('UPDATE job_leases SET expires_at = ? WHERE name = ? AND owner = ?',
+                      (time.time() + ttl, name, owner))
+            return c.rowcount == 1
+
+    def release(self, name, owner, next_run_at, duration, lag, error=None):
+        with pool.transaction() as c:
+            c.execute('''UPDATE job_leases SET owner = NULL, expires_at = 0, next_run_at = ?,
+                             last_finished_at = ?, last_duration = ?, last_lag = ?, last_error = ?,
+                             runs = runs + 1, failures = failures + ?
+                         WHERE name = ? AND owner = ?''',
+                      (next_run_at, time.time(), duration, lag, error, 1 if error else 0, name, owner))
+
+    def next_run_at(self, name):
+        row = pool.fetchone('SELECT next_run_at FROM job_leases WHERE name = ?', (name,))
+        return row[0] if row else 0
+
+    def all(self):
+        rows = pool.fetchall('''SELECT name, owner, expires_at, next_run_at, last_started_at, last_finished_at,
+                                       last_duration, last_lag, last_error, runs, failures
+                                FROM job_leases ORDER BY name''')
+        keys = ('name', 'owner', 'expires_at', 'next_run_at', 'last_started_at', 'last_finished_at',
+                'last_duration', 'last_lag', 'last_error', 'runs', 'failures')
+        return [dict(zip(keys, row)) for row in rows]
+
+
+class Job:
+    def __init__(self, name, fn, interval, jitter=0.1, lease_ttl=None):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        # A run longer than this without a heartbeat is presumed dead
+        self.lease_ttl = lease_ttl or max(60, interval)
+        self.stats = {'runs': 0, 'failures': 0, 'skipped': 0, 'last_lag': None, 'max_lag': 0,
+                      'last_duration': None, 'total_duration': 0.0}
+
+    def next_delay(self):
+        """Interval with +/- jitter, so processes and restarts don't line up"""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class Scheduler:
+    """Runs registered jobs on their intervals under SQLite leases"""
+
+    def __init__(self, owner=None, poll_interval=5):
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}'
+        self.poll_interval = poll_interval
+        self.leases = LeaseStore()
+        self.jobs = {}
+        self._stop = threading.Event()
+
+    def add_job(self, name, fn, interval, jitter=0.1, lease_ttl=None):
+        self.jobs[name] = Job(name, fn, interval, jitter, lease_ttl)
+        return self.jobs[name]
+
+    def _heartbeat(self, job, done):
+        while not done.wait(job.lease_ttl / 3):
+            if not self.leases.renew(job.name, self.owner, job.lease_ttl):
+                log.warning("⚠️ Lost lease for job %s", job.name)
+                return
+
+    def run_job(self, job):
+        """Run one job if it is due and the lease is free; returns True if it ran"""
+        scheduled_at = self.leases.acquire(job.name, self.owner, job.lease_ttl)
+        if scheduled_at is None:
+            job.stats['skipped'] += 1
+            return False
+
+        started = time.time()
+        # Queue lag: how long past its scheduled time the job actually started
+        lag = started - scheduled_at if scheduled_at else 0.0
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job, done), daemon=True,
+                         name=f'lease-{job.name}').start()
+
+        error = None
+        try:
+            job.fn()
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            log.error("❌ Job %s failed: %s", job.name, error)
+        finally:
+            done.set()
+            duration = time.time() - started
+            self.leases.release(job.name, self.owner, time.time() + job.next_delay(), duration, lag, error)
+
+        job.stats['runs'] += 1
+        job.stats['failures'] += 1 if error else 0
+        job.stats['last_lag'] = round(lag, 3)
+        job.stats['max_lag'] = max(job.stats['max_lag'], round(lag, 3))
+        job.stats['last_duration'] = round(duration, 3)
+        job.stats['total_duration'] += duration
+        return True
+
+    def run_pending(self):
+        """Run every job that is due right now"""
+        now = time.time()
+        ran = 0
+        for job in self.jobs.values():
+            if self.leases.next_run_at(job.name) <= now:
+                ran += self.run_job(job)
+        return ran
+
+    def run_forever(self):
+        log.info("✅ Scheduler %s running %s", self.owner, ', '.join(self.jobs))
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                log.error("❌ Scheduler error: %s", e)
+            # Jittered poll so several schedulers don't hit the lease table in lockstep
+            self._stop.wait(self.poll_interval * random.uniform(0.8, 1.2))
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            'owner': self.owner,
+            'jobs': {name: dict(job.stats) for name, job in self.jobs.items()},
+            'leases': self.leases.all()
+        }
+
+
+def watchlist_backlog():
+    """Items overdue for a re-check and how late the oldest one is (seconds)"""
+    row = pool.fetchone('''SELECT COUNT(*), MIN(next_check_at),
+                                  (julianday('now') - julianday(MIN(next_check_at))) * 86400
+                           FROM watchlist
+                           WHERE is_active = 1 AND next_check_at <= datetime('now')''')
+    return {'due_items': row[0], 'oldest_due_at': row[1], 'lag_seconds': round(row[2] or 0, 1)}
+
+
+def build_scheduler(check_interval=60, retrain_interval=24 * 3600, compaction_interval=6 * 3600):
+    """Scheduler with the standard PriceSmart jobs"""
+    from alert import alert_system
+    from ml_model import PricePredictor
+    from rollups import price_rollups
+
+    scheduler = Scheduler()
+    scheduler.add_job('watchlist-check', alert_system.check_due_watchlists, interval=check_interval,
+                      jitter=0.2, lease_ttl=600)
+    scheduler.add_job('model-retrain', lambda: PricePredictor().train(), interval=retrain_interval,
+                      jitter=0.05, lease_ttl=1800)
+    scheduler.add_job('history-compaction', price_rollups.compact, interval=compaction_interval,
+                      jitter=0.1, lease_ttl=1800)
+    return scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PriceSmart background job scheduler')
+    parser.add_argument('--check-interval', type=int, default=60, help='seconds between watchlist polls')
+    parser.add_argument('--retrain-interval', type=int, default=24 * 3600, help='seconds between model retrains')
+    parser.add_argument('--compaction-interval', type=int, default=6 * 3600,
+                        help='seconds between price_history rollup/retention passes')
+    parser.add_argument('--once', action='store_true', help='run due jobs once and exit')
+    parser.add_argument('--status', action='store_true', help='print job and backlog metrics as JSON and exit')
+    args = parser.parse_args()
+
+    scheduler = build_scheduler(args.check_interval, args.retrain_interval, args.compaction_interval)
+    if args.status:
+        from alert import alert_system
+        alert_system.ensure_schema()
+        print(json.dumps({'leases': scheduler.leases.all(), 'watchlist': watchlist_backlog()}, indent=2))
+    elif args.once:
+        from alert import alert_system
+        scheduler.run_pending()
+        alert_system.mailer.flush()
+    else:
+        scheduler.run_forever()
+
+
+if __name__ == '__main__':
+    main()
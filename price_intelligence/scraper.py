@@ -1,10 +1,23 @@
-import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, wait
+from fetcher import HttpCache, HttpFetcher
+from parsers import get_extractor
+from products import Product, intern
+from logs import get_logger
+from metrics import SCRAPE_RESULTS, SCRAPE_SECONDS
 import random
 import time
 
+log = get_logger('scraper')
+
+# Search endpoints per platform; override base URLs to point at a stub server
+DEFAULT_BASE_URLS = {
+    'Amazon': 'https://www.amazon.in',
+    'Flipkart': 'https://www.flipkart.com',
+}
+
 class RealScraper:
-    def __init__(self):
+    def __init__(self, base_urls=None, max_workers=8, request_timeout=10, search_deadline=12, html_backend=None,
+                 fetcher=None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept-Language': 'en-US,en;q=0.9',
@@ -12,187 +25,198 @@ class RealScraper:
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Connection': 'keep-alive'
         }
+        self.base_urls = dict(DEFAULT_BASE_URLS, **(base_urls or {}))
+        self.request_timeout = request_timeout
+        self.search_deadline = search_deadline
+        
+        # Pooled session, shared response cache, per-host rate limits and in-flight coalescing
+        self.fetcher = fetcher or HttpFetcher(headers=self.headers, timeout=request_timeout,
+                                              cache=HttpCache(), pool_maxsize=max_workers * 2)
+        self.session = self.fetcher.session
+        
+        # Bounded pool shared by all searches so a traffic spike can't spawn unbounded threads
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scraper')
+        
+        # Selectors are compiled once per platform; html_backend=None picks the fastest installed parser
+        self.extractors = {
+            'Amazon': get_extractor('Amazon', html_backend),
+            'Flipkart': get_extractor('Flipkart', html_backend),
+        }
+        
+        # Platform name -> callable(query) returning a list of products
+        self.platforms = {}
+        self.register_platform('Amazon', self.scrape_amazon)
+        self.register_platform('Flipkart', self.scrape_flipkart)
+    
+    def register_platform(self, name, scrape_fn):
+        """Add a platform to the concurrent search fan-out"""
+        self.platforms[name] = scrape_fn
+    
+    def scrape_platform(self, name, query):
+        """Run one platform's scraper, recording its latency and outcome; [] on error"""
+        start = time.perf_counter()
+        try:
+            products = self.platforms[name](query)
+        except Exception as e:
+            SCRAPE_RESULTS.inc(platform=name, outcome='error')
+            log.warning("%s scraping error: %s", name, e)
+            return []
+        finally:
+            SCRAPE_SECONDS.observe(time.perf_counter() - start, platform=name)
+        SCRAPE_RESULTS.inc(platform=name, outcome='ok' if products else 'empty')
+        return products
+    
+    def fetch(self, url):
+        """GET a page through the shared fetcher (cached, rate limited, coalesced)"""
+        return self.fetcher.get(url)
     
     def scrape_amazon(self, query):
         """Scrape Amazon India for real prices"""
-        url = f'https://www.amazon.in/s?k={query.replace(" ", "+")}'
+        base_url = self.base_urls['Amazon']
+        url = f'{base_url}/s?k={query.replace(" ", "+")}'
         
-        try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            products = []
-            
-            # Try multiple selectors for Amazon
-            selectors = [
-                'div[data-component-type="s-search-result"]',
-                '.s-result-item',
-                '[data-asin]'
-            ]
-            
-            items = []
-            for selector in selectors:
-                items = soup.select(selector)
-                if items:
-                    break
-            
-            for item in items[:5]:  # Limit to 5 results
-                try:
-                    # Extract title
-                    title_elem = item.select_one('h2 a span') or item.select_one('.a-size-medium') or item.select_one('.a-text-normal')
-                    if not title_elem:
-                        continue
-                    
-                    title = title_elem.text.strip()
+        # Errors are logged and counted by scrape_platform
+        return self.parse_amazon(self.fetch(url), base_url)
+    
+    def parse_amazon(self, html, base_url=DEFAULT_BASE_URLS['Amazon']):
+        """Products from an Amazon search results page"""
+        products = []
+        
+        # One pass per item (limited to 5) pulls title, price, rating, reviews and link together
+        for item in self.extractors['Amazon'].extract(html):
+            try:
+                if item['title'] is None or item['price'] is None:
+                    continue
+                
+                title = item['title'].strip()
+                price_text = item['price'].replace(',', '').replace('₹', '').replace('.', '').strip()
+                
+                if price_text.replace('.', '').isdigit():
+                    price = float(price_text)
                     
-                    # Extract price
-                    price_elem = item.select_one('.a-price-whole') or item.select_one('.a-price .a-offscreen')
-                    if not price_elem:
-                        continue
+                    # Extract rating
+                    rating = item['rating'].split()[0] if item['rating'] else str(round(random.uniform(3.5, 4.8), 1))
                     
-                    price_text = price_elem.text.replace(',', '').replace('₹', '').replace('.', '').strip()
+                    # Extract reviews count
+                    reviews = item['reviews'].replace(',', '') if item['reviews'] is not None else str(random.randint(100, 10000))
                     
-                    if price_text.replace('.', '').isdigit():
-                        price = float(price_text)
-                        
-                        # Extract rating
-                        rating_elem = item.select_one('.a-icon-alt')
-                        rating = rating_elem.text.split()[0] if rating_elem else str(round(random.uniform(3.5, 4.8), 1))
-                        
-                        # Extract reviews count
-                        reviews_elem = item.select_one('.a-size-base')
-                        reviews = reviews_elem.text.replace(',', '') if reviews_elem else str(random.randint(100, 10000))
-                        
-                        products.append({
-                            'title': title[:100],
-                            'price': int(price),
-                            'rating': float(rating) if rating.replace('.', '').isdigit() else 4.0,
-                            'reviews': int(reviews) if reviews.isdigit() else random.randint(100, 5000),
-                            'platform': 'Amazon',
-                            'url': 'https://www.amazon.in' + (item.select_one('h2 a')['href'] if item.select_one('h2 a') else '#'),
-                            'real_data': True
-                        })
-                except Exception as e:
-                    continue
-            
-            return products
-            
-        except Exception as e:
-            print(f"Amazon scraping error: {e}")
-            return []
+                    products.append(Product(
+                        platform='Amazon',
+                        title=title[:100],
+                        price=int(price),
+                        rating=float(rating) if rating.replace('.', '').isdigit() else 4.0,
+                        reviews_count=int(reviews) if reviews.isdigit() else random.randint(100, 5000),
+                        url=base_url + (item['link'] or '#'),
+                        real_data=True
+                    ))
+            except Exception as e:
+                continue
+        
+        return products
     
     def scrape_flipkart(self, query):
         """Scrape Flipkart for real prices"""
-        url = f'https://www.flipkart.com/search?q={query.replace(" ", "+")}'
+        base_url = self.base_urls['Flipkart']
+        url = f'{base_url}/search?q={query.replace(" ", "+")}'
         
-        try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            products = []
-            
-            # Flipkart selectors
-            items = soup.select('div[data-id]')
-            
-            for item in items[:5]:  # Limit to 5 results
-                try:
-                    # Extract title
-                    title_elem = item.select_one('a[title]') or item.select_one('._4rR01T') or item.select_one('.s1Q9rs')
-                    if not title_elem:
-                        continue
-                    
-                    title = title_elem.text.strip()
+        # Errors are logged and counted by scrape_platform
+        return self.parse_flipkart(self.fetch(url), base_url)
+    
+    def parse_flipkart(self, html, base_url=DEFAULT_BASE_URLS['Flipkart']):
+        """Products from a Flipkart search results page"""
+        products = []
+        
+        for item in self.extractors['Flipkart'].extract(html):
+            try:
+                if item['title'] is None or item['price'] is None:
+                    continue
+                
+                title = item['title'].strip()
+                price_text = item['price'].replace(',', '').replace('₹', '').strip()
+                
+                if price_text.replace('.', '').isdigit():
+                    price = float(price_text)
                     
-                    # Extract price
-                    price_elem = item.select_one('._30jeq3') or item.select_one('._30jeq3._16Jk6d') or item.select_one('div._30jeq3')
-                    if not price_elem:
-                        continue
+                    # Extract rating
+                    rating = item['rating'] if item['rating'] is not None else str(round(random.uniform(3.5, 4.8), 1))
                     
-                    price_text = price_elem.text.replace(',', '').replace('₹', '').strip()
+                    # Extract reviews count
+                    reviews = (item['reviews'].replace(',', '').replace('(', '').replace(')', '')
+                               if item['reviews'] is not None else str(random.randint(100, 10000)))
                     
-                    if price_text.replace('.', '').isdigit():
-                        price = float(price_text)
-                        
-                        # Extract rating
-                        rating_elem = item.select_one('._3LWZlK') or item.select_one('div._3LWZlK')
-                        rating = rating_elem.text if rating_elem else str(round(random.uniform(3.5, 4.8), 1))
-                        
-                        # Extract reviews count
-                        reviews_elem = item.select_one('._2_R_DZ span span:last-child')
-                        reviews = reviews_elem.text.replace(',', '').replace('(', '').replace(')', '') if reviews_elem else str(random.randint(100, 10000))
-                        
-                        products.append({
-                            'title': title[:100],
-                            'price': int(price),
-                            'rating': float(rating) if rating.replace('.', '').isdigit() else 4.0,
-                            'reviews': int(reviews) if reviews.isdigit() else random.randint(100, 5000),
-                            'platform': 'Flipkart',
-                            'url': 'https://www.flipkart.com' + (item.select_one('a[href]')['href'] if item.select_one('a[href]') else '#'),
-                            'real_data': True
-                        })
-                except Exception as e:
-                    continue
-            
-            return products
-            
-        except Exception as e:
-            print(f"Flipkart scraping error: {e}")
-            return []
+                    products.append(Product(
+                        platform='Flipkart',
+                        title=title[:100],
+                        price=int(price),
+                        rating=float(rating) if rating.replace('.', '').isdigit() else 4.0,
+                        reviews_count=int(reviews) if reviews.isdigit() else random.randint(100, 5000),
+                        url=base_url + (item['link'] or '#'),
+                        real_data=True
+                    ))
+            except Exception as e:
+                continue
+        
+        return products
     
-    def search_product(self, query):
-        """Search product across multiple platforms"""
-        print(f"🔍 Scraping real data for: {query}")
+    def search_product(self, query, deadline=None):
+        """Search product across all platforms concurrently"""
+        log.debug("🔍 Scraping real data for: %s", query)
         
-        # Scrape from Amazon
-        amazon_products = self.scrape_amazon(query)
+        # Fan out to every platform at once
+        futures = {self.executor.submit(self.scrape_platform, name, query): name for name in self.platforms}
         
-        # Scrape from Flipkart
-        flipkart_products = self.scrape_flipkart(query)
+        # Whatever hasn't answered by the deadline is dropped from this search
+        done, pending = wait(futures, timeout=deadline or self.search_deadline)
+        for future in pending:
+            future.cancel()
+            SCRAPE_RESULTS.inc(platform=futures[future], outcome='timeout')
+            log.warning("⏱️ %s missed the search deadline", futures[future])
         
-        # Combine results
-        all_products = amazon_products + flipkart_products
+        # Combine results in registration order
+        all_products = []
+        for future, name in futures.items():
+            if future in done and future.exception() is None:
+                all_products.extend(future.result())
         
         # If no real data found, generate realistic fake data
         if not all_products:
-            print("⚠️ No real data found, generating realistic data")
+            log.info("⚠️ No real data found, generating realistic data")
             all_products = self.generate_realistic_data(query)
         
         return all_products
     
     def generate_realistic_data(self, query):
         """Generate realistic data when scraping fails"""
-        platforms = [
-            {'name': 'Amazon', 'icon': '📦', 'base': 10000},
-            {'name': 'Flipkart', 'icon': '🛒', 'base': 9500},
-            {'name': 'Myntra', 'icon': '👕', 'base': 10500},
-            {'name': 'Reliance Digital', 'icon': '🔷', 'base': 9800},
-            {'name': 'Croma', 'icon': '🔴', 'base': 10200}
-        ]
+        base_prices = {
+            'Amazon': 10000,
+            'Flipkart': 9500,
+            'Myntra': 10500,
+            'Reliance Digital': 9800,
+            'Croma': 10200
+        }
         
         products = []
-        for platform in platforms:
-            price = platform['base'] + random.randint(-1000, 2000)
+        for platform, base in base_prices.items():
+            price = base + random.randint(-1000, 2000)
             price = round(price / 100) * 100
             
-            products.append({
-                'title': f"{query.title()} - Best Deal",
-                'price': price,
-                'rating': round(random.uniform(3.5, 4.8), 1),
-                'reviews': random.randint(100, 50000),
-                'platform': platform['name'],
-                'platform_icon': platform['icon'],
-                'url': '#',
-                'real_data': False,
-                'original_price': int(price * 1.2),
-                'discount_percent': random.randint(5, 25),
-                'stock_status': 'In Stock',
-                'delivery': f"{random.randint(1, 3)}-{random.randint(3, 7)} days"
-            })
+            products.append(Product(
+                platform=platform,
+                title=f"{query.title()} - Best Deal",
+                price=price,
+                rating=round(random.uniform(3.5, 4.8), 1),
+                reviews_count=random.randint(100, 50000),
+                original_price=int(price * 1.2),
+                discount_percent=random.randint(5, 25),
+                stock_status='In Stock',
+                delivery=intern(f"{random.randint(1, 3)}-{random.randint(3, 7)} days"),
+                real_data=False
+            ))
         
         # Mark best price
         if products:
-            products.sort(key=lambda x: x['price'])
-            products[0]['is_best_price'] = True
+            products.sort(key=lambda x: x.price)
+            products[0].is_best_price = True
         
         return products
 
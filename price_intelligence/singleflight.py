@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process coalescing only
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one execution
+
+    The first caller for a key runs ``fn``; callers that arrive while it is
+    still running wait for it and get the same result (or exception).
+    Nothing is remembered once the call finishes - caching is the caller's job.
+    ``recheck``, if given, is tried by the leader first and its result used
+    when not None (e.g. a cache another caller just filled).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {'executions': 0, 'shared': 0, 'errors': 0}
+
+    def do(self, key, fn, recheck=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            self.stats['shared'] += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = recheck() if recheck is not None else None
+            if call.result is None:
+                self.stats['executions'] += 1
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        return len(self._calls)
+
+
+class FileLockSingleFlight:
+    """SingleFlight across worker processes on one host, using flock
+
+    Within a process callers coalesce as in ``SingleFlight``; the leader
+    then takes a per-key file lock, so at most one worker runs ``fn`` for a
+    key at a time. Workers that waited on the lock call ``recheck`` (which
+    should read the shared cache the winner filled) before running ``fn``
+    themselves. Keys are hashed onto ``stripes`` lock files. If the lock
+    can't be had within ``timeout`` seconds the call runs anyway.
+    """
+
+    def __init__(self, lock_dir, stripes=256, timeout=30, poll_interval=0.01):
+        self.lock_dir = lock_dir
+        self.stripes = stripes
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.local = SingleFlight()
+        self.stats = {'lock_waits': 0, 'shared_across_workers': 0, 'lock_timeouts': 0}
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None):
+        return self.local.do(key, lambda: self._run_locked(key, fn, recheck), recheck)
+
+    def _lock_path(self, key):
+        stripe = zlib.crc32(key.encode('utf-8')) % self.stripes
+        return os.path.join(self.lock_dir, f'flight-{stripe:03d}.lock')
+
+    def _acquire(self, f):
+        """(locked, waited): waited is True if another worker held the lock first"""
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True, False
+        except BlockingIOError:
+            pass
+        self.stats['lock_waits'] += 1
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            time.sleep(self.poll_interval)
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True, True
+            except BlockingIOError:
+                continue
+        self.stats['lock_timeouts'] += 1
+        return False, True
+
+    def _run_locked(self, key, fn, recheck):
+        if fcntl is None:
+            return fn()
+        with open(self._lock_path(key), 'a') as f:
+            locked, waited = self._acquire(f)
+            try:
+                if waited and recheck is not None:
+                    value = recheck()
+                    if value is not None:
+                        self.stats['shared_across_workers'] += 1
+                        return value
+                return fn()
+            finally:
+                if locked:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def in_flight(self):
+        return self.local.in_flight()
@@ -0,0 +1,235 @@
+import numpy as np
+
+from database import pool
+from cache import normalize_query
+
+# Below this many products a single Python loop beats building arrays
+COLUMNAR_THRESHOLD = 64
+
+PERCENTILES = (10, 25, 75, 90)
+
+
+def factorize(labels):
+    """(integer code per item, distinct labels in first-seen order)
+
+    A dict lookup per item is several times cheaper than np.unique's sort
+    for string labels with few distinct values, like platforms or days.
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(label, len(index)) for label in labels),
+                        dtype=np.int64, count=len(labels))
+    return codes, list(index)
+
+
+class ProductColumns:
+    """Products as parallel NumPy arrays, with platforms stored as integer codes"""
+
+    def __init__(self, prices, originals=None, ratings=None, platform_codes=None, platform_names=None):
+        self.prices = np.asarray(prices, dtype=np.float64)
+        n = len(self.prices)
+        # Products without a list price count as not discounted
+        self.originals = self.prices if originals is None else np.asarray(originals, dtype=np.float64)
+        self.ratings = np.full(n, np.nan) if ratings is None else np.asarray(ratings, dtype=np.float64)
+        self.platform_codes = np.zeros(n, dtype=np.int64) if platform_codes is None else np.asarray(platform_codes)
+        self.platform_names = list(platform_names or ['Unknown'])
+
+    @classmethod
+    def from_products(cls, products):
+        n = len(products)
+        codes, names = factorize([p['platform'] for p in products])
+        return cls(
+            prices=np.fromiter((p['price'] for p in products), dtype=np.float64, count=n),
+            originals=np.fromiter((p.get('original_price') or p['price'] for p in products), dtype=np.float64, count=n),
+            ratings=np.fromiter((float(p.get('rating') or 'nan') for p in products), dtype=np.float64, count=n),
+            platform_codes=codes,
+            platform_names=names
+        )
+
+    def __len__(self):
+        return len(self.prices)
+
+
+def summarize(columns):
+    """Price statistics for a set of products in one vectorized pass
+
+    Returns the keys /api/search has always sent (lowest/highest/average
+    price, stores compared, max savings, average discount, best platform)
+    plus median, percentiles and mean rating.
+    """
+    if len(columns) == 0:
+        return {}
+
+    prices = columns.prices
+    best = int(np.argmin(prices))
+    lowest = prices[best]
+    quartiles = np.percentile(prices, (50,) + PERCENTILES)
+    originals_total = columns.originals.sum()
+    ratings = columns.ratings[~np.isnan(columns.ratings)]
+
+    return {
+        'lowest_price': int(lowest),
+        'highest_price': int(prices.max()),
+        'average_price': int(prices.mean()),
+        'median_price': int(quartiles[0]),
+        'percentiles': {f'p{p}': int(v) for p, v in zip(PERCENTILES, quartiles[1:])},
+        'stores_compared': len(prices),
+        'max_savings': int(columns.originals.max() - lowest),
+        'average_discount': int((originals_total - prices.sum()) / originals_total * 100) if originals_total else 0,
+        'average_rating': round(float(ratings.mean()), 2) if len(ratings) else None,
+        'best_platform': columns.platform_names[columns.platform_codes[best]]
+    }
+
+
+def _percentile(ordered, q):
+    """np.percentile's default (linear) interpolation on an already sorted list"""
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _summarize_small(products):
+    """Same result as summarize() for a handful of products, in one Python loop"""
+    lowest = highest = None
+    total = originals_total = max_original = 0
+    ratings_total, ratings_count = 0.0, 0
+    best_platform = None
+    for p in products:
+        price = p['price']
+        original = p.get('original_price') or price
+        if lowest is None or price < lowest:
+            lowest, best_platform = price, p['platform']
+        if highest is None or price > highest:
+            highest = price
+        if original > max_original:
+            max_original = original
+        total += price
+        originals_total += original
+        if p.get('rating') is not None:
+            ratings_total += float(p['rating'])
+            ratings_count += 1
+
+    n = len(products)
+    ordered = sorted(p['price'] for p in products)
+    quartiles = [_percentile(ordered, q) for q in (50,) + PERCENTILES]
+    return {
+        'lowest_price': int(lowest),
+        'highest_price': int(highest),
+        'average_price': int(total / n),
+        'median_price': int(quartiles[0]),
+        'percentiles': {f'p{p}': int(v) for p, v in zip(PERCENTILES, quartiles[1:])},
+        'stores_compared': n,
+        'max_savings': int(max_original - lowest),
+        'average_discount': int((originals_total - total) / originals_total * 100) if originals_total else 0,
+        'average_rating': round(ratings_total / ratings_count, 2) if ratings_count else None,
+        'best_platform': best_platform
+    }
+
+
+def calculate_stats(products):
+    """Statistics for a list of product dicts (the /api/search 'statistics' block)"""
+    if not products:
+        return {}
+    if len(products) < COLUMNAR_THRESHOLD:
+        return _summarize_small(products)
+    return summarize(ProductColumns.from_products(products))
+
+
+def group_aggregate(codes, values, n_groups=None):
+    """Count, min, max, mean and median of values per integer group code
+
+    Values are sorted once, then stably by code, so every group is a
+    contiguous ascending slice and all aggregates come from reduceat and
+    index arithmetic. Result arrays are indexed by code; groups with no
+    values have a count of 0 and NaN aggregates.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if n_groups is None:
+        n_groups = int(codes.max()) + 1 if len(codes) else 0
+
+    by_value = np.argsort(values)
+    values = values[by_value[np.argsort(codes[by_value], kind='stable')]]
+
+    counts = np.bincount(codes, minlength=n_groups)
+    present = counts > 0
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = {'count': counts}
+    for name in ('min', 'max', 'mean', 'median'):
+        result[name] = np.full(n_groups, np.nan)
+
+    starts, group_counts = starts[present], counts[present]
+    if len(group_counts):
+        result['min'][present] = values[starts]
+        result['max'][present] = values[starts + group_counts - 1]
+        result['mean'][present] = np.add.reduceat(values, starts) / group_counts
+        result['median'][present] = (values[starts + (group_counts - 1) // 2] + values[starts + group_counts // 2]) / 2
+    return result
+
+
+def aggregate_rows(labels, grouped, label_key='key'):
+    """group_aggregate() output as JSON-ready dicts, one per non-empty group"""
+    return [
+        {
+            label_key: label,
+            'count': int(grouped['count'][code]),
+            'min': round(float(grouped['min'][code]), 2),
+            'max': round(float(grouped['max'][code]), 2),
+            'mean': round(float(grouped['mean'][code]), 2),
+            'median': round(float(grouped['median'][code]), 2)
+        }
+        for code, label in enumerate(labels) if grouped['count'][code]
+    ]
+
+
+def platform_stats(columns):
+    """Per-platform price aggregates for a set of products"""
+    grouped = group_aggregate(columns.platform_codes, columns.prices, len(columns.platform_names))
+    return aggregate_rows(columns.platform_names, grouped, 'platform')
+
+
+def load_history_columns(product_name=None, days=30):
+    """price_history for a window as (day codes, days, platform codes, platforms, prices)"""
+    since = f'-{int(days)} days'
+    if product_name:
+        rows = pool.fetchall('''SELECT timestamp, platform, price FROM price_history
+                                WHERE product_name = ? AND timestamp > datetime('now', ?)''',
+                             (normalize_query(product_name), since))
+    else:
+        rows = pool.fetchall('''SELECT timestamp, platform, price FROM price_history
+                                WHERE timestamp > datetime('now', ?)''', (since,))
+
+    # Timestamps are 'YYYY-MM-DD HH:MM:SS', so the first ten characters are the day
+    day_codes, day_labels = factorize([row[0][:10] for row in rows])
+    platform_codes, platforms = factorize([row[1] for row in rows])
+    prices = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    return day_codes, day_labels, platform_codes, platforms, prices
+
+
+def history_stats(product_name=None, days=30):
+    """Overall, daily, per-platform and per-platform-per-day price aggregates over a history window"""
+    day_codes, day_labels, platform_codes, platforms, prices = load_history_columns(product_name, days)
+    if not len(prices):
+        return {'summary': None, 'by_day': [], 'by_platform': [], 'by_platform_day': []}
+
+    summary = summarize(ProductColumns(prices, platform_codes=platform_codes, platform_names=platforms))
+    # History has no list prices or ratings, so those fields don't apply
+    for key in ('max_savings', 'average_discount', 'average_rating', 'stores_compared'):
+        summary.pop(key)
+    summary['observations'] = len(prices)
+
+    # One combined code per (platform, day) pair
+    n_days = len(day_labels)
+    pairs = [(platform, day) for platform in platforms for day in day_labels]
+    by_platform_day = aggregate_rows(pairs, group_aggregate(platform_codes * n_days + day_codes, prices, len(pairs)))
+    for row in by_platform_day:
+        row['platform'], row['day'] = row.pop('key')
+
+    by_day = aggregate_rows(day_labels, group_aggregate(day_codes, prices, n_days), 'day')
+    by_platform = aggregate_rows(platforms, group_aggregate(platform_codes, prices, len(platforms)), 'platform')
+    return {
+        'summary': summary,
+        'by_day': sorted(by_day, key=lambda row: row['day']),
+        'by_platform': sorted(by_platform, key=lambda row: row['platform']),
+        'by_platform_day': sorted(by_platform_day, key=lambda row: (row['platform'], row['day']))
+    }
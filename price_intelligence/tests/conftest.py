@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The modules under test live one level up and read their paths from the
+# environment at import, so point them at a scratch directory first
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCRATCH = tempfile.mkdtemp(prefix='pricesmart-tests-')
+os.environ.setdefault('PRICESMART_DB_PATH', os.path.join(SCRATCH, 'pricesmart.db'))
+os.environ.setdefault('PRICESMART_HTTP_CACHE_PATH', os.path.join(SCRATCH, 'http_cache.db'))
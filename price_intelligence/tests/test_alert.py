@@ -0,0 +1,63 @@
+import pytest
+
+from alert import PriceAlertSystem
+from database import pool
+
+
+class NullMailer:
+    def __init__(self):
+        self.alerts = []
+
+    def enqueue(self, *alert):
+        self.alerts.append(alert)
+        return True
+
+    def flush(self, wait=True, timeout=30):
+        return True
+
+
+@pytest.fixture
+def watchlist():
+    """The users and watchlist tables as app.py creates them, emptied"""
+    with pool.transaction() as c:
+        c.execute('''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL, password TEXT NOT NULL,
+            name TEXT NOT NULL, salt TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_login DATETIME, is_active BOOLEAN DEFAULT 1)''')
+        c.execute('''CREATE TABLE IF NOT EXISTS watchlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, product_name TEXT, current_price REAL,
+            target_price REAL, added_at DATETIME DEFAULT CURRENT_TIMESTAMP, last_checked DATETIME,
+            is_active BOOLEAN DEFAULT 1)''')
+        c.execute('DELETE FROM watchlist')
+        c.execute('DELETE FROM users')
+        c.executemany("INSERT INTO users (id, email, password, name, salt) VALUES (?, ?, '!', 'x', '')",
+                      [(1, 'a@test'), (2, 'b@test'), (3, 'c@test')])
+
+    def add(user_id, product_name, current_price, target_price):
+        with pool.transaction() as c:
+            c.execute('INSERT INTO watchlist (user_id, product_name, current_price, target_price) VALUES (?, ?, ?, ?)',
+                      (user_id, product_name, current_price, target_price))
+    return add
+
+
+def test_spellings_of_a_product_are_priced_once_across_chunks(watchlist):
+    # Raw names sort "Desk Lamp" < "IPHONE  15" < "USB hub" < "iPhone 15", which puts the
+    # two iPhone spellings in different chunks; by normalized key they are adjacent
+    watchlist(1, 'iPhone 15', 80000, 70000)
+    watchlist(2, 'Desk Lamp', 1500, 1000)
+    watchlist(3, 'IPHONE  15', 80000, 76000)
+    watchlist(1, 'USB hub', 900, 500)
+    fetched = []
+
+    def price_fetcher(name):
+        fetched.append(name)
+        return 75000 if 'phone' in name.lower() else 1200, []
+
+    mailer = NullMailer()
+    system = PriceAlertSystem(price_fetcher=price_fetcher, chunk_size=1, fetch_workers=1, mailer=mailer)
+    system.check_all_watchlists()
+
+    assert sorted(name.lower().replace('  ', ' ') for name in fetched) == ['desk lamp', 'iphone 15', 'usb hub']
+    assert system.last_run['items_checked'] == 4
+    assert [(alert[0], alert[1]) for alert in mailer.alerts] == [('c@test', 'IPHONE  15')]
+    assert pool.fetchone('SELECT COUNT(*) FROM watchlist WHERE product_key IS NULL')[0] == 0
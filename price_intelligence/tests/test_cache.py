@@ -0,0 +1,55 @@
+import threading
+import time
+
+from cache import SearchCache, SQLiteCache
+from singleflight import FileLockSingleFlight
+
+
+def make_workers(tmp_path, n=3):
+    """SearchCaches set up like n gunicorn workers: own local tier, one shared tier and lock directory"""
+    shared = SQLiteCache(table='test_search_cache', max_age=60)
+    shared.clear()
+    return [SearchCache(ttl=0.2, stale_ttl=30, shared=shared, flight=FileLockSingleFlight(str(tmp_path / 'locks')))
+            for _ in range(n)]
+
+
+def test_stale_key_is_refreshed_once_across_workers(tmp_path):
+    workers = make_workers(tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'version': len(calls)}
+
+    first = workers[0].get_or_compute('phone', compute)
+    for worker in workers[1:]:
+        assert worker.get_or_compute('phone', compute) == first  # promoted from the shared tier
+    time.sleep(0.3)
+
+    # Every worker finds its local copy stale at once: served stale, refreshed once
+    threads = [threading.Thread(target=worker.get_or_compute, args=('phone', compute)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for worker in workers:
+        worker._executor.shutdown(wait=True)
+
+    assert len(calls) == 2
+    assert sum(worker.counters['stale_hits'] for worker in workers) == 3
+    assert sum(worker.counters['refreshes'] for worker in workers) == 1
+    for worker in workers:
+        assert worker._fresh_value('phone') == {'version': 2}
+
+
+def test_refresh_skips_compute_when_another_worker_already_refreshed(tmp_path):
+    a, b = make_workers(tmp_path, 2)
+    a.get_or_compute('phone', lambda: {'version': 1})
+    b.get_or_compute('phone', lambda: {'version': 1})
+    time.sleep(0.3)
+    a.set('phone', {'version': 2})  # worker a refreshed it into the shared tier
+
+    b._refresh('phone', lambda: {'version': 'recomputed'})
+    assert b.counters['refreshes'] == 0
+    assert b.get_or_compute('phone', lambda: {'version': 'recomputed'}) == {'version': 2}
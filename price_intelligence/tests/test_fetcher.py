@@ -0,0 +1,129 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetcher import HttpCache, HttpFetcher
+
+
+class Origin:
+    """What the stub server answers; tests change it between requests"""
+
+    def __init__(self):
+        self.body = b'<html>offer v1</html>'
+        self.etag = '"v1"'
+        self.cache_control = 'max-age=0'
+        self.delay = 0
+        self.on_revalidate = None  # called when a conditional request arrives
+        self.requests = []  # If-None-Match header of each request, None if unconditional
+
+
+@pytest.fixture
+def origin():
+    state = Origin()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state.requests.append(self.headers.get('If-None-Match'))
+            time.sleep(state.delay)
+            if self.headers.get('If-None-Match') and state.on_revalidate:
+                state.on_revalidate()
+            if self.headers.get('If-None-Match') == state.etag:
+                self.send_response(304)
+                self.send_header('ETag', state.etag)
+                self.send_header('Cache-Control', state.cache_control)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', state.etag)
+            self.send_header('Cache-Control', state.cache_control)
+            self.send_header('Content-Length', str(len(state.body)))
+            self.end_headers()
+            self.wfile.write(state.body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    state.url = f'http://127.0.0.1:{server.server_port}/product/1'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    cache = HttpCache(str(tmp_path / 'http_cache.db'), touch_interval=300)
+    return HttpFetcher(cache=cache, rate=100, burst=100)
+
+
+def test_fresh_entry_is_served_without_a_request(origin, fetcher):
+    origin.cache_control = 'max-age=60'
+    assert fetcher.get(origin.url) == origin.body
+    assert fetcher.get(origin.url) == origin.body
+    assert origin.requests == [None]
+    stats = fetcher.stats()
+    assert (stats['hits'], stats['misses'], stats['stored']) == (1, 1, 1)
+
+
+def test_cache_hit_does_not_write(origin, fetcher):
+    origin.cache_control = 'max-age=60'
+    fetcher.get(origin.url)
+    used = fetcher.cache.pool.fetchone('SELECT last_used FROM http_cache')[0]
+    time.sleep(0.01)
+    fetcher.get(origin.url)
+    assert fetcher.cache.pool.fetchone('SELECT last_used FROM http_cache')[0] == used
+
+
+def test_expired_entry_is_revalidated_with_its_etag(origin, fetcher):
+    assert fetcher.get(origin.url) == origin.body
+    # 304: the cached body is served and its freshness extended from the 304's headers
+    origin.cache_control = 'max-age=60'
+    assert fetcher.get(origin.url) == origin.body
+    assert fetcher.get(origin.url) == origin.body
+    assert origin.requests == [None, '"v1"']
+    stats = fetcher.stats()
+    assert (stats['revalidated'], stats['not_modified'], stats['hits']) == (1, 1, 1)
+
+
+def test_changed_resource_replaces_the_entry(origin, fetcher):
+    fetcher.get(origin.url)
+    origin.body, origin.etag = b'<html>offer v2</html>', '"v2"'
+    assert fetcher.get(origin.url) == b'<html>offer v2</html>'
+    assert origin.requests == [None, '"v1"']
+    assert fetcher.cache.get(origin.url)['etag'] == '"v2"'
+    assert fetcher.stats()['not_modified'] == 0
+
+
+def test_entry_evicted_during_revalidation_is_fetched_again(origin, fetcher):
+    fetcher.get(origin.url)
+    origin.on_revalidate = fetcher.cache.clear
+    # The 304 arrives with nothing left to serve, so the body is requested without validators
+    assert fetcher.get(origin.url) == origin.body
+    assert origin.requests == [None, '"v1"', None]
+    assert fetcher.cache.get(origin.url) is not None
+    assert fetcher.stats()['not_modified'] == 0
+
+
+def test_no_store_response_is_not_cached(origin, fetcher):
+    origin.cache_control = 'no-store'
+    fetcher.get(origin.url)
+    fetcher.get(origin.url)
+    assert origin.requests == [None, None]
+    assert fetcher.stats()['uncacheable'] == 2
+
+
+def test_concurrent_misses_share_one_request(origin, fetcher):
+    origin.cache_control = 'max-age=60'
+    origin.delay = 0.2
+    bodies = []
+    threads = [threading.Thread(target=lambda: bodies.append(fetcher.get(origin.url))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert bodies == [origin.body] * 5
+    assert origin.requests == [None]
+    assert fetcher.stats()['coalesced'] == 4
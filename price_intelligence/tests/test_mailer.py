@@ -0,0 +1,126 @@
+import email
+import socketserver
+import threading
+from email.header import decode_header, make_header
+
+import pytest
+
+from mailer import AlertMailer
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Just enough SMTP for smtplib: records each message, and answers the
+    first ``fail_next`` messages with a 451 so the sender has to retry"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.fail_next = 0
+        self.sessions = 0
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.sessions += 1
+        self.reply('220 stub ESMTP')
+        for line in self.rfile:
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 stub')
+            elif command == 'DATA':
+                self.reply('354 end with <CRLF>.<CRLF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                if self.server.fail_next:
+                    self.server.fail_next -= 1
+                    self.reply('451 try again later')
+                else:
+                    self.server.messages.append(email.message_from_bytes(data))
+                    self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self.reply('250 ok')
+
+
+@pytest.fixture
+def smtp():
+    server = SMTPStub()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mailer(smtp):
+    # A long digest window: only flush() sends, so each test controls when
+    return AlertMailer(host='127.0.0.1', port=smtp.server_address[1], user=None, starttls=False,
+                       sender='alerts@test', digest_window=60, retry_base_delay=0.01, idle_timeout=60)
+
+
+def subject(message):
+    return str(make_header(decode_header(message['Subject'])))
+
+
+def html(message):
+    return message.get_payload()[0].get_payload(decode=True).decode()
+
+
+def test_repeat_alerts_for_a_product_collapse_to_the_deepest_drop(smtp, mailer):
+    mailer.enqueue('a@test', 'Wireless Mouse', 1000, 900, 100)
+    mailer.enqueue('a@test', '  wireless   MOUSE ', 950, 800, 150)
+    mailer.enqueue('a@test', 'Wireless Mouse', 900, 850, 50)
+    assert mailer.flush()
+
+    assert len(smtp.messages) == 1
+    body = html(smtp.messages[0])
+    # The lowest new price, measured from the first "was" price
+    assert '₹1,000' in body and '→ ₹800' in body and 'You save: ₹200' in body
+    assert mailer.stats['deduplicated'] == 2
+    assert mailer.stats['sent'] == 1
+
+
+def test_alerts_are_batched_into_one_digest_per_recipient(smtp, mailer):
+    mailer.enqueue('a@test', 'Wireless Mouse', 1000, 800, 200)
+    mailer.enqueue('a@test', 'USB Hub', 2500, 2000, 500)
+    mailer.enqueue('b@test', 'Desk Lamp', 1500, 1200, 300)
+    assert mailer.flush()
+
+    by_recipient = {message['To']: message for message in smtp.messages}
+    assert sorted(by_recipient) == ['a@test', 'b@test']
+    assert '2 items' in subject(by_recipient['a@test'])
+    assert 'Wireless Mouse' in html(by_recipient['a@test']) and 'USB Hub' in html(by_recipient['a@test'])
+    assert subject(by_recipient['b@test']).endswith('Desk Lamp')
+    # Both digests over one connection
+    assert mailer.stats['connections'] == 1 and smtp.sessions == 1
+
+
+def test_a_rejected_send_is_retried(smtp, mailer):
+    smtp.fail_next = 1
+    mailer.enqueue('a@test', 'Wireless Mouse', 1000, 800, 200)
+    assert mailer.flush()
+    assert smtp.messages == []
+    assert mailer.stats['retried'] == 1
+
+    # flush() also sends retries that are due
+    assert mailer.flush()
+    assert [message['To'] for message in smtp.messages] == ['a@test']
+    assert (mailer.stats['sent'], mailer.stats['failed']) == (1, 0)
+
+
+def test_a_send_that_keeps_failing_is_given_up_after_max_retries(smtp, mailer):
+    mailer.max_retries = 2
+    smtp.fail_next = 2
+    mailer.enqueue('a@test', 'Wireless Mouse', 1000, 800, 200)
+    assert mailer.flush()
+    assert mailer.flush()
+    assert mailer.flush()
+    assert smtp.messages == []
+    assert (mailer.stats['retried'], mailer.stats['failed'], mailer.stats['sent']) == (1, 1, 0)
@@ -0,0 +1,87 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from benchmarks.fixtures import amazon_page, flipkart_page
+from fetcher import HttpFetcher
+from scraper import RealScraper
+
+PAGES = {'/s': amazon_page(results=8, noise_blocks=4), '/search': flipkart_page(results=8, noise_blocks=4),
+         '/extra': flipkart_page(results=3, seed=5, noise_blocks=4)}
+
+
+@pytest.fixture
+def stores():
+    """Stub for every store: one path per search page, each with its own response delay"""
+    delays = {path: 0 for path in PAGES}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            time.sleep(delays[path])
+            body = PAGES[path].encode()
+            try:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Cache-Control', 'no-store')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except OSError:
+                pass  # the scraper stopped waiting
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    server.delays = delays
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def scraper(stores):
+    fetcher = HttpFetcher(timeout=5, rate=100, burst=100)
+    scraper = RealScraper(base_urls={'Amazon': stores.url, 'Flipkart': stores.url}, search_deadline=0.5,
+                          fetcher=fetcher)
+    yield scraper
+    scraper.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def timed_search(scraper, query='phone'):
+    started = time.perf_counter()
+    products = scraper.search_product(query)
+    return products, time.perf_counter() - started
+
+
+def test_platforms_are_scraped_concurrently(stores, scraper):
+    stores.delays.update({'/s': 0.3, '/search': 0.3})
+    products, elapsed = timed_search(scraper)
+    assert {p.platform for p in products} == {'Amazon', 'Flipkart'}
+    assert all(p.real_data for p in products)
+    assert elapsed < 0.5  # one platform's latency, not the sum
+
+
+def test_a_platform_slower_than_the_deadline_is_left_out(stores, scraper):
+    stores.delays['/search'] = 2
+    products, elapsed = timed_search(scraper)
+    assert elapsed < 0.5 + 0.2
+    assert products and {p.platform for p in products} == {'Amazon'}
+    assert [p.title for p in products] == [p.title for p in scraper.parse_amazon(PAGES['/s'], stores.url)]
+
+
+def test_an_extra_platform_does_not_lengthen_the_search(stores, scraper):
+    stores.delays.update({'/s': 0.3, '/search': 0.3, '/extra': 0.3})
+    _, without_extra = timed_search(scraper)
+
+    scraper.register_platform('Croma', lambda query: scraper.parse_flipkart(
+        scraper.fetch(f'{stores.url}/extra?q={query}'), stores.url))
+    products, with_extra = timed_search(scraper)
+    assert len(products) == 5 + 5 + 3
+    assert with_extra < without_extra + 0.15
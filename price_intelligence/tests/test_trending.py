@@ -0,0 +1,41 @@
+import pytest
+
+from database import BatchWriter, pool, utc_timestamp
+from trending import TrendingTracker
+
+
+@pytest.fixture
+def tracker():
+    pool.execute('''CREATE TABLE IF NOT EXISTS searches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, query TEXT NOT NULL,
+        result_count INTEGER, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )''')
+    tracker = TrendingTracker(refresh_interval=0)
+    with pool.transaction() as c:
+        c.execute('DELETE FROM searches')
+        c.execute('DELETE FROM search_trends')
+    return tracker
+
+
+def test_a_rolled_back_flush_keeps_counting_its_searches(tracker):
+    failures = [RuntimeError('disk I/O error')]
+
+    def apply_then_fail(c, rows):
+        tracker.apply_search_rows(c, rows)
+        if failures:
+            raise failures.pop()
+
+    writer = BatchWriter('INSERT INTO searches (user_id, query, result_count, timestamp) VALUES (?, ?, ?, ?)',
+                         flush_interval=60, on_flush=apply_then_fail, after_commit=tracker.search_rows_committed)
+    tracker.record('Pixel 9')
+    writer.add((None, 'Pixel 9', 6, utc_timestamp()))
+
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    tracker.refresh()
+    assert tracker.top() == [('pixel 9', 1)]
+
+    # The retry commits: counted once, from the table
+    assert writer.flush() == 1
+    tracker.refresh()
+    assert tracker.top() == [('pixel 9', 1)]
@@ -0,0 +1,120 @@
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from database import pool
+from cache import normalize_query
+
+
+def hour_bucket(timestamp):
+    """'YYYY-MM-DD HH:MM:SS' -> 'YYYY-MM-DD HH:00:00'"""
+    return timestamp[:13] + ':00:00'
+
+
+class TrendingTracker:
+    """Rolling 7-day search counts kept in per-hour buckets
+
+    ``search_trends`` holds one row per (hour, normalized query) and is
+    updated in the same transaction that writes the raw ``searches`` rows.
+    Each worker keeps the window's totals in memory and answers top-K from
+    a cached list, reloading the totals from the (small) summary table
+    every ``refresh_interval`` seconds.
+    """
+
+    def __init__(self, window_days=7, refresh_interval=30, k=6):
+        self.window_days = window_days
+        self.refresh_interval = refresh_interval
+        self.k = k
+        self._counts = Counter()
+        self._unflushed = Counter()
+        self._top = []
+        self._top_dirty = True
+        self._top_built_at = 0
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+        self._flushes = 0
+        self.init_table()
+
+    def init_table(self):
+        # Check, create and backfill under the write lock: workers starting
+        # together on a fresh database must not both see the table as new
+        # and backfill it twice
+        with pool.transaction() as c:
+            c.execute('BEGIN IMMEDIATE')
+            c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'search_trends'")
+            exists = c.fetchone() is not None
+            c.execute('''CREATE TABLE IF NOT EXISTS search_trends (
+                bucket TEXT NOT NULL,
+                query TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, query)
+            )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_search_trends_bucket ON search_trends(bucket)')
+            if not exists:
+                self._backfill(c)
+
+    def _backfill(self, c):
+        """Seed the buckets from the raw searches table (one-off, on first start)"""
+        c.execute('''SELECT query, timestamp FROM searches
+                     WHERE timestamp > datetime('now', ?)''', (f'-{self.window_days} days',))
+        counts = Counter((hour_bucket(ts), normalize_query(q)) for q, ts in c.fetchall())
+        c.executemany('INSERT INTO search_trends (bucket, query, count) VALUES (?, ?, ?)',
+                      [(bucket, query, n) for (bucket, query), n in counts.items()])
+
+    def _window_start(self):
+        start = datetime.utcnow() - timedelta(days=self.window_days)
+        return start.strftime('%Y-%m-%d %H:00:00')
+
+    def apply_search_rows(self, c, rows):
+        """BatchWriter on_flush hook for rows of (user_id, query, result_count, timestamp)"""
+        counts = Counter((hour_bucket(row[3]), normalize_query(row[1])) for row in rows)
+        c.executemany('''INSERT INTO search_trends (bucket, query, count) VALUES (?, ?, ?)
+                         ON CONFLICT(bucket, query) DO UPDATE SET count = count + excluded.count''',
+                      [(bucket, query, n) for (bucket, query), n in counts.items()])
+        # Expire old buckets now and then; they are already outside the window
+        self._flushes += 1
+        if self._flushes % 100 == 0:
+            c.execute('DELETE FROM search_trends WHERE bucket < ?', (self._window_start(),))
+
+    def search_rows_committed(self, rows):
+        """BatchWriter after_commit hook: these searches are in the table now, so stop adding them on top
+
+        Only after the commit: a flush that rolls back is retried, and until
+        then its searches must keep counting in this worker.
+        """
+        with self._lock:
+            self._unflushed.subtract(Counter(normalize_query(row[1]) for row in rows))
+            self._unflushed = +self._unflushed
+
+    def record(self, query):
+        """Count a search in this worker right away, before it reaches the table"""
+        with self._lock:
+            key = normalize_query(query)
+            self._counts[key] += 1
+            self._unflushed[key] += 1
+            self._top_dirty = True
+
+    def refresh(self):
+        rows = pool.fetchall('''SELECT query, SUM(count) FROM search_trends
+                                WHERE bucket >= ? GROUP BY query''', (self._window_start(),))
+        with self._lock:
+            # Searches still sitting in this worker's log buffer aren't in the table yet
+            self._counts = Counter(dict(rows)) + self._unflushed
+            self._top_dirty = True
+            self._loaded_at = time.time()
+
+    def top(self, k=None):
+        """[(query, count), ...] for the k most searched queries in the window"""
+        k = k or self.k
+        if time.time() - self._loaded_at > self.refresh_interval:
+            self.refresh()
+        with self._lock:
+            # Rebuild at most once a second, so a burst of searches doesn't make every call O(n log k)
+            stale = self._top_dirty and time.time() - self._top_built_at >= 1
+            if stale or len(self._top) < min(k, len(self._counts)):
+                self._top = heapq.nlargest(max(k, self.k), self._counts.items(), key=lambda item: item[1])
+                self._top_dirty = False
+                self._top_built_at = time.time()
+            return self._top[:k]